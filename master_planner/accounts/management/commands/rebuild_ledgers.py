@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from accounts.models import Account, ChoiceSlot, HpLedger, account_cells, choice_slots
+import time
+
+
+class Command(BaseCommand):
+    help = 'rebuilds the hp ledger and conflict index of every account from its choices, run after a catalogue reimport'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="only report ledgers and conflict index rows that differ from the choices, nothing is written",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="rows per bulk insert/update",
+        )
+
+    def handle(self, *args, **options):
+        st = time.time()
+        cells = account_cells()
+        ledgers = {ledger.account_id: ledger for ledger in HpLedger.objects.all()}
+
+        missing = []
+        stale = []
+        account_ids = list(Account.objects.values_list("id", flat=True))
+        for account_id in account_ids:
+            expected = {column: cells.get(account_id, {}).get(column, 0) for column in HpLedger.COLUMNS}
+            ledger = ledgers.get(account_id)
+            if ledger is None:
+                ledger = HpLedger(account_id=account_id)
+                ledger.set_cells(expected)
+                missing.append(ledger)
+            elif any(abs(ledger.cells()[column] - hp) > 1e-6 for column, hp in expected.items()):
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"account {account_id}: stored {ledger.cells()}, expected {expected}")
+                ledger.set_cells(expected)
+                stale.append(ledger)
+
+        expected_slots = choice_slots()
+        stored_slots = {row[1:]: row[0] for row in ChoiceSlot.objects.values_list("id", "account_id",
+                                                                               "scheduler_id", "schedule_id")}
+        missing_slots = expected_slots - stored_slots.keys()
+        stale_slots = [pk for row, pk in stored_slots.items() if row not in expected_slots]
+
+        if not options["verify"]:
+            with transaction.atomic():
+                HpLedger.objects.bulk_create(missing, batch_size=options["batch_size"])
+                HpLedger.objects.bulk_update(stale, HpLedger.COLUMNS, batch_size=options["batch_size"])
+                ChoiceSlot.objects.filter(id__in=stale_slots).delete()
+                ChoiceSlot.objects.bulk_create([ChoiceSlot(account_id=account_id, scheduler_id=scheduler_id,
+                                                           schedule_id=slot)
+                                                for account_id, scheduler_id, slot in missing_slots],
+                                               batch_size=options["batch_size"])
+
+        action = "found" if options["verify"] else "rebuilt"
+        summary = (f"{action} {len(missing)} missing and {len(stale)} stale ledgers "
+                   f"and {len(missing_slots)} missing and {len(stale_slots)} stale conflict index rows "
+                   f"of {len(account_ids)} accounts in {time.time() - st:.2f}s")
+        if options["verify"] and (missing or stale or missing_slots or stale_slots):
+            raise CommandError(summary)
+        self.stdout.write(summary)
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.2 on 2026-10-18 14:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HpLedger',
+            fields=[
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('a_7_1', models.FloatField(default=0)),
+                ('g_7_1', models.FloatField(default=0)),
+                ('a_7_2', models.FloatField(default=0)),
+                ('g_7_2', models.FloatField(default=0)),
+                ('a_8_1', models.FloatField(default=0)),
+                ('g_8_1', models.FloatField(default=0)),
+                ('a_8_2', models.FloatField(default=0)),
+                ('g_8_2', models.FloatField(default=0)),
+                ('a_9_1', models.FloatField(default=0)),
+                ('g_9_1', models.FloatField(default=0)),
+                ('a_9_2', models.FloatField(default=0)),
+                ('g_9_2', models.FloatField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.2 on 2026-10-18 15:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_choices(apps, schema_editor):
+    Account = apps.get_model("accounts", "Account")
+    ChoiceSlot = apps.get_model("accounts", "ChoiceSlot")
+    rows = Account.choices.through.objects.values_list("account_id", "scheduler_id", "scheduler__schedule_id")
+    ChoiceSlot.objects.bulk_create([ChoiceSlot(account_id=account_id, scheduler_id=scheduler_id, schedule_id=slot)
+                                    for account_id, scheduler_id, slot in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0007_plannerrow'),
+        ('accounts', '0002_hpledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChoiceSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to=settings.AUTH_USER_MODEL)),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='planning.schedule')),
+                ('scheduler', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='planning.scheduler')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'schedule'], name='choiceslot_account_slot_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='choiceslot',
+            constraint=models.UniqueConstraint(fields=('account', 'scheduler'), name='unique_choice_slot'),
+        ),
+        migrations.RunPython(index_choices, migrations.RunPython.noop),
+    ]
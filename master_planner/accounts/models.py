@@ -1,6 +1,13 @@
-from django.db import models, IntegrityError
+from django.db import models, IntegrityError, transaction
+from django.db.models import F, Count
 from django.contrib.auth.models import User, AbstractUser
-from planning.models import Program, Scheduler
+from planning.models import SLOT_BLOCKS, Program, Schedule, Scheduler, occupancy_slot, period_bits, slot_ids
+from accounts.overview import level_hp_rollup, empty_level_hp, add_level_hp, course_level, SEMESTERS, PERIODS
+
+# block of the fixed slots of occupancy bits
+SLOT_NAMES = {slot: block for block, slot in SLOT_BLOCKS.items()}
+# conflict index columns slot_choices groups
+CLASH_ROW = ("scheduler_id", "schedule_id", "schedule__block", "scheduler__occupancy")
 
 class Account(AbstractUser):
     program = models.ForeignKey(Program, on_delete=models.CASCADE, null=True)
@@ -10,39 +17,266 @@ class Account(AbstractUser):
         return str(self.username)
 
     def level_hp(self, profile: str=None) -> dict[float]:
-        result_dict = {}
+        if not profile:
+            return HpLedger.for_account(self).level_hp()
 
-        for semester in range(7, 10):
-            for period in range(1, 3):
-                result_dict[semester, period, "a_level"] = 0
-                result_dict[semester, period, "g_level"] = 0
+        choices = self.choices.filter(profiles=profile)
+        return level_hp_rollup(choices.select_related("course", "schedule"))
 
-            result_dict[semester, "a_level"] = 0
-            result_dict[semester, "g_level"] = 0
+    def add_choices(self, schedulers: list[Scheduler]) -> list[Scheduler]:
+        """Add schedulers to choices and the hp ledger, returns the ones that were not already chosen."""
+        return self.update_choices(add=schedulers)[0]
 
-        result_dict["a_level"] = 0
-        result_dict["g_level"] = 0
-        
-        if not profile:
-            choices = self.choices.all()
-        else:
-            choices = self.choices.filter(profiles=profile)
+    def remove_choices(self, schedulers: list[Scheduler]) -> list[Scheduler]:
+        """Remove schedulers from choices and the hp ledger, returns the ones that were chosen."""
+        return self.update_choices(remove=schedulers)[1]
+
+    def update_choices(self, add: list[Scheduler]=(), remove: list[Scheduler]=()) -> tuple[list[Scheduler], list[Scheduler]]:
+        """
+        Add and remove choices in one transaction, with one insert and one delete on the choices table.
+        Schedulers must come with course and schedule loaded, they are needed for the hp ledger.
+
+        return format -- (schedulers that were added, schedulers that were removed)
+        """
+        through = Account.choices.through
+        with transaction.atomic():
+            ledger = HpLedger.for_account(self, lock=True)
+            chosen = set(through.objects
+                         .filter(account_id=self.pk,
+                                 scheduler_id__in=[scheduler.scheduler_id for scheduler in [*add, *remove]])
+                         .values_list("scheduler_id", flat=True))
+            added = list({scheduler.scheduler_id: scheduler for scheduler in add
+                          if scheduler.scheduler_id not in chosen}.values())
+            removed = list({scheduler.scheduler_id: scheduler for scheduler in remove
+                            if scheduler.scheduler_id in chosen}.values())
+
+            through.objects.bulk_create([through(account_id=self.pk, scheduler_id=scheduler.scheduler_id)
+                                         for scheduler in added])
+            ChoiceSlot.objects.bulk_create([ChoiceSlot(account_id=self.pk,
+                                                       schedule_id=scheduler.schedule_id,
+                                                       scheduler_id=scheduler.scheduler_id)
+                                            for scheduler in added])
+            if removed:
+                removed_ids = [scheduler.scheduler_id for scheduler in removed]
+                through.objects.filter(account_id=self.pk, scheduler_id__in=removed_ids).delete()
+                ChoiceSlot.objects.filter(account_id=self.pk, scheduler_id__in=removed_ids).delete()
+            ledger.record(added)
+            ledger.record(removed, sign=-1)
+        return added, removed
+
+    def occupancy(self) -> tuple[int, set]:
+        """
+        Slots taken by the choices, see planning.models.occupancy_bits.
+
+        return format -- (bitmask of the slots, {chosen scheduler_id})
+        """
+        mask = 0
+        chosen = set()
+        for scheduler_id, occupancy in self.choices.values_list("scheduler_id", "occupancy"):
+            mask |= occupancy
+            chosen.add(scheduler_id)
+        return mask, chosen
+
+    @staticmethod
+    def slot_choices(rows, mask: int=-1) -> dict[tuple[int, int, str], list]:
+        """
+        Group CLASH_ROW rows of the conflict index by the occupancy bits their schedule takes.
+        Scheduler.occupancy holds the bits of the linked half too, they are in the other period
+        and cut off, the half is a choice of its own. A "1+3" choice is listed under block 1 and
+        block 3. Bits outside mask are left out.
+
+        return format -- {(semester, period, block): [scheduler_id]} in slot order
+        """
+        positions = {}
+        for scheduler_id, schedule_id, block, occupancy in rows:
+            bits = occupancy & period_bits(schedule_id) & mask
+            while bits:
+                bit = bits & -bits
+                positions.setdefault(bit.bit_length() - 1, (block, []))[1].append(scheduler_id)
+                bits ^= bit
 
-        for choice in choices:
-            schedule = choice.schedule
+        slots = {}
+        for position, (block, scheduler_ids) in sorted(positions.items()):
+            semester, period, slot = occupancy_slot(position)
+            # a block without a fixed slot is the only one taking its bit
+            slots[semester, period, SLOT_NAMES.get(slot, block)] = scheduler_ids
+        return slots
 
-            level = "a_level" if "A" in choice.course.level else "g_level"
-            hp = float(choice.course.hp) if "*" not in choice.course.hp else float(choice.course.hp[:-1])/2
+    def clashes(self) -> dict[tuple[int, int, str], list]:
+        """
+        Chosen schedulers that share an occupancy bit with another choice, see
+        planning.models.occupancy_bits, so a "1+3" choice clashes with a "1" choice.
 
-            key = (schedule.semester, schedule.period, level)
-            result_dict[key] = result_dict[key] + hp
-            
-            key = (schedule.semester, level)
-            result_dict[key] = result_dict[key] + hp
+        return format -- {(semester, period, block): [scheduler_id]}
+        """
+        rows = ChoiceSlot.objects.filter(account_id=self.pk).order_by("id").values_list(*CLASH_ROW)
+        return {slot: scheduler_ids for slot, scheduler_ids in self.slot_choices(rows).items() if len(scheduler_ids) > 1}
+
+    def clash_rows(self, scheduler: Scheduler):
+        """
+        Conflict index rows of the slots taking a bit of Scheduler.occupancy of scheduler, its
+        linked half included. The slot ids are worked out in memory, a bit of a fixed block is
+        also taken by the blocks naming it, e.g. "1+3", which sit in the free slots of the
+        period, so the (account, schedule) index only reads the choices in those slots.
+        """
+        ids = set()
+        bits = scheduler.occupancy
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            semester, period, slot = occupancy_slot(bit.bit_length() - 1)
+            period_ids = slot_ids(semester, period)
+            ids.add(period_ids[slot])
+            if SLOT_NAMES.get(slot, "").isdigit():
+                ids.update(period_ids[len(SLOT_BLOCKS):])
+
+        return (ChoiceSlot.objects.filter(account_id=self.pk, schedule_id__in=ids)
+                                  .exclude(scheduler_id__in=[half for half in (scheduler.scheduler_id, scheduler.linked_id)
+                                                             if half is not None])
+                                  .order_by("id")
+                                  .values_list(*CLASH_ROW))
+
+    def clashes_with(self, scheduler: Scheduler) -> dict[tuple[int, int, str], list]:
+        """
+        Choices that would clash with scheduler and its linked half, read with one index lookup
+        of the slots they could take, so the cost does not grow with the choices of the account.
+        Choosing the same scheduler again is not a clash.
+
+        return format -- {(semester, period, block): [scheduler_id]}
+        """
+        return self.slot_choices(self.clash_rows(scheduler), mask=scheduler.occupancy)
+
+
+class ChoiceSlot(models.Model):
+    """
+    Conflict index, the slot (semester, period, block) of every chosen scheduler of an account.
+    Kept in step by Account.update_choices, rebuilt with manage.py rebuild_ledgers.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="slots")
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE)
+    scheduler = models.ForeignKey(Scheduler, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["account", "scheduler"], name="unique_choice_slot")]
+        indexes = [models.Index(fields=["account", "schedule"], name="choiceslot_account_slot_idx")]
+
+    def __str__(self):
+        return f"{self.account_id}: {self.scheduler_id} in {self.schedule_id}"
 
-            key = (level)
-            result_dict[key] = result_dict[key] + hp
-        
+
+def choice_slots(account_id=None) -> set[tuple]:
+    """
+    Conflict index rows computed from the choices table, for one account or all of them.
+
+    return format -- {(account_id, scheduler_id, slot id)}
+    """
+    rows = Account.choices.through.objects
+    if account_id is not None:
+        rows = rows.filter(account_id=account_id)
+    return set(rows.values_list("account_id", "scheduler_id", "scheduler__schedule_id"))
+
+
+def ledger_column(semester: int, period: int, level: str) -> str:
+    return f"{level[0]}_{semester}_{period}"
+
+class HpLedger(models.Model):
+    """
+    A-level and G-level hp per semester and period of an account's choices.
+    Kept in step by Account.add_choices/remove_choices, rebuilt with manage.py rebuild_ledgers.
+    """
+    account = models.OneToOneField(Account, on_delete=models.CASCADE, primary_key=True, related_name="ledger")
+    a_7_1 = models.FloatField(default=0)
+    g_7_1 = models.FloatField(default=0)
+    a_7_2 = models.FloatField(default=0)
+    g_7_2 = models.FloatField(default=0)
+    a_8_1 = models.FloatField(default=0)
+    g_8_1 = models.FloatField(default=0)
+    a_8_2 = models.FloatField(default=0)
+    g_8_2 = models.FloatField(default=0)
+    a_9_1 = models.FloatField(default=0)
+    g_9_1 = models.FloatField(default=0)
+    a_9_2 = models.FloatField(default=0)
+    g_9_2 = models.FloatField(default=0)
+
+    COLUMNS = [ledger_column(semester, period, level)
+               for semester in SEMESTERS
+               for period in PERIODS
+               for level in ("a_level", "g_level")]
+
+    def __str__(self):
+        return f"Ledger: {self.account}"
+
+    @classmethod
+    def for_account(cls, account: Account, lock: bool=False) -> "HpLedger":
+        """Ledger of the account, built from its choices the first time it is asked for."""
+        ledgers = cls.objects.select_for_update() if lock else cls.objects
+        try:
+            return ledgers.get(account=account)
+        except cls.DoesNotExist:
+            ledger = cls(account=account)
+            ledger.set_cells(account_cells(account.pk))
+            try:
+                with transaction.atomic():
+                    ledger.save(force_insert=True)
+            except IntegrityError:
+                return ledgers.get(account=account)
+            return ledger
+
+    def set_cells(self, cells: dict[str, float]) -> None:
+        for column in self.COLUMNS:
+            setattr(self, column, cells.get(column, 0))
+
+    def cells(self) -> dict[str, float]:
+        return {column: getattr(self, column) for column in self.COLUMNS}
+
+    def record(self, schedulers: list[Scheduler], sign: int=1) -> None:
+        """Add (or with sign=-1 subtract) the hp of schedulers to the ledger row."""
+        deltas = {}
+        for scheduler in schedulers:
+            schedule = scheduler.schedule
+            column = ledger_column(schedule.semester, schedule.period, course_level(scheduler.course.level))
+            if column in self.COLUMNS:
+                deltas[column] = deltas.get(column, 0) + sign * float(scheduler.course.credits)
+
+        if not deltas:
+            return
+        HpLedger.objects.filter(account_id=self.account_id).update(**{column: F(column) + delta
+                                                                      for column, delta in deltas.items()})
+        for column, delta in deltas.items():
+            setattr(self, column, getattr(self, column) + delta)
+
+    def level_hp(self) -> dict[float]:
+        """Same keys as accounts.overview.level_hp_rollup."""
+        result_dict = empty_level_hp()
+        for semester in SEMESTERS:
+            for period in PERIODS:
+                for level in ("a_level", "g_level"):
+                    add_level_hp(result_dict, semester, period, level,
+                                 getattr(self, ledger_column(semester, period, level)))
         return result_dict
 
-    
+
+def account_cells(account_id=None) -> dict:
+    """
+    Ledger cells computed from the choices table, for one account or all of them.
+
+    return format -- {account_id: {column: hp}} when account_id is None, else {column: hp}
+    """
+    rows = Account.choices.through.objects
+    if account_id is not None:
+        rows = rows.filter(account_id=account_id)
+
+    cells = {}
+    for pk, semester, period, level, credits in rows.values_list("account_id",
+                                                            "scheduler__schedule__semester",
+                                                            "scheduler__schedule__period",
+                                                            "scheduler__course__level",
+                                                            "scheduler__course__credits"):
+        column = ledger_column(semester, period, course_level(level))
+        if column in HpLedger.COLUMNS:
+            per_account = cells.setdefault(pk, {})
+            per_account[column] = per_account.get(column, 0) + float(credits)
+
+    if account_id is not None:
+        return cells.get(account_id, {})
+    return cells
@@ -0,0 +1,139 @@
+from planning.models import SchedulersProfiles, SLOTS_PER_PERIOD, occupancy_bits
+
+SEMESTERS = range(7, 10)
+PERIODS = range(1, 3)
+FREE_PROFILE_NAME = "Ingen inriktning"
+
+
+def course_level(level: str) -> str:
+    return "a_level" if "A" in level else "g_level"
+
+def empty_level_hp() -> dict:
+    result_dict = {}
+    for semester in SEMESTERS:
+        for period in PERIODS:
+            result_dict[semester, period, "a_level"] = 0
+            result_dict[semester, period, "g_level"] = 0
+
+        result_dict[semester, "a_level"] = 0
+        result_dict[semester, "g_level"] = 0
+
+    result_dict["a_level"] = 0
+    result_dict["g_level"] = 0
+    return result_dict
+
+def add_level_hp(result_dict: dict, semester: int, period: int, level: str, hp: float) -> None:
+    for key in ((semester, period, level), (semester, level), level):
+        result_dict[key] = result_dict.get(key, 0) + hp
+
+def level_hp_rollup(choices) -> dict:
+    """Sum hp per level, semester and period for schedulers with course and schedule loaded."""
+    result_dict = empty_level_hp()
+    for choice in choices:
+        add_level_hp(result_dict,
+                     choice.schedule.semester,
+                     choice.schedule.period,
+                     course_level(choice.course.level),
+                     choice.course.credits)
+    return result_dict
+
+def load_choices(account) -> list:
+    return list(account.choices
+                .select_related("course", "schedule")
+                .prefetch_related("course__main_fields"))
+
+def profile_rollup(account, choices) -> dict[str, float]:
+    """Hp per profile for the chosen courses.
+
+    A course counts towards every profile it is given in within the program. Instances
+    that were not chosen only count if none of their profiles is a profile of a chosen
+    instance, so a course is never counted twice for the same profile.
+    """
+    if not choices or account.program_id is None:
+        return {}
+
+    chosen_ids = {choice.scheduler_id for choice in choices}
+    rows = (SchedulersProfiles
+            .objects
+            .filter(scheduler__program_id=account.program_id,
+                    scheduler__course__in={choice.course_id for choice in choices})
+            .values_list("scheduler_id", "scheduler__course__credits", "profile_id", "profile__profile_name"))
+
+    schedulers = {}
+    chosen_profiles = set()
+    for scheduler_id, credits, profile_id, profile_name in rows:
+        schedulers.setdefault(scheduler_id, (credits, []))[1].append((profile_id, profile_name))
+        if scheduler_id in chosen_ids:
+            chosen_profiles.add(profile_id)
+
+    total_hp_by_profile = {}
+    for scheduler_id, (credits, profiles) in schedulers.items():
+        if (scheduler_id not in chosen_ids
+                and any(profile_id in chosen_profiles for profile_id, _ in profiles)):
+            continue
+        for _, profile_name in profiles:
+            total_hp_by_profile[profile_name] = total_hp_by_profile.get(profile_name, 0) + credits
+
+    total_hp_by_profile.pop(FREE_PROFILE_NAME, None)
+    return total_hp_by_profile
+
+def overlap_rollup(choices) -> dict[int, list[list]]:
+    """
+    Group choices taking a common slot, by the bits of planning.models.occupancy_bits so a
+    "1+3" block overlaps with "1" and "3". Groups are ordered by block.
+    """
+    slots = {}
+    for choice in choices:
+        bits = occupancy_bits(choice.schedule)
+        while bits:
+            bit = bits & -bits
+            slots.setdefault(bit.bit_length() - 1, []).append(choice)
+            bits ^= bit
+
+    overlapping_dict = {semester: [] for semester in SEMESTERS}
+    seen = set()
+    for position, schedulers in sorted(slots.items(), key=lambda item: (item[0] % SLOTS_PER_PERIOD, item[0])):
+        group = frozenset(scheduler.scheduler_id for scheduler in schedulers)
+        if len(schedulers) > 1 and group not in seen:
+            seen.add(group)
+            overlapping_dict[schedulers[0].schedule.semester].append(schedulers)
+    return overlapping_dict
+
+def build_overview(account) -> dict:
+    """Payload for ``OverviewSchema``, computed from a fixed number of queries."""
+    choices = load_choices(account)
+
+    level_hp = level_hp_rollup(choices)
+    total_hp_by_mainfield = {}
+    for choice in choices:
+        for field in choice.course.main_fields.all():
+            total_hp_by_mainfield[field.field_name] = (total_hp_by_mainfield.get(field.field_name, 0)
+                                                       + choice.course.credits)
+
+    overlapping_dict = overlap_rollup(choices)
+
+    response = {"field": total_hp_by_mainfield,
+                "profile": profile_rollup(account, choices),
+                "total_hp": level_hp["a_level"]+level_hp["g_level"],
+                "a_level": level_hp["a_level"],
+                "g_level": level_hp["g_level"]
+                }
+
+    for semester in SEMESTERS:
+        periods = {}
+        for period in PERIODS:
+            total_hp_in_period = level_hp[semester, period, "a_level"]+level_hp[semester, period, "g_level"]
+
+            periods[f"period_{period}"] = {"total": total_hp_in_period,
+                                           "a_level": level_hp[semester, period, "a_level"],
+                                           "g_level": level_hp[semester, period, "g_level"]}
+
+        total_hp_in_semester = level_hp[semester, "a_level"]+level_hp[semester, "g_level"]
+        response[f"semester_{semester}"] = {"overlap": overlapping_dict[semester],
+                                            "hp": {"total": total_hp_in_semester,
+                                                   "a_level": level_hp[semester, "a_level"],
+                                                   "g_level": level_hp[semester, "g_level"]
+                                                   },
+                                            "periods": periods
+                                            }
+    return response
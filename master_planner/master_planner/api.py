@@ -1,13 +1,16 @@
-from ninja import NinjaAPI
-from planning.models import Course, Scheduler, Examination, SchedulersProfiles
+from ninja import NinjaAPI, Query
+from planning.models import Course, Scheduler, Examination, SchedulersProfiles, PlannerRow, PLANNER_ROW_SOURCE
 from planning.models import Course, Scheduler
 from accounts.models import Account
-from django.db.models import Sum, F, Q, Case, When, IntegerField, Count
-from django.db.models.functions import Cast
+from accounts.overview import build_overview
+from planning.optimiser import PlanConstraints, PlanError, suggest_plans
+from planning.search import search_courses
 from planning.management.commands.scrappy.courses import fetch_course_info
 from .schemas import *
-from functools import reduce
-from operator import or_
+from .catalogue import (catalogue_page, catalogue_response, catalogue_rows, fast_serialisation, fitting_rows, render,
+                        row_payload, ROW_FIELDS)
+from django.http import HttpResponse
+import uuid
 
 api = NinjaAPI()
 
@@ -25,129 +28,7 @@ def overview(request):
     if not request.user.is_authenticated:
         return 401, {"message": "authentication failed"}
 
-    account_instance = request.user
-
-    total_hp_by_mainfield = (account_instance.choices
-                             .values_list("course__main_fields__field_name")
-                             .distinct()
-                             .annotate(total_hp=Sum(
-                                                    Case(
-                                                        When(course__hp__endswith="*", 
-                                                             then=Cast(F("course__hp"), IntegerField()) / 2
-                                                             ),
-                                                        default=Cast(F("course__hp"), IntegerField()),
-                                                        output_field=IntegerField()
-                                                        ),
-                                                    output_field=IntegerField()
-                                                    )
-                                       )
-                             )
-    total_hp_by_mainfield = dict(total_hp_by_mainfield)
-
-    distinct_scheduler_ids = account_instance.choices.values_list("scheduler_id").distinct()
-    distinct_course_codes = account_instance.choices.values_list("course_id").distinct()
-
-    filtered_choices = (Scheduler
-                        .objects
-                        .filter(scheduler_id__in=distinct_scheduler_ids,
-                                program=account_instance.program)
-                        .values_list("profiles")
-                        .distinct()
-                       )
-    
-    total_hp_by_profile = (Scheduler
-                           .objects
-                           .filter(course_id__in=distinct_course_codes,
-                                   program=account_instance.program
-                                   )
-                           .exclude(~Q(scheduler_id__in=distinct_scheduler_ids),
-                                       profiles__in=filtered_choices)
-                           .values_list("profiles__profile_name")
-                           .distinct()
-                           .annotate(total_hp=Sum(
-                                                  Case(
-                                                      When(course__hp__endswith="*", 
-                                                           then=Cast(F("course__hp"), IntegerField()) / 2
-                                                           ),
-                                                      default=Cast(F("course__hp"), IntegerField()),
-                                                      output_field=IntegerField()
-                                                      ),
-                                                  output_field=IntegerField()
-                                                  )
-                                     )
-                           )
-    total_hp_by_profile = dict(total_hp_by_profile)
-    if "Ingen inriktning" in total_hp_by_profile:
-        del total_hp_by_profile["Ingen inriktning"]
-
-    overlapping_schedules = (account_instance.choices
-                             .values("schedule__semester", "schedule__period", "schedule__block")
-                             .annotate(count=Count("scheduler_id"))
-                             .filter(count__gt=1)
-                             )
-    
-    if overlapping_schedules:
-
-
-        query = reduce(or_, (Q(schedule__semester=schedule["schedule__semester"],
-                               schedule__period=schedule["schedule__period"],
-                               schedule__block=schedule["schedule__block"]) for schedule in overlapping_schedules)) 
-
-        overlapping_choices = (account_instance
-                               .choices
-                               .filter(query)
-                               .order_by("schedule__block")
-                               .values_list("schedule__semester",
-                                            "schedule__period",
-                                            "schedule__block",
-                                            "scheduler_id")
-                               )
-
-        overlapping_dict = {7: {}, 8: {}, 9: {}}
-        # for scheduler_instance in overlapping_choices:
-        #     overlapping_dict[scheduler_instance.schedule.semester].append(scheduler_instance)
-        for sem, *period_block, scheduler_id in overlapping_choices:
-            period_block = tuple(period_block)
-            if period_block in overlapping_dict[sem]:
-                overlapping_dict[sem][period_block].append(Scheduler.objects.get(scheduler_id=scheduler_id))
-            else:
-                overlapping_dict[sem].update({period_block: [Scheduler.objects.get(scheduler_id=scheduler_id)]})
-        
-        for sem, courses in overlapping_dict.items():
-            overlapping_dict[sem] = list(courses.values())
-
-
-
-    else:
-        overlapping_dict = {7: [], 8: [], 9: []}
-    
-
-    level_hp = account_instance.level_hp()
-    response = {"field": total_hp_by_mainfield,
-                "profile": total_hp_by_profile,
-                "total_hp": level_hp["a_level"]+level_hp["g_level"],
-                "a_level": level_hp["a_level"],
-                "g_level": level_hp["g_level"]
-                }
-
-    for semester in range(7, 10):
-        periods = {}
-        for period in range(1, 3):
-            total_hp_in_period = level_hp[semester, period, "a_level"]+level_hp[semester, period, "g_level"]
-
-            periods[f"period_{period}"] = {"total": total_hp_in_period, 
-                                           "a_level": level_hp[semester, period, "a_level"], 
-                                           "g_level": level_hp[semester, period, "g_level"]}
-
-        total_hp_in_semester = level_hp[semester, "a_level"]+level_hp[semester, "g_level"]
-        response[f"semester_{semester}"] = {"overlap": overlapping_dict[semester],
-                                            "hp": {"total": total_hp_in_semester,
-                                                   "a_level": level_hp[semester, "a_level"],
-                                                   "g_level": level_hp[semester, "g_level"]
-                                                   },
-                                            "periods": periods
-                                            }
-    return 200, response
+    return 200, build_overview(request.user)
 
 @api.post("account/choice", url_name="post_choice", response={200: LinkedScheduler, 406: Error, 401: Error})
 def choice(request, data: ChoiceSchema):
@@ -156,16 +37,17 @@ def choice(request, data: ChoiceSchema):
     account = request.user
     
     try:
-        scheduler = Scheduler.objects.get(scheduler_id=data.scheduler_id)
+        scheduler = (Scheduler.objects
+                     .select_related("course", "schedule", "linked__course", "linked__schedule")
+                     .get(scheduler_id=data.scheduler_id))
     except Scheduler.DoesNotExist:
         return 406, {"message": f"Could not find scheduler object in scheduler table"}
 
-    account.choices.add(scheduler)
-    account.save()
     if scheduler.linked:
-        account.choices.add(scheduler.linked)
-        account.save()
+        account.add_choices([scheduler, scheduler.linked])
         return 200, {"scheduler_id": str(scheduler.linked.scheduler_id)}
+
+    account.add_choices([scheduler])
          
     return 200, {"scheduler_id": "-1"}
     
@@ -177,136 +59,263 @@ def choice(request, data: ChoiceSchema):
     account = request.user
     
     try:
-        scheduler = Scheduler.objects.get(scheduler_id=data.scheduler_id)
+        scheduler = (Scheduler.objects
+                     .select_related("course", "schedule", "linked__course", "linked__schedule")
+                     .get(scheduler_id=data.scheduler_id))
     except Scheduler.DoesNotExist:
         return 406, {"message": f"Could not find scheduler object in scheduler table"}
-    
-    account.choices.remove(scheduler)
-    account.save()
 
     if scheduler.linked:
-        account.choices.remove(scheduler.linked)
-        account.save()
+        account.remove_choices([scheduler, scheduler.linked])
         return 200, {"scheduler_id": str(scheduler.linked.scheduler_id)}
+
+    account.remove_choices([scheduler])
                     
     return 200, {"scheduler_id": "-1"}
     
+@api.post("account/choices/batch", url_name="batch_choices", response={200: ChoiceBatchResult, 406: Error, 401: Error})
+def batch_choices(request, data: ChoiceBatchSchema):
+    """
+    Apply many add/remove operations at once, the halves of linked courses follow their partner.
+    When a scheduler or its linked half occurs several times the last operation on the pair wins.
+    """
+    if not request.user.is_authenticated:
+        return 401, {"message": "authentication failed"}
+    account = request.user
+
+    scheduler_ids = list(dict.fromkeys(operation.scheduler_id for operation in data.operations))
+    schedulers = (Scheduler.objects
+                  .select_related("course", "schedule", "linked__course", "linked__schedule")
+                  .in_bulk(scheduler_ids))
+    missing = [str(scheduler_id) for scheduler_id in scheduler_ids if scheduler_id not in schedulers]
+    if missing:
+        return 406, {"message": f"Could not find scheduler objects {', '.join(missing)} in scheduler table"}
+
+    # keyed on the pair, the halves of a linked course are one choice
+    actions = {}
+    for operation in data.operations:
+        scheduler = schedulers[operation.scheduler_id]
+        pair = frozenset((scheduler.scheduler_id, scheduler.linked_id)) - {None}
+        actions.pop(pair, None)
+        actions[pair] = (scheduler, operation.action)
+
+    add, remove, linked = [], [], []
+    for scheduler, action in actions.values():
+        halves = [scheduler, scheduler.linked] if scheduler.linked else [scheduler]
+        (add if action == "add" else remove).extend(halves)
+        if scheduler.linked:
+            linked.append(str(scheduler.linked.scheduler_id))
+
+    added, removed = account.update_choices(add=add, remove=remove)
+    return 200, {"added": [str(scheduler.scheduler_id) for scheduler in added],
+                 "removed": [str(scheduler.scheduler_id) for scheduler in removed],
+                 "linked": linked}
+
+@api.post("account/plan", url_name="suggest_plan", response={200: PlanResultSchema, 406: Error, 401: Error})
+def suggest_plan(request, data: PlanRequestSchema):
+    """Plans for semesters 7-9 without clashes that meet the requirements, see planning/optimiser.py."""
+    if not request.user.is_authenticated:
+        return 401, {"message": "authentication failed"}
+    account = request.user
+    if account.program_id is None:
+        return 406, {"message": "account has no program"}
+
+    lock = list(data.lock)
+    if data.keep_choices:
+        lock += account.choices.values_list("scheduler_id", flat=True)
+    constraints = PlanConstraints(min_total_hp=data.min_total_hp,
+                                  min_profile_hp=data.min_profile_hp,
+                                  min_a_level_hp=data.min_a_level_hp,
+                                  min_field_hp=data.min_field_hp,
+                                  max_period_hp=data.max_period_hp,
+                                  lock=lock,
+                                  exclude=data.exclude)
+    try:
+        return 200, suggest_plans(account.program_id, data.profile_code, constraints,
+                                  top_k=data.top_k, time_budget=data.time_budget)
+    except PlanError as error:
+        return 406, {"message": str(error)}
+
+def clash_payload(slots: dict) -> list[dict]:
+    return [{"semester": semester,
+             "period": period,
+             "block": block,
+             "schedulers": [str(scheduler_id) for scheduler_id in scheduler_ids]}
+            for (semester, period, block), scheduler_ids in slots.items()]
+
+@api.get("account/clashes", url_name="clashes", response={200: ClashesSchema, 401: Error})
+def clashes(request):
+    if not request.user.is_authenticated:
+        return 401, {"message": "authentication failed"}
+
+    return 200, {"clashes": clash_payload(request.user.clashes())}
+
+@api.get("account/clashes/{scheduler_id}", url_name="would_clash", response={200: ClashCheckSchema, 406: Error, 401: Error})
+def would_clash(request, scheduler_id: uuid.UUID):
+    """Choices that adding scheduler_id (and its linked half) would clash with."""
+    if not request.user.is_authenticated:
+        return 401, {"message": "authentication failed"}
+
+    try:
+        scheduler = Scheduler.objects.get(scheduler_id=scheduler_id)
+    except Scheduler.DoesNotExist:
+        return 406, {"message": f"Could not find scheduler object in scheduler table"}
+
+    slots = request.user.clashes_with(scheduler)
+    return 200, {"clash": bool(slots), "clashes": clash_payload(slots)}
+
 @api.get("account/choices/{profile_code}", response={200: Semesters, 401: Error})
 def choice(request, profile_code):
     if not request.user.is_authenticated:
         return 401, {"message": "authentication failed"}
     account = request.user
     
+    level_hp = account.level_hp()
+    profiles = [profile_code] if profile_code == "free" else [profile_code, "free"]
+    rows = (SchedulersProfiles
+            .objects
+            .filter(scheduler__account=account, profile_id__in=profiles)
+            .order_by("pk"))
+
+    fast = fast_serialisation()
+    if fast:
+        rows = rows.values_list("profile_id", *[PLANNER_ROW_SOURCE[field] for field in ROW_FIELDS])
+        entries = ((profile_id, row_payload(*values)) for profile_id, *values in rows)
+    else:
+        entries = ((row.profile_id, row) for row in rows.select_related("scheduler__course", "scheduler__schedule"))
+
+    # bucket the rows by period, a scheduler given in the profile replaces its free row
+    free_rows = {}
+    profile_rows = {}
+    for profile_id, row in entries:
+        bucket = free_rows if profile_id == "free" else profile_rows
+        if fast:
+            slot, scheduler_id = (row["schedule"]["semester"], row["schedule"]["period"]), row["scheduler_id"]
+        else:
+            slot, scheduler_id = (row.scheduler.schedule.semester, row.scheduler.schedule.period), row.scheduler_id
+        bucket.setdefault(slot, {})[scheduler_id] = row
+
     course_choices = {}
     total_hp = 0
-    level_hp = account.level_hp()
-   
-    # sum hp for periods and semesters
     for semester in range(7, 10):
         semester_hp = 0
         periods = {}
         for period in range(1, 3):
-            choices = account.choices.filter(schedule__semester=semester, schedule__period=period)
-            period_hp = choices.aggregate(
-                hp=Sum(
-                    Case(
-                        When(course__hp__endswith="*", then=Cast(F("course__hp"), IntegerField()) / 2),
-                        default=Cast(F("course__hp"), IntegerField()),
-                        output_field=IntegerField()
-                        ),
-                    output_field=IntegerField()
-                    )
-                )
-            if profile_code == "free":
-                choices_vof = SchedulersProfiles.objects.filter(scheduler__in=choices,
-                                                                profile_id=profile_code,
-                                                                scheduler__schedule__semester=semester,
-                                                                scheduler__schedule__period=period)
-            else:
-                profile_choices = SchedulersProfiles.objects.values_list("scheduler").filter(scheduler__in=choices,
-                                                                         profile_id=profile_code, 
-                                                                         scheduler__schedule__semester=semester,
-                                                                         scheduler__schedule__period=period)     
-                          
-                choices_vof = SchedulersProfiles.objects.filter(Q(scheduler__in=choices,
-                                                                  profile_id=profile_code, 
-                                                                  scheduler__schedule__semester=semester,
-                                                                  scheduler__schedule__period=period
-                                                                  )
-                                                                |
-                                                                Q(scheduler__in=choices,
-                                                                    profile_id="free", 
-                                                                    scheduler__schedule__semester=semester,
-                                                                    scheduler__schedule__period=period
-                                                                    )
-                                                                ).exclude(scheduler__in=profile_choices,
-                                                                           profile_id="free")
-
-            if period_hp["hp"] == None:
-                period_hp["hp"] = 0
-            
-            periods[f"period_{period}"] = {"hp": {"total": period_hp["hp"], 
-                                                  "a_level": level_hp[semester, period, "a_level"], 
-                                                  "g_level": level_hp[semester, period, "g_level"]}, 
-                                           "courses": list(choices_vof)}
-
-            semester_hp += period_hp["hp"]
+            period_hp = level_hp[semester, period, "a_level"] + level_hp[semester, period, "g_level"]
+            choices_vof = {**free_rows.get((semester, period), {}), **profile_rows.get((semester, period), {})}
+
+            periods[f"period_{period}"] = {"hp": hp_payload(period_hp, 
+                                                            level_hp[semester, period, "a_level"], 
+                                                            level_hp[semester, period, "g_level"]), 
+                                           "courses": list(choices_vof.values())}
+
+            semester_hp += period_hp
 
         total_hp += semester_hp
-        course_choices[f"semester_{semester}"] = {"hp": {"total": semester_hp,
-                                                         "a_level": level_hp[semester, "a_level"], 
-                                                         "g_level": level_hp[semester, "g_level"]}, 
+        course_choices[f"semester_{semester}"] = {"hp": hp_payload(semester_hp,
+                                                                   level_hp[semester, "a_level"], 
+                                                                   level_hp[semester, "g_level"]), 
                                                   "periods": periods}
     
-    course_choices["hp"] = {"total": total_hp,
-                            "a_level": level_hp["a_level"],
-                            "g_level": level_hp["g_level"]
-                            }
+    course_choices["hp"] = hp_payload(total_hp, level_hp["a_level"], level_hp["g_level"])
+    if fast:
+        # key order of the Semesters schema
+        course_choices = {"hp": course_choices.pop("hp"), **course_choices}
+        return HttpResponse(render(None, course_choices), content_type="application/json")
     return 200, course_choices
 
+def hp_payload(total: float, a_level: float, g_level: float) -> dict[str, float]:
+    return {"total": float(total), "a_level": float(a_level), "g_level": float(g_level)}
+
+def planner_periods(rows, fast: bool=False) -> dict[int, dict[str, list]]:
+    """Bucket planner rows, or their row_payload dicts when fast, by semester and period keeping their order."""
+    semesters = {}
+    for row in rows:
+        semester, period = (row["schedule"]["semester"], row["schedule"]["period"]) if fast else (row.semester, row.period)
+        if period in (1, 2):
+            periods = semesters.setdefault(semester, {"period_1": [], "period_2": []})
+            periods[f"period_{period}"].append(row)
+    return semesters
+
+def planner_rows(rows, fast: bool) -> list:
+    if fast:
+        return [row_payload(*values) for values in rows.values_list(*ROW_FIELDS)]
+    return list(rows)
+
+def fitting_periods(account, profile: str) -> dict[int, dict[str, list]]:
+    """Catalogue rows of the profile that fit the account's schedule, by semester and period."""
+    occupancy, chosen = account.occupancy()
+    rows = fitting_rows(catalogue_rows(account.program_id, profile), occupancy, chosen)
+    return planner_periods(rows, fast=True)
+
 @api.get("courses/{profile}/{semester}", response={200: SemesterCourses, 401: Error})
-def get_semester_courses(request, profile, semester):
+def get_semester_courses(request, profile, semester, fits: bool=False):
+    """With fits only the courses that do not clash with the choices (and the choices)."""
     if not request.user.is_authenticated:
         return 401, {"message": "authentication failed"}
-    program = request.user.program
-    
 
-    period1 = SchedulersProfiles.objects.filter(scheduler__program=program, 
-                                       profile=profile, 
-                                       scheduler__schedule__semester=semester,
-                                       scheduler__schedule__period=1)
-    period2 = SchedulersProfiles.objects.filter(scheduler__program=program, 
-                                       profile=profile, 
-                                       scheduler__schedule__semester=semester,
-                                       scheduler__schedule__period=2)
-    
-    data = {"period_1": list(period1),
-            "period_2": list(period2)}
-    return 200, data
+    if fits:
+        periods = fitting_periods(request.user, profile).get(int(semester), {"period_1": [], "period_2": []})
+        return HttpResponse(render(None, periods), content_type="application/json")
+
+    fast = fast_serialisation()
+    def build():
+        rows = PlannerRow.objects.filter(program_code=request.user.program_id,
+                                         profile_code=profile,
+                                         semester=semester).order_by("id")
+        semesters = planner_periods(planner_rows(rows, fast), fast)
+        return semesters.get(int(semester), {"period_1": [], "period_2": []})
+
+    schema = None if fast else PlannerSemesterCourses
+    return catalogue_response(request, schema, build, request.user.program_id, profile, semester)
 
 @api.get("courses/{profile}", response={200: AllSemesterCourses, 401: Error})
-def get_profile_courses(request, profile):
+def get_profile_courses(request, profile, fits: bool=False):
+    """With fits only the courses that do not clash with the choices (and the choices)."""
     if not request.user.is_authenticated:
         return 401, {"message": "authentication failed"}
-    program = request.user.program
-    
-    courses = {"semesters": None}
-    semesters = {}
-    for semester in range(7, 10):
-        period1 = SchedulersProfiles.objects.filter(scheduler__program=program, 
-                                        profile=profile,
-                                        scheduler__schedule__semester=semester,
-                                        scheduler__schedule__period=1)
-        period2 = SchedulersProfiles.objects.filter(scheduler__program=program, 
-                                        profile=profile, 
-                                        scheduler__schedule__semester=semester,
-                                        scheduler__schedule__period=2)
-        sem_courses = {"period_1": list(period1),
-                "period_2": list(period2)}
-        semesters[semester] = sem_courses
-
-    courses["semesters"] = semesters
-    return 200, courses
+
+    if fits:
+        semesters = fitting_periods(request.user, profile)
+        return HttpResponse(render(None, {"semesters": {semester: semesters.get(semester, {"period_1": [], "period_2": []})
+                                                        for semester in range(7, 10)}}),
+                            content_type="application/json")
+
+    fast = fast_serialisation()
+    def build():
+        rows = PlannerRow.objects.filter(program_code=request.user.program_id,
+                                         profile_code=profile,
+                                         semester__in=range(7, 10)).order_by("id")
+        semesters = planner_periods(planner_rows(rows, fast), fast)
+        return {"semesters": {semester: semesters.get(semester, {"period_1": [], "period_2": []})
+                              for semester in range(7, 10)}}
+
+    schema = None if fast else PlannerAllSemesterCourses
+    return catalogue_response(request, schema, build, request.user.program_id, profile)
+
+@api.get("catalogue/{profile}", url_name="query_catalogue", response={200: CataloguePageSchema, 406: Error, 401: Error})
+def query_catalogue(request, profile, filters: CatalogueQuerySchema=Query(...)):
+    """
+    Filtered page of the catalogue of a profile, pass the returned next as after for the following page.
+    fits leaves out courses that clash with the choices but keeps the choices, not_chosen leaves them out.
+    """
+    if not request.user.is_authenticated:
+        return 401, {"message": "authentication failed"}
+
+    try:
+        return 200, catalogue_page(request.user, profile, filters)
+    except ValueError as error:
+        return 406, {"message": str(error)}
+
+@api.get("search", url_name="search_courses", response={200: SearchResultSchema, 401: Error})
+def search(request, q: str, limit: int=Query(20, ge=1, le=50)):
+    """Courses of the account's program matching q by code, name, examinator, main field or examination."""
+    if not request.user.is_authenticated:
+        return 401, {"message": "authentication failed"}
+
+    codes = search_courses(q, program_code=request.user.program_id, limit=limit)
+    courses = Course.objects.in_bulk(codes)
+    return 200, {"courses": [courses[code] for code in codes if code in courses]}
 
 @api.get("get_extra_course_info/{course_code}", response={200: ExaminationDetails, 401: Error})
 def get_extra_course_info(request, course_code):
@@ -0,0 +1,160 @@
+"""
+Cached catalogue responses.
+
+The course catalogue only changes when populate_db runs, so the serialised
+payloads are stored in the "catalogue" cache keyed by (program, profile, semester,
+catalogue version) and answered with ETag/Last-Modified so browsers can revalidate.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from ninja.responses import NinjaJSONEncoder
+from django.db.models import F, Q
+from planning.models import CatalogueVersion, Course, PlannerRow
+from typing import Any, Callable
+import hashlib
+import json
+import uuid
+
+CATALOGUE_CACHE = "catalogue"
+
+
+def catalogue_key(version: int, *parts: Any) -> str:
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f"catalogue:{version}:{digest}"
+
+# columns of a planner row in the order row_payload takes them
+ROW_FIELDS = ("vof", "scheduler_id", "course_code", "course_name", "hp", "level", "examinator",
+              "block", "semester", "period")
+
+def fast_serialisation() -> bool:
+    return settings.FAST_SERIALISATION
+
+def row_payload(vof, scheduler_id, course_code, course_name, hp, level, examinator, block, semester, period) -> dict:
+    """One catalogue row in the wire format of ExtendedSchedulerSchema, without validation."""
+    return {"vof": vof,
+            "scheduler_id": str(scheduler_id),
+            "course": {"course_code": course_code,
+                       "course_name": course_name,
+                       "hp": hp,
+                       "level": level,
+                       "examinator": examinator},
+            "schedule": {"block": block, "semester": semester, "period": period}}
+
+def catalogue_rows(program_code: str, profile: str) -> list[tuple[dict, int]]:
+    """
+    Planner rows of a profile in semesters 7-9 as (row_payload, occupancy), in catalogue order.
+    Cached per catalogue version like the payloads, so filtering them costs no query.
+    """
+    cache = caches[CATALOGUE_CACHE]
+    key = catalogue_key(CatalogueVersion.current().version, "rows", program_code, profile)
+    rows = cache.get(key)
+    if rows is None:
+        rows = [(row_payload(*values[:-1]), values[-1])
+                for values in PlannerRow.objects.filter(program_code=program_code,
+                                                        profile_code=profile,
+                                                        semester__in=range(7, 10))
+                                                .order_by("id")
+                                                .values_list(*ROW_FIELDS, "occupancy")]
+        cache.set(key, rows)
+    return rows
+
+def fitting_rows(rows: list[tuple[dict, int]], occupancy: int, chosen: set) -> list[dict]:
+    """Rows whose slots are all free in occupancy, chosen rows are kept."""
+    chosen = {str(scheduler_id) for scheduler_id in chosen}
+    return [row for row, row_occupancy in rows
+            if not row_occupancy & occupancy or row["scheduler_id"] in chosen]
+
+# keyset of catalogue pages, planner rows are recreated on every import so their id can not be used
+PAGE_KEY = ("semester", "period", "course_code", "scheduler_id")
+
+def page_cursor(semester: int, period: int, course_code: str, scheduler_id) -> str:
+    return f"{semester}.{period}.{course_code}.{scheduler_id}"
+
+def after_cursor(cursor: str) -> Q:
+    """Rows after cursor in PAGE_KEY order."""
+    try:
+        semester, period, course_code, scheduler_id = cursor.split(".")
+        key = (int(semester), int(period), course_code, uuid.UUID(scheduler_id))
+    except ValueError:
+        raise ValueError(f"invalid cursor {cursor}")
+    after = Q()
+    for i, column in enumerate(PAGE_KEY):
+        after |= Q(**dict(zip(PAGE_KEY[:i], key)), **{f"{column}__gt": key[i]})
+    return after
+
+def catalogue_page(account, profile: str, filters) -> dict:
+    """
+    One page of the planner rows of a profile, filtered in the database and walked in PAGE_KEY order.
+
+    arguments:
+    filters -- CatalogueQuerySchema, fields is a comma separated subset of ROW_FIELDS,
+               after the next cursor of the previous page, which stays valid across imports
+
+    return format -- {"courses": [{field: value}], "next": cursor of the following page or None}
+    """
+    fields = filters.fields.split(",") if filters.fields else list(ROW_FIELDS)
+    unknown = set(fields) - set(ROW_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown fields {', '.join(sorted(unknown))}, choose from {', '.join(ROW_FIELDS)}")
+    if "scheduler_id" not in fields:
+        fields.insert(0, "scheduler_id")
+
+    rows = PlannerRow.objects.filter(program_code=account.program_id, profile_code=profile)
+    for column in ("semester", "period", "block", "vof"):
+        if getattr(filters, column) is not None:
+            rows = rows.filter(**{column: getattr(filters, column)})
+    if filters.level:
+        rows = rows.filter(level__startswith=filters.level)
+    if filters.main_field:
+        rows = rows.filter(course_code__in=Course.main_fields.through.objects
+                                                 .filter(mainfield_id=filters.main_field)
+                                                 .values("course_id"))
+    if filters.fits or filters.not_chosen:
+        occupancy, chosen = account.occupancy()
+        if filters.fits:
+            # like fitting_rows, a choice clashes with itself but is kept, not_chosen removes it
+            rows = rows.annotate(clash=F("occupancy").bitand(occupancy)).filter(Q(clash=0) | Q(scheduler_id__in=chosen))
+        if filters.not_chosen:
+            rows = rows.exclude(scheduler_id__in=chosen)
+    if filters.after is not None:
+        rows = rows.filter(after_cursor(filters.after))
+
+    page = list(rows.order_by(*PAGE_KEY).values_list(*PAGE_KEY, *fields)[:filters.limit + 1])
+    return {"courses": [dict(zip(fields, values[len(PAGE_KEY):])) for values in page[:filters.limit]],
+            "next": page_cursor(*page[filters.limit - 1][:len(PAGE_KEY)]) if len(page) > filters.limit else None}
+
+def render(schema, data: Any) -> bytes:
+    """JSON of data validated through schema, or of data as it is when schema is None."""
+    if schema is None:
+        return json.dumps(data, cls=NinjaJSONEncoder).encode()
+    return json.dumps(schema.from_orm(data).dict(), cls=NinjaJSONEncoder).encode()
+
+def catalogue_response(request, schema, build: Callable[[], Any], *parts: Any) -> HttpResponse:
+    """
+    Respond with the catalogue payload identified by parts.
+
+    build is only called on a cache miss and returns the data to validate with schema,
+    or with schema None the already serialisable payload.
+    A request whose If-None-Match/If-Modified-Since still matches gets a 304 without a body.
+    """
+    catalogue = CatalogueVersion.current()
+    key = catalogue_key(catalogue.version, *parts)
+    etag = f'"{key.split(":", 1)[1].replace(":", "-")}"'
+    last_modified = int(catalogue.updated_at.timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        cache = caches[CATALOGUE_CACHE]
+        body = cache.get(key)
+        if body is None:
+            body = render(schema, build())
+            cache.set(key, body)
+        response = HttpResponse(body, content_type="application/json")
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -2,7 +2,7 @@ from ninja import ModelSchema, Schema, Field
 from ninja.orm import create_schema
 from planning.models import Schedule, Course, Scheduler, Examination, SchedulersProfiles, Profile
 from planning.management.commands.scrappy.courses import fetch_course_info
-from typing import List, Dict
+from typing import Any, List, Dict, Literal, Optional
 import uuid
 
 class ProfileSchema(ModelSchema):
@@ -46,6 +46,20 @@ class SemesterCourses(Schema):
 class AllSemesterCourses(Schema):
    semesters: dict[str, SemesterCourses] 
 
+class PlannerRowSchema(Schema):
+    """Same wire format as ExtendedSchedulerSchema, read from a PlannerRow."""
+    vof: str
+    scheduler_id: uuid.UUID
+    course: CourseSchema
+    schedule: ScheduleSchema
+
+class PlannerSemesterCourses(Schema):
+    period_1: List[PlannerRowSchema]
+    period_2: List[PlannerRowSchema]
+
+class PlannerAllSemesterCourses(Schema):
+    semesters: dict[str, PlannerSemesterCourses]
+
 class MySchedulerSchema(ModelSchema):
     course: CourseSchema
     schedule: ScheduleSchema
@@ -66,9 +80,9 @@ class ExaminationDetails(Schema):
     course: CourseSchema
 
 class HpSchema(Schema):
-    total: int
-    a_level: int
-    g_level: int
+    total: float
+    a_level: float
+    g_level: float
 
 class MyCourseSchema(Schema):
     hp: HpSchema
@@ -100,6 +114,76 @@ class ExaminationSchema:
 class ChoiceSchema(Schema):
     scheduler_id: uuid.UUID
 
+class ChoiceOperationSchema(Schema):
+    action: Literal["add", "remove"]
+    scheduler_id: uuid.UUID
+
+class ChoiceBatchSchema(Schema):
+    operations: List[ChoiceOperationSchema]
+
+class ChoiceBatchResult(Schema):
+    added: List[str]
+    removed: List[str]
+    linked: List[str]
+
+class PlanRequestSchema(Schema):
+    profile_code: str
+    min_total_hp: float = 0
+    min_profile_hp: float = 0
+    min_a_level_hp: float = 0
+    min_field_hp: Dict[str, float] = {}
+    max_period_hp: Optional[float] = None
+    lock: List[uuid.UUID] = []
+    exclude: List[str] = []
+    keep_choices: bool = False
+    top_k: int = Field(3, ge=1, le=10)
+    time_budget: float = Field(1.0, gt=0, le=5)
+
+class PlanSchema(Schema):
+    profile_hp: float
+    hp: float
+    a_level_hp: float
+    schedulers: List[str]
+    courses: List[str]
+
+class PlanResultSchema(Schema):
+    complete: bool
+    nodes: int
+    plans: List[PlanSchema]
+
+class CatalogueQuerySchema(Schema):
+    semester: Optional[int] = None
+    period: Optional[int] = None
+    block: Optional[str] = None
+    level: Optional[str] = None
+    main_field: Optional[str] = None
+    vof: Optional[str] = None
+    fits: bool = False
+    not_chosen: bool = False
+    after: Optional[str] = None
+    limit: int = Field(50, ge=1, le=200)
+    fields: Optional[str] = None
+
+class CataloguePageSchema(Schema):
+    courses: List[Dict[str, Any]]
+    next: Optional[str]
+
+class SearchResultSchema(Schema):
+    courses: List[CourseSchema]
+
+class ClashSchema(Schema):
+    semester: int
+    period: int
+    block: str
+    schedulers: List[str]
+
+class ClashesSchema(Schema):
+    clashes: List[ClashSchema]
+
+class ClashCheckSchema(Schema):
+    clash: bool
+    clashes: List[ClashSchema]
+
 class Error(Schema):
     message: str 
     
@@ -116,11 +200,11 @@ class SemesterOverviewSchema(Schema):
     hp: HpSchema
 
 class OverviewSchema(Schema):
-    total_hp: int
-    a_level: int
-    g_level: int
-    field: Dict[str, int]
-    profile: Dict[str, int]
+    total_hp: float
+    a_level: float
+    g_level: float
+    field: Dict[str, float]
+    profile: Dict[str, float]
     semester_7: SemesterOverviewSchema
     semester_8: SemesterOverviewSchema
     semester_9: SemesterOverviewSchema
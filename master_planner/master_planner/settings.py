@@ -110,6 +110,27 @@ else:
 
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The catalogue cache holds serialised course lists, point it at a shared
+# backend (file based, redis, ...) when running more than one process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalogue': {
+        'BACKEND': os.getenv('CATALOGUE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CATALOGUE_CACHE_LOCATION', 'catalogue'),
+        'TIMEOUT': None,
+    },
+}
+
+# Build catalogue and choices payloads straight from values() rows instead of
+# validating every row through the pydantic schemas, the JSON is the same.
+FAST_SERIALISATION = os.getenv('FAST_SERIALISATION', '').lower() in ('1', 'true', 'yes')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import *
 
-models = [Program, Profile, Course, Schedule, MainField, Scheduler, Examination, SchedulersProfiles]
+models = [Program, Profile, Course, Schedule, MainField, Scheduler, Examination, SchedulersProfiles, ImportCheckpoint]
 
 admin.site.register(models)
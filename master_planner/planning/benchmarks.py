@@ -0,0 +1,367 @@
+"""
+Benchmark suites for ``manage.py benchmark <suite>``.
+
+Every suite seeds its own synthetic data, the command runs it inside a transaction
+that is rolled back afterwards so the database is left as it was.
+"""
+from django.db import connection
+from django.db.models import Sum, F, Case, When, IntegerField
+from django.db.models.functions import Cast
+from planning.models import (Course, Examination, PlannerRow, Program, Profile, Scheduler, register_courses,
+                             register_course_details, rebuild_planner_rows)
+import statistics
+import time
+
+SUITES = {}
+
+def suite(name: str):
+    def register(function):
+        SUITES[name] = function
+        return function
+    return register
+
+def timeit(function, repeat: int) -> dict[str, float]:
+    """Run function repeat times, returns timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        st = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - st) * 1000)
+    return summarise(timings)
+
+def summarise(timings: list[float]) -> dict[str, float]:
+    timings = sorted(timings)
+    return {"median": statistics.median(timings),
+            "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            "min": timings[0]}
+
+def report(stdout, name: str, timings: dict[str, float]) -> None:
+    stdout.write(f"{name:<40} median {timings['median']:8.2f} ms  "
+                 f"p95 {timings['p95']:8.2f} ms  min {timings['min']:8.2f} ms")
+
+def synthetic_courses(schedulers: int, program_code: str="6CBNC", profiles: int=6) -> list[dict]:
+    """
+    Course rows in the format returned by ProgramPlan.courses(), one scheduler per row.
+    Every tenth course is split over both periods of a semester.
+    """
+    courses = []
+    index = 0
+    while len(courses) < schedulers:
+        code = f"B{index:05}"
+        semester = 7 + index % 3
+        block = str(1 + index % 4)
+        level = "A1X" if index % 3 else "G2X"
+        profile_code = f"BP{index % profiles}" if index % 4 else "free"
+        periods = (1, 2) if index % 10 == 0 else (1 + index % 2,)
+        hp = "6*" if len(periods) == 2 else ("7.5" if index % 7 == 0 else "6")
+        for period in periods:
+            courses.append({"course_code": code,
+                            "course_name": f"benchmark course {index}",
+                            "hp": hp,
+                            "program_code": program_code,
+                            "level": level,
+                            "block": block,
+                            "vof": "v",
+                            "profile_code": profile_code,
+                            "period": period,
+                            "semester": semester})
+        index += 1
+    return courses[:schedulers]
+
+def seed_catalogue(schedulers: int, program_code: str="6CBNC", profiles: int=6) -> Program:
+    program = Program.objects.create(program_code=program_code, program_name="benchmark program")
+    profile_list = [Profile(profile_code=f"BP{i}", profile_name=f"benchmark profile {i}") for i in range(profiles)]
+    profile_list.append(Profile(profile_code="free", profile_name="Ingen inriktning"))
+    Profile.objects.bulk_create(profile_list, ignore_conflicts=True)
+    program.profiles.add(*[profile.profile_code for profile in profile_list])
+    register_courses(synthetic_courses(schedulers, program_code, profiles))
+    return program
+
+
+LEGACY_HP = Sum(Case(When(course__hp__endswith="*", then=Cast(F("course__hp"), IntegerField()) / 2),
+                     default=Cast(F("course__hp"), IntegerField()),
+                     output_field=IntegerField()),
+                output_field=IntegerField())
+
+@suite("hp_aggregates")
+def hp_aggregates(stdout, size: int=5000, repeat: int=20, **options):
+    """Cast/Case hp aggregate against the parsed credits column."""
+    program = seed_catalogue(size)
+    schedulers = Scheduler.objects.filter(program=program)
+    grouped = schedulers.values("schedule__semester", "schedule__period")
+    stdout.write(f"{schedulers.count()} schedulers")
+
+    report(stdout, "total, Cast(hp)", timeit(lambda: schedulers.aggregate(hp=LEGACY_HP), repeat))
+    report(stdout, "total, Sum(credits)", timeit(lambda: schedulers.aggregate(hp=Sum("course__credits")), repeat))
+    report(stdout, "per semester/period, Cast(hp)", timeit(lambda: list(grouped.annotate(hp=LEGACY_HP)), repeat))
+    report(stdout, "per semester/period, Sum(credits)",
+           timeit(lambda: list(grouped.annotate(hp=Sum("course__credits"))), repeat))
+
+
+def synthetic_course_pages(courses: list[str]) -> list[dict]:
+    """Course pages in the format returned by fetch_course_info."""
+    return [{"course_code": code,
+             "examinator": f"examinator {index % 50}",
+             "location": "Valla" if index % 5 else "Norrköping",
+             "main_field": ["Datateknik", "Datavetenskap"] if index % 2 else ["Matematik"],
+             "examination": [{"examination_code": exam, "hp": "3", "name": exam.lower(), "grading": "U, 3, 4, 5"}
+                             for exam in ("LAB1", "TEN1")]}
+            for index, code in enumerate(courses)]
+
+def legacy_course_details(data: list[dict]) -> None:
+    """register_course_details before batching, two UPDATEs per course."""
+    for course_data in data:
+        updated_course = Course.objects.filter(course_code=course_data["course_code"])
+        updated_course.update(examinator=course_data["examinator"])
+        updated_course.update(campus=course_data["location"])
+    Examination.objects.bulk_create([Examination(code=examination["examination_code"],
+                                                 course_id=course_data["course_code"],
+                                                 hp=examination["hp"],
+                                                 name=examination["name"],
+                                                 grading=examination["grading"])
+                                     for course_data in data for examination in course_data["examination"]],
+                                    ignore_conflicts=True)
+
+@suite("course_details")
+def course_details(stdout, size: int=3000, repeat: int=3, batch_size: int=500, **options):
+    """Per-course UPDATEs against the batched register_course_details, size is the number of courses."""
+    seed_catalogue(size)
+    pages = synthetic_course_pages(list(Course.objects.values_list("course_code", flat=True)))
+    stdout.write(f"{len(pages)} courses on {connection.vendor}")
+
+    report(stdout, "per-course updates", timeit(lambda: legacy_course_details(pages), repeat))
+    report(stdout, f"batched, batch size {batch_size}",
+           timeit(lambda: register_course_details(pages, batch_size=batch_size), repeat))
+
+
+@suite("catalogue_serialisation")
+def catalogue_serialisation(stdout, size: int=4000, repeat: int=30, **options):
+    """GET courses/{profile} through the validated schemas against the fast path, uncached."""
+    from accounts.models import Account
+    from django.core.cache import caches
+    from django.test import Client, override_settings
+
+    program = seed_catalogue(size)
+    rebuild_planner_rows([program.program_code])
+    account = Account.objects.create_user(username="benchmark", password="benchmark", program=program)
+    client = Client(HTTP_HOST="localhost")
+    client.force_login(account)
+    stdout.write(f"{PlannerRow.objects.filter(profile_code='BP1').count()} rows in profile BP1")
+
+    def get():
+        caches["catalogue"].clear()
+        response = client.get("/api/courses/BP1")
+        assert response.status_code == 200, response.status_code
+
+    with override_settings(ALLOWED_HOSTS=["localhost"]):
+        for fast in (False, True):
+            with override_settings(FAST_SERIALISATION=fast):
+                timings = timeit(get, repeat)
+            name = "fast path" if fast else "schema validation"
+            report(stdout, name, timings)
+            stdout.write(f"{'':<40} {1000 / timings['median']:.0f} requests/s")
+
+
+@suite("optimiser")
+def optimiser(stdout, size: int=1500, repeat: int=5, **options):
+    """suggest_plans for one profile, with and without requirements, 2 s time budget."""
+    from planning.optimiser import PlanConstraints, suggest_plans
+
+    program = seed_catalogue(size)
+    cases = {"profile hp only": PlanConstraints(),
+             "15 hp a-level, 30 hp total, 16 hp/period": PlanConstraints(min_a_level_hp=15, min_total_hp=30,
+                                                                        max_period_hp=16)}
+    for name, constraints in cases.items():
+        results = []
+        timings = timeit(lambda: results.append(suggest_plans(program.program_code, "BP1", constraints,
+                                                              top_k=5, time_budget=2.0)), repeat)
+        report(stdout, name, timings)
+        result = results[-1]
+        best = result["plans"][0] if result["plans"] else {"profile_hp": 0, "hp": 0}
+        stdout.write(f"{'':<40} {result['nodes']} nodes, complete: {result['complete']}, "
+                     f"best {best['profile_hp']} profile hp of {best['hp']} hp")
+
+
+@suite("search")
+def search(stdout, size: int=5000, repeat: int=200, **options):
+    """search_courses on a catalogue of size schedulers, type-ahead prefixes and whole words."""
+    from planning.search import rebuild_search_index, search_courses
+
+    program = seed_catalogue(size)
+    register_course_details(synthetic_course_pages(list(Course.objects.values_list("course_code", flat=True))))
+    st = time.perf_counter()
+    indexed = rebuild_search_index()
+    stdout.write(f"indexed {indexed} courses in {(time.perf_counter() - st) * 1000:.0f} ms")
+
+    for query in ("b", "b01", "benchmark course 12", "examinator 7", "datavet"):
+        report(stdout, f"'{query}'",
+               timeit(lambda: search_courses(query, program_code=program.program_code), repeat))
+
+
+def synthetic_program_page(courses: list[dict], program_code: str="6CBNC", profiles: int=6) -> bytes:
+    """A studieinfo program page listing courses, rows in the format returned by ProgramPlan.courses()."""
+    from planning.management.commands.scrappy.corpus import program_page
+
+    return program_page(program_code, "Civilingenjörsprogram i benchmark",
+                        [(f"BP{i}", f"benchmark profile BP{i}") for i in range(profiles)], courses)
+
+def saved_pages() -> list[bytes]:
+    """Pages of the http cache from earlier scrapes, or the studieinfo test fixtures when it is empty."""
+    from planning.management.commands.scrappy.http_cache import DEFAULT_CACHE_DIR
+    from pathlib import Path
+
+    pages = [path.read_bytes() for path in sorted(Path(DEFAULT_CACHE_DIR).glob("*/*.body"))]
+    if not pages:
+        fixtures = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "studieinfo"
+        pages = [path.read_bytes() for path in sorted(fixtures.rglob("*.html"))]
+    return pages
+
+def legacy_program_courses(soup, profile_codes: list[str]) -> int:
+    """The traversal of ProgramPlan.courses() before the page index, two finds per profile and semester."""
+    count = 0
+    for semester_section in soup.find_all("section", {"class": "accordion semester js-semester show-focus is-toggled"}):
+        if int(semester_section.find("h3").text[:8][-1:]) not in (7, 8, 9):
+            continue
+        for profile_code in profile_codes:
+            if not semester_section.find("div", {"data-specialization": profile_code}):
+                continue
+            for period_section in semester_section.find("div", {"data-specialization": profile_code}).find_all(
+                    "tbody", {"class": "period"})[:2]:
+                for row in period_section.find_all("tr"):
+                    if not row.find("th") and "main-row" in row["class"] and "inactive" not in row["class"]:
+                        count += 1
+    return count
+
+def per_page(timings: dict[str, float], pages: int) -> dict[str, float]:
+    return {key: value / pages for key, value in timings.items()}
+
+@suite("parsing")
+def parsing(stdout, size: int=1500, repeat: int=5, **options):
+    """
+    Time per page of every installed parser, over the saved pages and one synthetic program
+    page of size course rows in semesters 1-9. Program pages are parsed and indexed.
+    """
+    from bs4 import BeautifulSoup
+    from planning.management.commands.scrappy.parsing import available_parsers, parse_html
+    from planning.management.commands.scrappy.program_plan import read_program_page
+
+    courses = synthetic_courses(size)
+    courses += [{**course, "semester": course["semester"] - 6} for course in courses]
+    synthetic = synthetic_program_page(courses)
+    pages = saved_pages()
+    program_pages = [page for page in pages if b"js-semester" in page] + [synthetic]
+    course_pages = [page for page in pages if b"overview-content" in page]
+    profile_codes = [f"BP{i}" for i in range(6)] + [""]
+    stdout.write(f"{len(pages)} saved pages, synthetic program page of {len(synthetic) / 1024:.0f} KiB, "
+                 f"parsers: {', '.join(available_parsers())}")
+
+    report(stdout, f"before, program pages ({len(program_pages)})",
+           per_page(timeit(lambda: [legacy_program_courses(BeautifulSoup(page, "html.parser"), profile_codes)
+                                    for page in program_pages], repeat), len(program_pages)))
+    for parser in available_parsers():
+        report(stdout, f"{parser}, program pages ({len(program_pages)})",
+               per_page(timeit(lambda: [read_program_page(page, parser) for page in program_pages], repeat),
+                        len(program_pages)))
+        if course_pages:
+            report(stdout, f"{parser}, course pages ({len(course_pages)})",
+                   per_page(timeit(lambda: [parse_html(page, parser) for page in course_pages], repeat),
+                            len(course_pages)))
+
+@suite("import")
+def import_catalogue(stdout, size: int=5000, repeat: int=1, **options):
+    """
+    The whole populate_db pipeline against a local stand-in serving a synthetic corpus of size
+    courses in size / 100 programs: a full import, an unchanged --incremental re-import on top
+    of it and a --stream import into an empty catalogue. Every run prints populate_db --profile,
+    the peak memory is the one of the importing process, parse workers are not included.
+    """
+    from contextlib import redirect_stdout
+    from django.core.management import call_command
+    from django.db import transaction
+    from io import StringIO
+    from planning.management.commands.populate_db import Command as PopulateDb
+    from planning.management.commands.scrappy.corpus import write_corpus
+    from planning.management.commands.scrappy.standin import StandIn
+    import tempfile
+
+    def populate(*arguments) -> PopulateDb:
+        command = PopulateDb()
+        with redirect_stdout(StringIO()):
+            call_command(command, "--base-url", standin.url, "--rate", "0", "--no-cache", "--profile", *arguments,
+                         stdout=StringIO())
+        return command
+
+    def run(name: str, *arguments) -> None:
+        timings = []
+        for _ in range(repeat):
+            with transaction.atomic():
+                if name == "incremental":
+                    populate()
+                st = time.perf_counter()
+                command = populate(*arguments)
+                timings.append(time.perf_counter() - st)
+                transaction.set_rollback(True)
+        stdout.write(f"{name}: {statistics.median(timings):.2f}s wall time (median of {repeat})")
+        stdout.write(command.stages.report())
+
+    with tempfile.TemporaryDirectory() as root, StandIn(root) as standin:
+        st = time.perf_counter()
+        programs = write_corpus(root, programs=max(1, size // 100), courses=size)
+        stdout.write(f"corpus of {len(programs)} programs and {size} courses written in {time.perf_counter() - st:.2f}s")
+        run("full")
+        run("incremental", "--incremental")
+        run("stream", "--stream")
+
+@suite("snapshot")
+def snapshot(stdout, size: int=20000, repeat: int=3, **options):
+    """
+    dump_catalogue and load_catalogue against dumpdata and loaddata, on a catalogue of size
+    schedulers in five programs. Both restores rebuild the planner rows and the search index.
+    """
+    from django.core.management import call_command
+    from django.db import transaction
+    from io import StringIO
+    from pathlib import Path
+    from planning.search import rebuild_search_index
+    from planning.snapshot import SNAPSHOT_MODELS, dump_catalogue, load_catalogue
+    import tempfile
+
+    seed_catalogue(size // 5)
+    for i in range(1, 5):
+        # the other programs teach the same courses
+        program = Program.objects.create(program_code=f"6CBN{i}", program_name=f"benchmark program {i}")
+        program.profiles.add(*Profile.objects.all())
+        register_courses(synthetic_courses(size // 5, program.program_code),
+                         set(Course.objects.values_list("course_code", flat=True)))
+    register_course_details(synthetic_course_pages(list(Course.objects.values_list("course_code", flat=True))))
+    stdout.write(f"{Scheduler.objects.count()} schedulers, {Course.objects.count()} courses on {connection.vendor}")
+
+    def restore(load) -> list[float]:
+        """Milliseconds of every load into an emptied catalogue, the catalogue is put back afterwards."""
+        timings = []
+        for _ in range(repeat):
+            with transaction.atomic(), connection.cursor() as cursor:
+                for model in reversed(SNAPSHOT_MODELS):
+                    cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)}")
+                st = time.perf_counter()
+                load()
+                timings.append((time.perf_counter() - st) * 1000)
+                transaction.set_rollback(True)
+        return timings
+
+    def loaddata(path) -> None:
+        call_command("loaddata", path, stdout=StringIO())
+        rebuild_planner_rows()
+        rebuild_search_index()
+
+    labels = ["planning.mainfield", "planning.profile", "planning.program", "planning.course", "planning.examination",
+              "planning.schedule", "planning.scheduler", "planning.schedulersprofiles"]
+    with tempfile.TemporaryDirectory() as root:
+        snapshot_path, fixture_path = Path(root) / "catalogue.json.xz", Path(root) / "dumpdata.json"
+        report(stdout, "dumpdata", timeit(lambda: call_command("dumpdata", *labels, output=fixture_path,
+                                                               stdout=StringIO()), repeat))
+        report(stdout, "dump_catalogue", timeit(lambda: dump_catalogue(snapshot_path), repeat))
+        stdout.write(f"dumpdata {fixture_path.stat().st_size / 1024:.0f} KiB, "
+                     f"dump_catalogue {snapshot_path.stat().st_size / 1024:.0f} KiB")
+        report(stdout, "loaddata", summarise(restore(lambda: loaddata(fixture_path))))
+        report(stdout, "load_catalogue", summarise(restore(lambda: load_catalogue(snapshot_path))))
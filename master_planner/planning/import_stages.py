@@ -0,0 +1,110 @@
+"""
+Per-stage measurements of a catalogue import, printed by ``populate_db --profile``.
+
+Every stage records its wall time, the queries it issued, the rows its INSERT, UPDATE and
+DELETE statements wrote and the peak resident memory of the importing process. A stage may
+be entered several times, e.g. once per program of a streaming import, and adds up.
+"""
+from contextlib import contextmanager, nullcontext
+from django.db import connection
+from typing import Iterable, Iterator
+import os
+import resource
+import threading
+import time
+
+WRITES = ("INSERT", "UPDATE", "DELETE")
+
+
+def resident_memory() -> int:
+    """Current resident set size in bytes, the peak so far where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def rows_written(sql: str, rowcount: int) -> int:
+    if not sql.lstrip().upper().startswith(WRITES):
+        return 0
+    if rowcount <= 0 and " RETURNING " in sql:
+        # sqlite3 only counts INSERT ... RETURNING rows once they are fetched, count the VALUES groups
+        return sql.split(" VALUES ", 1)[-1].split(" RETURNING ", 1)[0].count("(")
+    return max(rowcount, 0)
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.peak_rss = 0
+
+
+class ImportStages:
+    """
+    arguments:
+    enabled: bool -- measure at all, a disabled recorder only runs the stages
+    interval: float -- seconds between two samples of the resident memory
+    """
+    def __init__(self, enabled: bool=True, interval: float=0.01):
+        self.enabled = enabled
+        self.interval = interval
+        self.stages = {}
+        self.current = None
+
+    def execute(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if self.current is not None:
+            self.current.queries += 1
+            self.current.rows += rows_written(sql, context["cursor"].rowcount)
+        return result
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        stats = self.stages.setdefault(name, StageStats(name))
+        outer, self.current = self.current, stats
+        done = threading.Event()
+
+        def sample() -> None:
+            while True:
+                stats.peak_rss = max(stats.peak_rss, resident_memory())
+                if done.wait(self.interval):
+                    return
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        st = time.perf_counter()
+        try:
+            # queries of a nested stage only count towards the inner one
+            with connection.execute_wrapper(self.execute) if outer is None else nullcontext():
+                yield
+        finally:
+            stats.seconds += time.perf_counter() - st
+            done.set()
+            sampler.join()
+            self.current = outer
+
+    def iterate(self, name: str, items: Iterable) -> Iterator:
+        """Yield from items, the time spent waiting for the next item counts towards stage name."""
+        items = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+            yield item
+
+    def report(self) -> str:
+        lines = [f"{'stage':<20} {'wall time':>10} {'queries':>8} {'rows':>8} {'peak rss':>10}"]
+        for stats in self.stages.values():
+            lines.append(f"{stats.name:<20} {stats.seconds:>9.2f}s {stats.queries:>8} {stats.rows:>8} "
+                         f"{stats.peak_rss / 2 ** 20:>7.0f} MiB")
+        return "\n".join(lines)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from planning.benchmarks import SUITES
+
+
+class Command(BaseCommand):
+    help = 'runs a benchmark suite against synthetic data, nothing is kept in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument("suite", choices=sorted(SUITES))
+        parser.add_argument("--size", type=int, help="number of rows the suite seeds")
+        parser.add_argument("--repeat", type=int, help="number of timed runs per measurement")
+
+    def handle(self, *args, **options):
+        kwargs = {key: options[key] for key in ("size", "repeat") if options[key] is not None}
+        with transaction.atomic():
+            SUITES[options["suite"]](self.stdout, **kwargs)
+            transaction.set_rollback(True)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from planning.snapshot import dump_catalogue
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = 'writes the catalogue to a compressed snapshot file, restore it with load_catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="snapshot file to write, e.g. catalogue.json.xz")
+
+    def handle(self, *args, **options):
+        st = time.perf_counter()
+        tables = dump_catalogue(options["path"])
+        for table, rows in tables.items():
+            self.stdout.write(f"{table:<40} {rows:>8} rows")
+        self.stdout.write(f"wrote {os.path.getsize(options['path']) / 1024:.0f} KiB to {options['path']} "
+                          f"in {time.perf_counter() - st:.2f}s")
@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F, Q
+from planning.models import Examination, PlannerRow, Program, Scheduler, SchedulersProfiles
+from accounts.models import Account
+from master_planner.catalogue import PAGE_KEY, after_cursor, page_cursor
+import uuid
+
+
+def hot_queries(program: Program, profile: str, semester: int, account: Account=None) -> list[tuple[str, any]]:
+    """
+    The querysets behind the API endpoints, in the shapes master_planner/api.py and
+    accounts/overview.py build them.
+
+    return format -- [(name, queryset)]
+    """
+    queries = [
+        (f"courses/{profile}/{semester}",
+         PlannerRow.objects.filter(program_code=program.program_code, profile_code=profile, semester=semester)
+                           .order_by("id")),
+        ("get_extra_course_info",
+         Examination.objects.filter(course=Scheduler.objects.filter(program=program)
+                                                            .values_list("course", flat=True)
+                                                            .first())),
+    ]
+    if account is None:
+        return queries
+
+    occupancy, chosen = account.occupancy()
+    # a page from the start of semester 7
+    cursor = page_cursor(7, 1, "", uuid.UUID(int=0))
+    queries.append((f"catalogue/{profile}?fits=true&after={cursor}",
+                    PlannerRow.objects.filter(after_cursor(cursor),
+                                              program_code=program.program_code, profile_code=profile)
+                                      .annotate(clash=F("occupancy").bitand(occupancy))
+                                      .filter(Q(clash=0) | Q(scheduler_id__in=chosen))
+                                      .order_by(*PAGE_KEY)[:51]))
+
+    courses = account.choices.values("course")
+    queries += [
+        (f"account/choices/{profile}",
+         SchedulersProfiles.objects.filter(scheduler__account=account, profile_id__in=[profile, "free"])
+                                   .select_related("scheduler__course", "scheduler__schedule")
+                                   .order_by("pk")),
+        ("account/overview, choices",
+         account.choices.select_related("course", "schedule")),
+        ("account/overview, profiles",
+         SchedulersProfiles.objects.filter(scheduler__program_id=account.program_id, scheduler__course__in=courses)
+                                   .values_list("scheduler_id", "scheduler__course__credits",
+                                                "profile_id", "profile__profile_name")),
+    ]
+    return queries
+
+
+class Command(BaseCommand):
+    help = 'prints the EXPLAIN plan of the queries behind every API endpoint, to spot missing indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--program", help="program code, defaults to the first program with courses")
+        parser.add_argument("--profile", default="free", help="profile code")
+        parser.add_argument("--semester", type=int, default=7)
+        parser.add_argument("--account", help="username for the account endpoints, defaults to an account with choices")
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="run the queries and include actual timings (EXPLAIN ANALYZE, Postgres only)",
+        )
+
+    def handle(self, *args, **options):
+        if options["program"]:
+            program = Program.objects.filter(program_code=options["program"]).first()
+        else:
+            program = Program.objects.filter(scheduler__isnull=False).first()
+        if program is None:
+            raise CommandError("no program to explain the queries for, import the catalogue first")
+
+        if options["account"]:
+            account = Account.objects.filter(username=options["account"]).first()
+        else:
+            account = Account.objects.filter(choices__isnull=False).first()
+        if account is None:
+            self.stdout.write("no account with choices, skipping the account endpoints")
+
+        explain = {"analyze": True} if options["analyze"] and connection.vendor == "postgresql" else {}
+        for name, queryset in hot_queries(program, options["profile"], options["semester"], account):
+            self.stdout.write(f"-- {name} ({connection.vendor})")
+            self.stdout.write(queryset.explain(**explain))
+            self.stdout.write("")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from planning.snapshot import load_catalogue
+import lzma
+import time
+
+
+class Command(BaseCommand):
+    help = 'loads a snapshot written by dump_catalogue into an empty catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="snapshot file written by dump_catalogue")
+
+    def handle(self, *args, **options):
+        st = time.perf_counter()
+        try:
+            tables = load_catalogue(options["path"])
+        except (OSError, ValueError, lzma.LZMAError) as error:
+            raise CommandError(error)
+        for table, rows in tables.items():
+            self.stdout.write(f"{table:<40} {rows:>8} rows")
+        self.stdout.write(f"loaded {options['path']} in {time.perf_counter() - st:.2f}s")
@@ -1,11 +1,17 @@
-from django.core.management.base import BaseCommand
-from planning.management.commands.scrappy.program_plan import ProgramPlan
-from planning.management.commands.scrappy.courses import fetch_course_info, fetch_programs
-from planning.models import Course, Examination, MainField, Profile, Program, Schedule, Scheduler, register_profiles, register_courses, register_programs, register_course_details
+from django.core.management.base import BaseCommand, CommandError
+from planning.management.commands.scrappy.courses import fetch_programs
+from planning.models import Course, Examination, MainField, Profile, Program, Schedule, Scheduler, CatalogueVersion, ImportCheckpoint, register_profiles, register_courses, register_programs, register_course_details, rebuild_planner_rows
+from planning.search import rebuild_search_index
+from planning.stream import CatalogueRegistry, import_program
+from planning.import_stages import ImportStages
+from planning.sync import sync_catalogue
+from django.core.management import call_command
 from django.contrib.auth.models import User
 from accounts.models import Account 
-from planning.management.commands.scrappy.program_plan import ProgramPlan 
-import threading
+from planning.management.commands.scrappy.fetch import Fetcher
+from planning.management.commands.scrappy.http_cache import DEFAULT_CACHE_DIR, HttpCache
+from planning.management.commands.scrappy.pipeline import ParsePipeline
+import os
 import time
 
 
@@ -23,6 +29,77 @@ class Command(BaseCommand):
             action="store_true",
             help="only scrapes datateknik, mjukvaruteknik, tekniskt fysik",
         )
+        parser.add_argument(
+            "--fetch-workers",
+            "--workers",
+            dest="workers",
+            type=int,
+            default=8,
+            help="number of concurrent requests to studieinfo",
+        )
+        parser.add_argument(
+            "--parse-workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="number of processes parsing the fetched pages, 0 to parse in the fetch threads' process",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=10,
+            help="max requests per second to studieinfo, 0 for no limit",
+        )
+        parser.add_argument(
+            "--retries",
+            type=int,
+            default=3,
+            help="retries with exponential backoff for failed requests",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=15,
+            help="request timeout in seconds",
+        )
+        parser.add_argument(
+            "--base-url",
+            help="scrape another host than studieinfo.liu.se, e.g. a local stand-in",
+        )
+        parser.add_argument(
+            "--cache-dir",
+            default=DEFAULT_CACHE_DIR,
+            help="directory of the http cache used to revalidate pages between runs",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="always download full pages and leave the http cache untouched",
+        )
+        parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="replay every page from the http cache without any network access",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="diff the scrape against the database and only write what changed, keeps scheduler ids stable",
+        )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help="commit every program as soon as it is parsed, with a checkpoint to resume from",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="continue the last --stream import, skipping the programs it committed",
+        )
+        parser.add_argument(
+            "--profile",
+            action="store_true",
+            help="print wall time, queries, rows written and peak memory of every import stage",
+        )
 
     def add_data(self):
         program = Program(program_name="mjukvaruteknik", 
@@ -84,12 +161,30 @@ class Command(BaseCommand):
         # fill Schedule
         # register_schedule()
 
-        account = Account.objects.create_user(username="admin",  
-                                              password="123",
-                                              is_superuser=True,
-                                              is_staff=True)
+        if not Account.objects.filter(username="admin").exists():
+            Account.objects.create_user(username="admin",  
+                                        password="123",
+                                        is_superuser=True,
+                                        is_staff=True)
+
 
+        st = time.time() 
+        if options["offline"] and options["no_cache"]:
+            raise CommandError("--offline replays from the cache and can not be combined with --no-cache")
+        if options["resume"]:
+            options["stream"] = True
+        if options["stream"] and options["incremental"]:
+            raise CommandError("--stream fills empty programs and can not be combined with --incremental")
+        cache = None if options["no_cache"] else HttpCache(options["cache_dir"])
+        fetcher = Fetcher(base_url=options["base_url"],
+                          workers=options["workers"],
+                          rate=options["rate"],
+                          retries=options["retries"],
+                          timeout=options["timeout"],
+                          cache=cache,
+                          offline=options["offline"])
 
+        self.stages = ImportStages(enabled=options["profile"])
         # fetch data and insert programs in db
         if options['debug']:
             program_data = [('6CMJU', 'Civilingenjörsprogram i mjukvaruteknik'), 
@@ -97,57 +192,95 @@ class Command(BaseCommand):
                             ('6CYYY', 'Civilingenjörsprogram i teknisk fysik och elektroteknik')]
         else:
             print("start to fetch program data")
-            program_data = fetch_programs()
-        register_programs(program_data)
-        
+            with self.stages.stage("program list"):
+                program_data = fetch_programs(fetcher)
+        with ParsePipeline(fetcher, options["parse_workers"]) as pipeline:
+            if options["incremental"]:
+                self.import_incremental(program_data, pipeline)
+            elif options["stream"]:
+                self.import_streaming(program_data, pipeline, options["resume"])
+            else:
+                self.import_full(program_data, pipeline)
+
+        fetcher.close()
+        print(fetcher.stats.summary())
+        if cache is not None:
+            print(cache.summary())
+        print(f"import finished in {time.time() - st:.2f}s")
+        if options["profile"]:
+            print(self.stages.report())
+
+    def scrape_programs(self, program_data, pipeline):
         course_data = []
         profile_data = []
-        threads = []
-        st = time.time() 
-        for program_code, name in program_data:
-            thread = threading.Thread(target=scrape, args=[program_code, course_data, profile_data])
-            threads.append(thread)
-        
-        for thread in threads:
-            thread.start()
-            
-        for thread in threads:
-            thread.join()    
-        
-        register_profiles(profile_data)
-        register_courses(course_data)
+        with self.stages.stage("programs"):
+            for courses, profiles in pipeline.programs(program_code for program_code, _ in program_data):
+                course_data.extend(courses)
+                profile_data.extend(profiles)
+        return course_data, profile_data
+
+    def import_full(self, program_data, pipeline):
+        with self.stages.stage("catalogue"):
+            register_programs(program_data)
+        course_data, profile_data = self.scrape_programs(program_data, pipeline)
         
-        courses = []
+        with self.stages.stage("catalogue"):
+            register_profiles(profile_data)
+            register_courses(course_data)
         
-        # threads = []
-        # for course in Course.objects.all():
-        #     thread = threading.Thread(target=scrape_course, args=[course.course_code, courses])
-        #     threads.append(thread)
-        #  
-        # for thread in threads:
-        #     thread.start()
-        #     
-        # for thread in threads:
-        #     thread.join()    
-
-        for course in Course.objects.all():
-            scrape_course(course.course_code, courses)
+        with self.stages.stage("course pages"):
+            course_codes = Course.objects.values_list("course_code", flat=True)
+            courses = pipeline.courses(course_codes)
         
-        register_course_details(courses)
+        with self.stages.stage("course details"):
+            register_course_details(courses)
+        self.rebuild_read_models()
+
+    def rebuild_read_models(self):
+        with self.stages.stage("planner rows"):
+            print(f"rebuilt {rebuild_planner_rows()} planner rows")
+        with self.stages.stage("search index"):
+            print(f"indexed {rebuild_search_index()} courses for search")
+            CatalogueVersion.bump()
+
+    def import_incremental(self, program_data, pipeline):
+        course_data, profile_data = self.scrape_programs(program_data, pipeline)
+        with self.stages.stage("course pages"):
+            course_codes = list(dict.fromkeys(course["course_code"] for course in course_data))
+            courses = pipeline.courses(course_codes)
+
+        with self.stages.stage("sync"):
+            summary = sync_catalogue(program_data, profile_data, course_data, courses)
+        print(summary.summary())
+        if summary.writes:
+            self.rebuild_read_models()
+        # chosen schedulers may be gone and hp may have changed, so the hp ledgers are recomputed
+        if summary.changed("scheduler", "course"):
+            with self.stages.stage("ledgers"):
+                call_command("rebuild_ledgers", stdout=self.stdout)
             
+    def import_streaming(self, program_data, pipeline, resume):
+        if not resume:
+            ImportCheckpoint.objects.all().delete()
+        committed = set(ImportCheckpoint.objects.values_list("program_code", flat=True))
+        populated = set(Scheduler.objects.values_list("program_id", flat=True).distinct()) - committed
+        if committed:
+            print(f"resuming, {len(committed)} programs already committed")
+        for program_code in populated & {code for code, _ in program_data}:
+            print(f"skipping {program_code}, it is already imported, use --incremental to update it")
+
+        names = dict(program_data)
+        registry = CatalogueRegistry()
+        program_codes = [code for code, _ in program_data if code not in committed and code not in populated]
+        for program_code, (course_data, profile_data) in self.stages.iterate("programs",
+                                                                             pipeline.iprograms(program_codes)):
+            with self.stages.stage("course pages"):
+                course_details = pipeline.courses(registry.new_courses(course_data))
+            with self.stages.stage("catalogue"):
+                checkpoint = import_program(program_code, names[program_code], course_data, profile_data,
+                                            course_details, registry)
+            print(f"committed {program_code}: {checkpoint.schedulers} schedulers, {checkpoint.courses} new courses")
+
     def handle(self, *args, **options):
         #self.scrape_data(options)
         self.scrape_data_concurrent(options)
-
-def scrape(program_code, course_data, profile_data):
-    prog_scraper = ProgramPlan(program_code)
-    print(f"extracting course and profile data for {program_code}")
-    course_data.extend(prog_scraper.courses())
-    profile_data.extend(prog_scraper.profiles())
-
-def scrape_course(course_code: str, courses: list[Course]):
-    print(f'Fetching: {course_code}')
-    course = fetch_course_info(course_code)
-    courses.append(course)
-    
-    
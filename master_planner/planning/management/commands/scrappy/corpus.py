@@ -0,0 +1,150 @@
+"""
+Synthetic studieinfo corpus for offline imports.
+
+write_corpus() fills a directory in the layout StandIn serves, index.html, program/{code}.html
+and kurs/{code}.html, with pages in the markup of the saved fixtures. Every course is taught
+by two programs, so imports share courses like they do on the real catalogue, and every
+other course is also listed in semesters 1-3, which the scrapers read and skip. The corpus
+only depends on its size, two runs write the same pages.
+
+    with tempfile.TemporaryDirectory() as root, StandIn(root) as standin:
+        write_corpus(root, programs=50, courses=5000)
+        call_command("populate_db", "--base-url", standin.url, "--no-cache")
+"""
+from pathlib import Path
+from string import ascii_uppercase
+
+PROFILES = 6
+MAIN_FIELDS = ("Datateknik", "Datavetenskap", "Elektroteknik", "Matematik", "Fysik", "Industriell ekonomi")
+LOCATIONS = ("Linköping", "Linköping", "Linköping", "Norrköping")
+
+
+def program_code(index: int) -> str:
+    letters = ""
+    for _ in range(3):
+        index, letter = divmod(index, 26)
+        letters = ascii_uppercase[letter] + letters
+    return f"6C{letters}"
+
+
+def program_name(code: str) -> str:
+    # fetch_programs reads the code from the first "6" of the link text, names carry no digits
+    return f"Civilingenjörsprogram i korpus {code[2:].lower()}"
+
+
+def course_rows(index: int, code: str, profiles: list[str]) -> list[dict]:
+    """Rows of course number index in the format returned by ProgramPlan.courses(), one per period."""
+    periods = (1, 2) if index % 10 == 0 else (1 + index % 2,)
+    course_code = f"K{index:05}"
+    return [{"course_code": course_code,
+             "course_name": f"korpuskurs {course_code.lower()}",
+             "hp": "6*" if len(periods) == 2 else ("7.5" if index % 7 == 0 else "6"),
+             "program_code": code,
+             "level": "A1X" if index % 3 else "G2X",
+             "block": str(1 + index % 4),
+             "vof": "v" if index % 5 else "o",
+             "profile_code": profiles[index % len(profiles)] if index % 4 else "free",
+             "period": period,
+             "semester": 7 + index % 3}
+            for period in periods]
+
+
+def program_page(code: str, name: str, profiles: list[tuple[str, str]], courses: list[dict]) -> bytes:
+    """
+    A studieinfo program page.
+
+    arguments:
+    profiles -- [(profile code, profile name)] of the specialization filter
+    courses -- rows in the format returned by ProgramPlan.courses(), "free" for courses without profile
+    """
+    options = "".join(f'<option value="{profile_code}">{profile_name}</option>' for profile_code, profile_name in profiles)
+    years = "".join(f'<option value="{code}/{5300 - i}">{2034 - i}</option>' for i in range(20))
+    by_section = {}
+    for course in courses:
+        profile_code = "" if course["profile_code"] == "free" else course["profile_code"]
+        by_section.setdefault(course["semester"], {}).setdefault(profile_code, {}).setdefault(
+            int(course["period"]), []).append(course)
+
+    sections = []
+    for semester, specializations in sorted(by_section.items()):
+        divs = []
+        for profile_code, periods in specializations.items():
+            bodies = []
+            for period in (1, 2):
+                rows = "".join(f'<tr class="main-row">\n<td>{course["course_code"]}</td>\n'
+                               f'<td><a href="/kurs/{course["course_code"]}">{course["course_name"]}</a></td>\n'
+                               f'<td>{course["hp"]}</td>\n<td>{course["level"]}</td>\n<td>{course["block"]}</td>\n'
+                               f'<td>{course["vof"]}</td>\n</tr>\n'
+                               f'<tr class="details-row"><td colspan="6">Detaljer</td></tr>\n'
+                               for course in periods.get(period, []))
+                bodies.append(f'<tbody class="period"><tr><th colspan="6">Period {period}</th></tr>\n{rows}</tbody>')
+            divs.append(f'<div class="specialization" data-specialization="{profile_code}">'
+                        f'<table class="table">{"".join(bodies)}</table></div>')
+        sections.append(f'<section class="accordion semester js-semester show-focus is-toggled">'
+                        f'<header class="accordion-header"><h3>Termin {semester} (HT 2024)</h3></header>'
+                        f'{"".join(divs)}</section>')
+
+    return (f'<!DOCTYPE html><html lang="sv"><head><meta charset="utf-8"></head><body>'
+            f'<header><h1>{name}, 300 hp</h1></header><main>'
+            f'<select id="related_entity_navigation">{years}</select>'
+            f'<select id="specializations-filter"><option value="">Alla inriktningar</option>{options}</select>'
+            f'{"".join(sections)}</main></body></html>').encode()
+
+
+def course_page(index: int) -> bytes:
+    """The studieinfo page of course number index."""
+    course_code = f"K{index:05}"
+    main_fields = ", ".join(MAIN_FIELDS[(index + i) % len(MAIN_FIELDS)] for i in range(1 + index % 2))
+    examinations = "".join(f'<tr><td>{exam}</td><td>{name}</td><td>\n  {hp} hp\n</td><td>{grading}</td></tr>\n'
+                           for exam, name, hp, grading in (("LAB1", "Laboration", "3", "U, G"),
+                                                           ("TEN1", "Skriftlig tentamen", "3", "U, 3, 4, 5")))
+    return (f'<!DOCTYPE html>\n<html lang="sv">\n<head><meta charset="utf-8"></head>\n<body>\n<main>\n'
+            f'<h1>Korpuskurs {course_code.lower()}, 6 hp ({course_code})</h1>\n'
+            f'<section class="overview-content f-col">\n<div class="overview-list">\n'
+            f'Huvudområde\n{main_fields}\n{"A1X" if index % 3 else "G2X"}\nKurstyp\nProgramkurs\n'
+            f'Examinator\nExaminator {ascii_uppercase[index % 26]}{index % 100:02}\n</div>\n</section>\n'
+            f'<table class="table table-striped study-guide-table">\n'
+            f'<tr><th>Termin</th><th>Period</th><th>Block</th><th>Språk</th><th>Ort</th><th>Sökbar</th></tr>\n'
+            f'<tr><td>HT 2024</td><td>1</td><td>{1 + index % 4}</td><td>Svenska</td>'
+            f'<td>{LOCATIONS[index % len(LOCATIONS)]}</td><td>Ja</td></tr>\n</table>\n'
+            f'<section class="syllabus f-2col">\n<h2>Huvudområde</h2>{main_fields}\n'
+            f'<h2>Utbildningsnivå</h2>Avancerad nivå\n</section>\n'
+            f'<div id="examination">\n<table>\n'
+            f'<tr><th>Kod</th><th>Benämning</th><th>Omfattning</th><th>Betygsskala</th></tr>\n'
+            f'{examinations}</table>\n</div>\n</main>\n</body>\n</html>\n').encode()
+
+
+def write_corpus(root, programs: int=50, courses: int=5000) -> list[tuple[str, str]]:
+    """
+    Write a corpus of programs and courses to root. Course i is taught by programs i and i + 1
+    (mod programs), in its master semester and, every other course, in semester 1-3 as well.
+
+    return format -- [(program code, program name)] in the order of index.html
+    """
+    root = Path(root)
+    (root / "program").mkdir(parents=True, exist_ok=True)
+    (root / "kurs").mkdir(exist_ok=True)
+
+    codes = [program_code(index) for index in range(programs)]
+    taught = {code: [] for code in codes}
+    for index in range(courses):
+        for offset in (0, 1) if programs > 1 else (0,):
+            taught[codes[(index + offset) % programs]].append(index)
+
+    for code in codes:
+        profiles = [(f"{code[2:]}{i}", f"korpusprofil {code[2:].lower()} {ascii_uppercase[i]}") for i in range(PROFILES)]
+        rows = []
+        for index in taught[code]:
+            master = course_rows(index, code, [profile_code for profile_code, _ in profiles])
+            rows.extend(master)
+            if index % 2:
+                rows.extend({**row, "semester": row["semester"] - 6} for row in master)
+        (root / "program" / f"{code}.html").write_bytes(program_page(code, program_name(code), profiles, rows))
+
+    for index in range(courses):
+        (root / "kurs" / f"K{index:05}.html").write_bytes(course_page(index))
+
+    links = "".join(f'<a class="pseudo-h3" href="/program/{code}">{program_name(code)} ({code})</a>\n' for code in codes)
+    (root / "index.html").write_bytes(f'<!DOCTYPE html>\n<html lang="sv">\n<head><meta charset="utf-8"></head>\n'
+                                      f'<body>\n<main>\n{links}</main>\n</body>\n</html>\n'.encode())
+    return [(code, program_name(code)) for code in codes]
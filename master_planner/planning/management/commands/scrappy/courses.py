@@ -1,18 +1,20 @@
 import requests
 from bs4 import BeautifulSoup
+from planning.management.commands.scrappy.fetch import Fetcher, default_fetcher
+from planning.management.commands.scrappy.parsing import parse_html, text_lines
 
-def fetch_programs():
+def fetch_programs(fetcher: Fetcher=None):
 
     # profiles = ["Civilingenjörsprogrammet i Datateknik", "Civilingenjörsprogrammet i Design och produktutveckling", "Civilingenjörsprogrammet i Elektronikdesign", "Civilingenjörsprogrammet i Energi - Miljö - Management", "Civilingenjörsprogrammet i Industriell ekonomi", "Civilingenjörsprogrammet i Industriell ekonomi- internationell franska, tyska, spanska, kinesiska och japanska", "Civilingenjörsprogrammet i Informationsteknologi", "Civilingenjörsprogrammet i Kemisk biologi", "Civilingenjörsprogrammet i Kommunikation, transport och samhälle", "Civilingenjörsprogrammet i Maskinteknik", "Civilingenjörsprogrammet i Medicinsk teknik", "Civilingenjörsprogrammet i Medieteknik", "Civilingenjörsprogrammet i Mjukvaruteknik", "Civilingenjörsprogrammet i Teknisk biologi", "Civilingenjörsprogrammet i Teknisk matematik", "Civilingenjörsprogrammet i Teknisk fysik och elektroteknik", "Civilingenjörsprogrammet i Teknisk fysik och elektroteknik- internationell franska, tyska, spanska, kinesiska och japanska"]  
 
-    url = "https://studieinfo.liu.se/?Term=civilingenj%C3%B6r&Type=all&MainFieldOfStudy="
-    r = requests.get(url)
+    fetcher = fetcher or default_fetcher()
+    r = fetcher.get("/?Term=civilingenj%C3%B6r&Type=all&MainFieldOfStudy=")
     programs = []
     if r.status_code == 200:
         
         program_data = []
 
-        soup = BeautifulSoup(r.content, "html.parser")
+        soup = parse_html(r.content)
         for string in soup.find_all("a", {"class": "pseudo-h3"} ):
             name = string.text[:string.text.find(" (")]
             code = string.text[string.text.find("6"):string.text.find(")")]
@@ -24,7 +26,7 @@ def fetch_programs():
 
 
 
-def fetch_course_info(code: str, en: bool=False) -> dict[str, any]:
+def fetch_course_info(code: str, en: bool=False, fetcher: Fetcher=None) -> dict[str, any]:
     """
     
 
@@ -44,25 +46,29 @@ def fetch_course_info(code: str, en: bool=False) -> dict[str, any]:
     arguments:
     code: str -- course code
     lang: str -- 'en' for english, leave empty for swedish
+    fetcher: Fetcher -- shared http client, the default one if left empty
     """
     
-    if en: url = f"https://studieinfo.liu.se/en/kurs/{code}"
-    else: url = f"https://studieinfo.liu.se/kurs/{code}"
+    if en: url = f"/en/kurs/{code}"
+    else: url = f"/kurs/{code}"
     
-    r = requests.get(url)
+    r = (fetcher or default_fetcher()).get(url, lang="en" if en else "sv")
 
     if r.status_code == 200:
-        
-        soup = BeautifulSoup(r.content, "html.parser")
-        return {"course_code": code,
-                "examination": get_examination(soup),
-                "examinator": get_examinator(soup),
-                "location": get_location(soup),
-                "main_field": get_main_field(soup), 
-                }
+        return course_info(code, r.content)
         
     raise ValueError(f'status_code {r.status_code}, probably wrong course code')
 
+def course_info(code: str, content: bytes) -> dict[str, any]:
+    """fetch_course_info of a course page that is already downloaded, e.g. in a parse worker."""
+    soup = parse_html(content)
+    return {"course_code": code,
+            "examination": get_examination(soup),
+            "examinator": get_examinator(soup),
+            "location": get_location(soup),
+            "main_field": get_main_field(soup), 
+            }
+
 def get_examination(soup: BeautifulSoup) -> list[dict[str, str]]:
     examinations = []
     for row in soup.find("div", {"id": "examination"} ).find_all("tr")[1:]:
@@ -74,10 +80,10 @@ def get_examination(soup: BeautifulSoup) -> list[dict[str, str]]:
     return examinations
 
 def get_level(soup: BeautifulSoup) -> str:
-    return soup.find("section", {"class": "overview-content f-col"}).text.split('\r\n')[3].strip()
+    return text_lines(soup.find("section", {"class": "overview-content f-col"}).text)[2]
 
 def get_examinator(soup: BeautifulSoup) -> str:
-    return soup.find("section", {"class": "overview-content f-col"}).text.split('\r\n')[7].strip()
+    return text_lines(soup.find("section", {"class": "overview-content f-col"}).text)[6]
 
 def get_location(soup: BeautifulSoup) -> str:
     return soup.find("table", {"class": "table table-striped study-guide-table"}).find_all("tr")[1].find_all("td")[-2].text
@@ -0,0 +1,165 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from planning.management.commands.scrappy.http_cache import HttpCache, OfflineCacheMiss
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlsplit
+from typing import Any, Callable, Iterable
+import os
+import threading
+import time
+
+STUDIEINFO_URL = os.getenv("STUDIEINFO_URL", "https://studieinfo.liu.se")
+
+
+def join_url(base_url: str, path: str) -> str:
+    """Resolves path below base_url, also when base_url has a path of its own."""
+    return urljoin(base_url.rstrip("/") + "/", path.lstrip("/"))
+
+
+class RateLimiter:
+    """Spaces out requests to the same host so at most `rate` requests per second are started."""
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host: str) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class FetchStats:
+    def __init__(self):
+        self.pages = 0
+        self.bytes = 0
+        self.failures = 0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    def record(self, response: requests.Response) -> None:
+        with self.lock:
+            self.pages += 1
+            self.bytes += len(response.content)
+
+    def fail(self) -> None:
+        with self.lock:
+            self.failures += 1
+
+    def wall_time(self) -> float:
+        return time.monotonic() - self.started
+
+    def summary(self) -> str:
+        wall_time = self.wall_time()
+        rate = self.pages / wall_time if wall_time else 0
+        return (f"fetched {self.pages} pages ({self.bytes / 1024:.0f} KiB, {self.failures} failed) "
+                f"in {wall_time:.2f}s, {rate:.1f} pages/s")
+
+
+class Fetcher:
+    """
+    HTTP client shared by the scrapers.
+    Requests go through one connection-pooled session with timeouts, retries with
+    exponential backoff and a per-host rate limit, map() runs work on a bounded thread pool.
+
+    arguments:
+    base_url: str -- relative paths are resolved against it, defaults to $STUDIEINFO_URL
+    workers: int -- number of concurrent requests
+    rate: float -- max requests started per second and host, 0 for no limit
+    retries: int -- retries for connection errors and 429/5xx responses
+    backoff: float -- backoff factor between retries in seconds
+    timeout: float -- connect and read timeout in seconds
+    cache: HttpCache -- revalidate pages against this disk cache with conditional requests
+    offline: bool -- only replay pages from the cache, never touch the network
+    """
+    def __init__(self, base_url: str=None, workers: int=8, rate: float=10, retries: int=3,
+                 backoff: float=0.5, timeout: float=15, cache: HttpCache=None, offline: bool=False):
+        if offline and cache is None:
+            raise ValueError("offline mode needs a cache to replay from")
+        self.base_url = base_url or STUDIEINFO_URL
+        self.workers = workers
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.limiter = RateLimiter(rate)
+        self.stats = FetchStats()
+
+        retry = Retry(total=retries,
+                      backoff_factor=backoff,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path: str) -> str:
+        return join_url(self.base_url, path)
+
+    def get(self, path: str, lang: str="sv", **kwargs) -> requests.Response:
+        url = self.url(path)
+        entry = self.cache.load(url, lang) if self.cache else None
+        if self.offline:
+            if entry is None:
+                self.stats.fail()
+                raise OfflineCacheMiss(f"{url} is not cached")
+            self.cache.hit(entry)
+            return entry.response()
+
+        headers = {**kwargs.pop("headers", {}), **(entry.conditional_headers() if entry else {})}
+        self.limiter.wait(urlsplit(url).netloc)
+        try:
+            response = self.session.get(url, timeout=self.timeout, headers=headers, **kwargs)
+        except requests.exceptions.RequestException:
+            self.stats.fail()
+            raise
+        self.stats.record(response)
+
+        if entry is not None and response.status_code == 304:
+            self.cache.hit(entry)
+            return entry.response()
+        if self.cache is not None and response.status_code == 200:
+            self.cache.miss()
+            self.cache.store(url, lang, response)
+        return response
+
+    def map(self, function: Callable[[Any], Any], items: Iterable[Any]) -> list[Any]:
+        """
+        Call function on every item using at most `workers` threads.
+        Results keep the order of items, items that raise are reported and left out.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        failed = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(function, item): index for index, item in enumerate(items)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as error:
+                    print(f"failed {items[index]}: {error}")
+                    failed.add(index)
+        return [result for index, result in enumerate(results) if index not in failed]
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+def default_fetcher() -> Fetcher:
+    """Fetcher used when a scraper is not given one."""
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            _default_fetcher = Fetcher()
+        return _default_fetcher
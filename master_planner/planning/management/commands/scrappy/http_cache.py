@@ -0,0 +1,107 @@
+import requests
+from requests.structures import CaseInsensitiveDict
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".cache"
+
+
+class OfflineCacheMiss(requests.exceptions.ConnectionError):
+    """Raised in offline mode for a page that is not in the cache."""
+
+
+class CacheEntry:
+    def __init__(self, path: Path, meta: dict):
+        self.path = path
+        self.meta = meta
+
+    @property
+    def body(self) -> bytes:
+        return self.path.read_bytes()
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+    def response(self) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.meta["url"]
+        response.encoding = self.meta.get("encoding")
+        response.headers = CaseInsensitiveDict({"Content-Type": self.meta.get("content_type", "text/html")})
+        response._content = self.body
+        return response
+
+
+class HttpCache:
+    """
+    Content-addressed disk cache for scraped pages.
+
+    Every entry is keyed by sha256(language + url) and stored as <key>.body with the
+    ETag/Last-Modified of the response in <key>.json, so later runs can revalidate
+    with conditional requests or, offline, replay pages without any network.
+    """
+    def __init__(self, directory: Path=DEFAULT_CACHE_DIR):
+        self.directory = Path(directory)
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.lock = threading.Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        gitignore = self.directory / ".gitignore"
+        if not gitignore.exists():
+            gitignore.write_text("*\n")
+
+    def key(self, url: str, lang: str) -> str:
+        return hashlib.sha256(f"{lang}\0{url}".encode()).hexdigest()
+
+    def paths(self, url: str, lang: str) -> tuple[Path, Path]:
+        key = self.key(url, lang)
+        folder = self.directory / key[:2]
+        return folder / f"{key}.body", folder / f"{key}.json"
+
+    def load(self, url: str, lang: str) -> CacheEntry:
+        body, meta = self.paths(url, lang)
+        try:
+            return CacheEntry(body, json.loads(meta.read_text()))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def store(self, url: str, lang: str, response: requests.Response) -> None:
+        body, meta = self.paths(url, lang)
+        body.parent.mkdir(exist_ok=True)
+        # write to a temporary file first so a crashed run never leaves half a page behind
+        for path, content in ((body, response.content),
+                              (meta, json.dumps({"url": url,
+                                                 "lang": lang,
+                                                 "etag": response.headers.get("ETag"),
+                                                 "last_modified": response.headers.get("Last-Modified"),
+                                                 "content_type": response.headers.get("Content-Type"),
+                                                 "encoding": response.encoding,
+                                                 "size": len(response.content),
+                                                 "stored_at": time.time()}).encode())):
+            temporary = path.with_suffix(f".{threading.get_ident()}.tmp")
+            temporary.write_bytes(content)
+            os.replace(temporary, path)
+
+    def hit(self, entry: CacheEntry) -> None:
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += entry.meta.get("size", 0)
+
+    def miss(self) -> None:
+        with self.lock:
+            self.misses += 1
+
+    def summary(self) -> str:
+        return (f"http cache: {self.hits} hits, {self.misses} misses, "
+                f"{self.bytes_saved / 1024:.0f} KiB not downloaded")
@@ -0,0 +1,40 @@
+"""
+HTML parsing for the scrapers.
+
+Every page is parsed with BeautifulSoup on the fastest tree builder that is installed:
+lxml when it is available, the stdlib html.parser otherwise. $SCRAPPY_PARSER picks one
+explicitly, e.g. to compare them with ``manage.py benchmark parsing``.
+"""
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+import os
+
+# fastest first
+PARSERS = ("lxml", "html.parser")
+
+
+def available_parsers() -> list[str]:
+    return [name for name in PARSERS if builder_registry.lookup(name) is not None]
+
+
+def default_parser() -> str:
+    name = os.getenv("SCRAPPY_PARSER")
+    if name:
+        if name not in available_parsers():
+            raise ValueError(f"SCRAPPY_PARSER={name} is not installed, choose from {', '.join(available_parsers())}")
+        return name
+    return available_parsers()[0]
+
+
+def parse_html(content: bytes, parser: str=None) -> BeautifulSoup:
+    """
+    arguments:
+    content -- the page as returned by the server, the encoding is sniffed from it
+    parser -- tree builder to use, default_parser() if left empty
+    """
+    return BeautifulSoup(content, parser or default_parser())
+
+
+def text_lines(text: str) -> list[str]:
+    """Non-blank lines of text, stripped. lxml folds \\r\\n into \\n and html.parser does not."""
+    return [line.strip() for line in text.splitlines() if line.strip()]
@@ -0,0 +1,148 @@
+import requests
+from planning.management.commands.scrappy.fetch import Fetcher
+from planning.management.commands.scrappy.program_plan import ProgramPlan
+from planning.management.commands.scrappy.courses import course_info
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from typing import Any, Callable, Iterable, Iterator
+import multiprocessing
+import queue
+import threading
+
+
+def parse_program(program_code: str, content: bytes, base_url: str) -> tuple[list[dict], list[tuple[str, str, str]]]:
+    """return format -- (ProgramPlan.courses(), ProgramPlan.profiles())"""
+    plan = ProgramPlan.from_html(program_code, content, base_url)
+    return plan.courses(), plan.profiles()
+
+
+def parse_course(course_code: str, content: bytes) -> dict[str, any]:
+    """return format -- see fetch_course_info"""
+    return course_info(course_code, content)
+
+
+class ParsePipeline:
+    """
+    Scrapes in two stages so parsing does not hold the GIL the fetch threads need.
+    Pages are downloaded on `fetcher.workers` threads and parsed in `parse_workers`
+    processes. The stages are joined by a queue of at most `queue_size` pages and at most
+    as many are handed to the workers at once, fetch threads wait while both are full,
+    so memory stays flat however many pages there are.
+
+    arguments:
+    fetcher: Fetcher -- downloads the pages
+    parse_workers: int -- number of parse processes, 0 parses on the calling thread
+    queue_size: int -- defaults to two pages per parse worker
+    """
+    def __init__(self, fetcher: Fetcher, parse_workers: int, queue_size: int=None):
+        self.fetcher = fetcher
+        self.queue_size = queue_size or max(2, 2 * parse_workers)
+        # spawned, not forked, the fetch threads may hold locks when a worker starts
+        self.executor = (ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context("spawn"))
+                         if parse_workers else None)
+
+    def run(self, fetch: Callable[[Any], tuple], parse: Callable[..., Any], items: list[Any]) -> Iterator[tuple[int, Any]]:
+        """
+        (index, parse(*fetch(items[index]))) for every item as soon as it is parsed, fetch on the
+        fetch threads and parse in the workers. Items that raise are reported and left out.
+        """
+        pages = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        def fetch_one(index: int) -> None:
+            if stop.is_set():
+                return
+            try:
+                pages.put((index, fetch(items[index]), None))
+            except Exception as error:
+                pages.put((index, None, error))
+
+        def collect(futures) -> Iterator[tuple[int, Any]]:
+            for future in futures:
+                index = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as error:
+                    print(f"failed {items[index]}: {error}")
+                    continue
+                yield index, result
+
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.fetcher.workers) as fetchers:
+            fetches = [fetchers.submit(fetch_one, index) for index in range(len(items))]
+            try:
+                for _ in range(len(items)):
+                    index, arguments, error = pages.get()
+                    if error is not None:
+                        print(f"failed {items[index]}: {error}")
+                    elif self.executor is None:
+                        try:
+                            result = parse(*arguments)
+                        except Exception as error:
+                            print(f"failed {items[index]}: {error}")
+                            continue
+                        yield index, result
+                    else:
+                        pending[self.executor.submit(parse, *arguments)] = index
+                        # parsed results are small, but pages in flight are not
+                        if len(pending) >= self.queue_size:
+                            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                            yield from collect(done)
+                yield from collect(as_completed(list(pending)))
+            finally:
+                # the consumer stopped early, unblock fetch threads waiting on a full queue
+                stop.set()
+                for future in pending:
+                    future.cancel()
+                for fetch_future in fetches:
+                    while not fetch_future.done():
+                        try:
+                            pages.get(timeout=0.05)
+                        except queue.Empty:
+                            pass
+
+    def imap(self, fetch: Callable[[Any], tuple], parse: Callable[..., Any], items: Iterable[Any]) -> Iterator[tuple[Any, Any]]:
+        """(item, parse(*fetch(item))) for every item as soon as it is parsed, in no particular order."""
+        items = list(items)
+        for index, result in self.run(fetch, parse, items):
+            yield items[index], result
+
+    def map(self, fetch: Callable[[Any], tuple], parse: Callable[..., Any], items: Iterable[Any]) -> list[Any]:
+        """parse(*fetch(item)) for every item, results keep the order of items."""
+        items = list(items)
+        results = dict(self.run(fetch, parse, items))
+        return [results[index] for index in sorted(results)]
+
+    def fetch_program(self, program_code: str) -> tuple:
+        print(f"extracting course and profile data for {program_code}")
+        r = self.fetcher.get(f"/program/{program_code}")
+        if r.status_code != 200:
+            raise requests.exceptions.HTTPError(f"Given program {program_code} does not exist.")
+        return program_code, r.content, self.fetcher.base_url
+
+    def programs(self, program_codes: Iterable[str]) -> list[tuple[list[dict], list[tuple[str, str, str]]]]:
+        """return format -- [(courses, profiles)] of every program that could be scraped"""
+        return self.map(self.fetch_program, parse_program, program_codes)
+
+    def iprograms(self, program_codes: Iterable[str]) -> Iterator[tuple[str, tuple[list[dict], list[tuple[str, str, str]]]]]:
+        """return format -- (program_code, (courses, profiles)) of every program as soon as it is parsed"""
+        return self.imap(self.fetch_program, parse_program, program_codes)
+
+    def courses(self, course_codes: Iterable[str]) -> list[dict[str, any]]:
+        """return format -- [fetch_course_info()] of every course that could be scraped"""
+        def fetch(course_code: str) -> tuple:
+            print(f'Fetching: {course_code}')
+            r = self.fetcher.get(f"/kurs/{course_code}")
+            if r.status_code != 200:
+                raise ValueError(f'status_code {r.status_code}, probably wrong course code')
+            return course_code, r.content
+        return self.map(fetch, parse_course, course_codes)
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,10 +1,141 @@
 import requests
-from bs4 import BeautifulSoup, ResultSet
+from bs4 import BeautifulSoup
 import pprint
 from datetime import date
+from planning.management.commands.scrappy.fetch import STUDIEINFO_URL, Fetcher, default_fetcher, join_url
+from planning.management.commands.scrappy.parsing import default_parser, parse_html
 # from .courses import fetch_course_info
 
 MASTER_TERM_START = 7
+MASTER_SEMESTERS = (7, 8, 9)
+SEMESTER_SECTION = "accordion semester js-semester show-focus is-toggled"
+
+
+class ProgramPage:
+    """
+    What the scrapers read from a program page, parsed once.
+
+    arguments:
+    name -- program name
+    years -- option values of the admission year menu, newest first
+    profiles -- [(profile name, profile code)] of the specialization filter, "Alla inriktningar" included
+    index -- {(profile code, "" for courses without profile, semester, period): [course]}, in page order.
+             Only the first two periods of a specialization are read, like the page shows them.
+    """
+    def __init__(self, name: str, years: list[str], profiles: list[tuple[str, str]],
+                 index: dict[tuple[str, int, str], list[dict[str, any]]]):
+        self.name = name
+        self.years = years
+        self.profiles = profiles
+        self.index = index
+
+
+def read_program_page(content: bytes, parser: str=None) -> ProgramPage:
+    """
+    Parse a program page with parser, see parsing.py. lxml walks its own tree, which is
+    many times faster than building a BeautifulSoup tree on any builder.
+    """
+    parser = parser or default_parser()
+    if parser == "lxml":
+        return read_with_lxml(content)
+    return read_with_soup(parse_html(content, parser))
+
+
+def read_with_soup(soup: BeautifulSoup) -> ProgramPage:
+    header = soup.find("header", {"class": ""})
+    years = [option["value"] for option in soup.find("select", {"id": "related_entity_navigation"}).find_all("option")]
+    option_parent = soup.find("select", {"id": "specializations-filter"})
+    names = [name for name in (option.get_text(strip=True) for option in option_parent.children) if name != ""]
+    codes = [option["value"] for option in option_parent.find_all("option")]
+
+    index = {}
+    for semester_section in soup.find_all("section", {"class": SEMESTER_SECTION}):
+        semester = int(semester_section.find("h3").text[:8][-1:])
+        seen = set()
+        for specialization in semester_section.find_all("div", {"data-specialization": True}):
+            profile_code = specialization["data-specialization"]
+            # a specialization may hold nested ones, the first div of every code is the one to read
+            if profile_code in seen:
+                continue
+            seen.add(profile_code)
+
+            for period_section in specialization.find_all("tbody", {"class": "period"}, limit=2):
+                period = None
+                for row in period_section.find_all("tr"):
+                    if row.th is not None:
+                        period = row.th.text[-1:]
+                        continue
+                    classes = row.get("class", ())
+                    if "main-row" in classes and "inactive" not in classes:
+                        index.setdefault((profile_code, semester, period), []).append(format_course_scrape(row.text))
+    name = header.find("h1").text.split(",")[0] if header is not None else None
+    return ProgramPage(name, years, list(zip(names, codes)), index)
+
+
+def read_with_lxml(content: bytes) -> ProgramPage:
+    import lxml.html
+    from bs4.dammit import UnicodeDammit
+
+    def has_class(name: str) -> str:
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    root = lxml.html.fromstring(UnicodeDammit(content, is_html=True).unicode_markup)
+    headers = root.xpath("//header[not(@class) or @class='']")
+    years = root.xpath("//select[@id='related_entity_navigation']//option/@value")
+    options = root.xpath("//select[@id='specializations-filter']/option")
+    names = [name for name in (option.text_content().strip() for option in options) if name != ""]
+    codes = [option.get("value") for option in options]
+
+    index = {}
+    for semester_section in root.xpath(f"//section[@class='{SEMESTER_SECTION}']"):
+        semester = int(semester_section.xpath(".//h3")[0].text_content()[:8][-1:])
+        seen = set()
+        for specialization in semester_section.xpath(".//div[@data-specialization]"):
+            profile_code = specialization.get("data-specialization")
+            if profile_code in seen:
+                continue
+            seen.add(profile_code)
+
+            for period_section in specialization.xpath(f".//tbody[{has_class('period')}]")[:2]:
+                period = None
+                for row in period_section.iter("tr"):
+                    th = row.find(".//th")
+                    if th is not None:
+                        period = th.text_content()[-1:]
+                        continue
+                    classes = row.get("class", "").split()
+                    if "main-row" in classes and "inactive" not in classes:
+                        index.setdefault((profile_code, semester, period), []).append(
+                            format_course_scrape(row.text_content()))
+    name = headers[0].xpath(".//h1")[0].text_content().split(",")[0] if headers else None
+    return ProgramPage(name, years, list(zip(names, codes)), index)
+
+
+def format_course_scrape(text: str) -> dict[str, any]:
+    """Parses and formats the text of a "tr", {"class": "main-row"} course row.
+
+    Args:
+        text (str): the text of the row, cells separated by whitespace
+
+    Returns:
+        dict[str, any]: the scraped course
+    """
+    line = text.split()
+    temp = [line[0], ' '.join(line[1:-4])]
+    temp.extend(line[-4:])
+    if len(temp[2]) > 3:
+        temp[1:2] = [" ".join(temp[1:3])]
+        temp.pop(2)
+        temp.insert(4, "-")
+
+    return {
+        "course_code": temp[0],
+        "course_name": temp[1],
+        "hp": temp[2],
+        "level": temp[3],
+        "block": temp[4],
+        "vof": temp[5]
+    }
 
 class ProgramPlan:
     """
@@ -16,51 +147,33 @@ class ProgramPlan:
         * getting the all the courses for a given program
         * getting urls to each admissions year
     """
-    def __init__(self, program_code: str):
-        self.url = f"https://studieinfo.liu.se/program/{program_code}"
-        
-        r = requests.get(self.url)
-        if r.status_code == 200:
-            self.soup = BeautifulSoup(r.content, "html.parser")
-        else:
+    def __init__(self, program_code: str, fetcher: Fetcher=None, parser: str=None):
+        fetcher = fetcher or default_fetcher()
+        r = fetcher.get(f"/program/{program_code}")
+        if r.status_code != 200:
             raise requests.exceptions.HTTPError(f"Given program {program_code} does not exist.")
+        self.load(program_code, r.content, fetcher.base_url, parser)
 
+    @classmethod
+    def from_html(cls, program_code: str, content: bytes, base_url: str=None, parser: str=None) -> "ProgramPlan":
+        """
+        ProgramPlan of a program page that is already downloaded, e.g. in a parse worker.
+
+        arguments:
+        base_url -- the page was fetched from, defaults to $STUDIEINFO_URL
+        """
+        plan = cls.__new__(cls)
+        plan.load(program_code, content, base_url or STUDIEINFO_URL, parser)
+        return plan
+
+    def load(self, program_code: str, content: bytes, base_url: str, parser: str=None) -> None:
+        self.page = read_program_page(content, parser)
         year = self.admission_years()[2020]
-        self.url = f"https://studieinfo.liu.se/program/{year}"
+        self.url = join_url(base_url, f"/program/{year}")
         self.program_code = program_code
         self.program_name = self.program_n()
         
-    def format_course_scrape(self, course_raw: ResultSet[any]) -> list[dict[str, any]]:
-        """Parses and formats a soup object containing the tags "tr", {"class": "main-row"}.
-        This tag will contain courses in raw soup format.
-
-        Args:
-            courses_raw (ResultSet[any]): the raw course format taken from bs4
 
-        Returns:
-            list[dict[str, any]]: All the scraped courses
-        """
-        
-        
-        line = course_raw.text.split()
-        temp = [line[0], ' '.join(line[1:-4])]
-        temp.extend(line[-4:])
-        if len(temp[2]) > 3:
-            temp[1:2] = [" ".join(temp[1:3])]
-            temp.pop(2)      
-            temp.insert(4, "-") 
-            
-        course_map = {
-            "course_code": temp[0],
-            "course_name": temp[1],
-            "hp": temp[2],
-            "level": temp[3],
-            "block": temp[4],
-            "vof": temp[5]
-        }
-
-        return course_map
-           
     # def planned_courses(self, profile_code: str = None) -> list[dict[str, list[dict[str, any]]]]:
     #     """Get all the courses for the whole program or a profile sorted by their semester and period.
     #     This function is used whenever you need the ordered program plan.
@@ -104,38 +217,22 @@ class ProgramPlan:
         # extracting code and adding an empty string for easier scraping
         temp, profile_codes, program_code = zip(*self.profiles())
         profile_codes = [*profile_codes, ""]        
-        courses = []
         profile_codes.remove("free")
-        for semester_section in self.soup.find_all("section", {"class": "accordion semester js-semester show-focus is-toggled"}):
-            semester = semester_section.find("h3").text[:8]
-            semester = int(semester[-1:])
-            # ignore semesters outside of master
-            if semester not in [7, 8, 9, None]:
-                continue
-            # add all non profile specific courses
-            for profile_code in profile_codes:
-                if not semester_section.find("div", {"data-specialization": profile_code}):
-                    continue
-
-                for count, period_sections in enumerate(semester_section.find("div", {"data-specialization": profile_code}).find_all("tbody", {"class": "period"})):
-                    # when searching for data specialization="" all specializations are found -_- 
-                    if count > 1:
-                        continue
-                    period = None
-                    for row in period_sections.find_all("tr"):
-                        if row.find("th"):
-                            period = row.find("th").text[-1:]
-                            continue
-                        if "main-row" in row["class"] and "inactive" not in row["class"]:
-                            course = self.format_course_scrape(row)
-                            if profile_code == "":
-                                course["profile_code"] = "free"
-                            else:
-                                course["profile_code"] = profile_code
-                            course["program_code"] = self.program_code
-                            course["period"] = period
-                            course["semester"] = semester
-                            courses.append(course)
+        index = self.page.index
+        # semesters in page order, then profiles in filter order, then periods
+        semesters = list(dict.fromkeys(semester for _, semester, _ in index))
+        profile_order = {profile_code: position for position, profile_code in enumerate(profile_codes)}
+        keys = sorted((key for key in index if key[0] in profile_order and key[1] in MASTER_SEMESTERS),
+                      key=lambda key: (semesters.index(key[1]), profile_order[key[0]]))
+
+        courses = []
+        for profile_code, semester, period in keys:
+            for row in index[profile_code, semester, period]:
+                courses.append({**row,
+                                "profile_code": profile_code or "free",
+                                "program_code": self.program_code,
+                                "period": period,
+                                "semester": semester})
         return courses
                          
 
@@ -185,14 +282,7 @@ class ProgramPlan:
         Returns:
             list[str]: A list of url paths to each admission year.
         """
-        years_urls = {}
-    
-        options_parent = self.soup.find("select", {"id": "related_entity_navigation"})
-        options = options_parent.find_all("option")
-        for i, option in enumerate(options):
-            years_urls[date.today().year - i] = option["value"]
-        
-        return years_urls
+        return {date.today().year - i: value for i, value in enumerate(self.page.years)}
         
     def profiles(self) -> tuple[str]:
         """Get profiles for specific program.
@@ -204,30 +294,14 @@ class ProgramPlan:
             list[tuple[str, str]]: A tuple containing the profile name and its 
                         corresponding profile code
         """
-        option_parent = self.soup.find("select", {"id": "specializations-filter"})
-        values = option_parent.find_all("option")
-        profile_id = []
-        profile_names = []
-        for option in values:
-            profile_id.append(option["value"])
-            
-        for option in option_parent.children:
-            profile_names.append(option.get_text(strip=True))
-        
-        profile_names = list(filter(lambda a: a != "", profile_names))
-        profiles = [*zip(profile_names[1:], 
-                         profile_id[1:], 
-                         [self.program_code]*len(profile_id))]
+        profiles = [(name, code, self.program_code) for name, code in self.page.profiles[1:]]
         
         profiles.append(("Ingen inriktning", "free", self.program_code))
         
         return profiles
 
     def program_n(self) -> str:
-        headers = self.soup.find_all("header", {"class": ""})
-        for header in headers:
-            title = header.find("h1")
-            return title.text.split(",")[0]
+        return self.page.name
 
 
 def main():
@@ -0,0 +1,96 @@
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlsplit, unquote
+from email.utils import formatdate
+import hashlib
+import threading
+
+
+class StudieinfoHandler(SimpleHTTPRequestHandler):
+    """
+    Serves saved studieinfo pages from server.root:
+        /?...               -> index.html
+        /program/{code}     -> program/{code}.html
+        /kurs/{code}        -> kurs/{code}.html
+        /en/kurs/{code}     -> en/kurs/{code}.html
+    Pages carry an ETag and Last-Modified and unchanged pages are answered with 304.
+    """
+    def page(self) -> Path:
+        path = unquote(urlsplit(self.path).path).strip("/")
+        return self.server.root / (f"{path}.html" if path else "index.html")
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            failing = self.server.fail_first > 0
+            if failing:
+                self.server.fail_first -= 1
+
+        if failing:
+            self.send_error(503)
+            return
+
+        page = self.page()
+        if not page.resolve().is_relative_to(self.server.root) or not page.is_file():
+            self.send_error(404)
+            return
+
+        body = page.read_bytes()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        last_modified = formatdate(int(page.stat().st_mtime), usegmt=True)
+        if self.headers.get("If-None-Match") == etag:
+            with self.server.lock:
+                self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandIn:
+    """
+    Local HTTP stand-in for studieinfo.liu.se serving a directory of saved pages.
+
+    with StandIn(root) as standin:
+        ProgramPlan("6CMJU", fetcher=Fetcher(base_url=standin.url))
+
+    arguments:
+    root: str -- directory with index.html, program/ and kurs/
+    fail_first: int -- answer the first n requests with 503, to exercise retries
+    """
+    def __init__(self, root, fail_first: int=0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StudieinfoHandler)
+        self.server.root = Path(root).resolve()
+        self.server.fail_first = fail_first
+        self.server.requests = 0
+        self.server.not_modified = 0
+        self.server.lock = threading.Lock()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def requests(self) -> int:
+        return self.server.requests
+
+    @property
+    def not_modified(self) -> int:
+        return self.server.not_modified
+
+    def __enter__(self) -> "StandIn":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.2 on 2026-10-18 14:47
+
+from decimal import Decimal, InvalidOperation
+from django.db import migrations, models
+
+
+def backfill_credits(apps, schema_editor):
+    Course = apps.get_model("planning", "Course")
+    courses = list(Course.objects.all())
+    for course in courses:
+        hp = str(course.hp).strip()
+        course.is_split = hp.endswith("*")
+        try:
+            credits = Decimal(hp.rstrip("*").replace(",", "."))
+        except InvalidOperation:
+            credits = Decimal(0)
+        course.credits = credits / 2 if course.is_split else credits
+    Course.objects.bulk_update(courses, ["credits", "is_split"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='credits',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='is_split',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='campus',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='mainfield',
+            name='field_name',
+            field=models.CharField(max_length=50, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(backfill_credits, migrations.RunPython.noop),
+    ]
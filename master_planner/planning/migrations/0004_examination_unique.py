@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 14:58
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_examinations(apps, schema_editor):
+    # reruns of populate_db inserted every examination again, keep the oldest row of each (course, code)
+    Examination = apps.get_model("planning", "Examination")
+    keep = (Examination.objects
+            .values("course", "code")
+            .annotate(keep=Min("id"))
+            .values_list("keep", flat=True))
+    Examination.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0003_catalogueversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_examinations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='examination',
+            constraint=models.UniqueConstraint(fields=('course', 'code'), name='unique_course_examination'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.2 on 2026-10-18 15:00
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_scheduler_profiles(apps, schema_editor):
+    # bulk_create(ignore_conflicts=True) had no constraint to conflict with, keep the oldest row of each pair
+    SchedulersProfiles = apps.get_model("planning", "SchedulersProfiles")
+    keep = (SchedulersProfiles.objects
+            .values("scheduler", "profile")
+            .annotate(keep=Min("id"))
+            .values_list("keep", flat=True))
+    SchedulersProfiles.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0004_examination_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_scheduler_profiles, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['semester', 'period'], name='schedule_semester_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduler',
+            index=models.Index(fields=['program', 'schedule'], name='scheduler_program_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduler',
+            index=models.Index(fields=['program', 'course'], name='scheduler_program_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedulersprofiles',
+            index=models.Index(fields=['profile', 'scheduler'], name='schedulerprofile_profile_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='schedulersprofiles',
+            constraint=models.UniqueConstraint(fields=('scheduler', 'profile'), name='unique_scheduler_profile'),
+        ),
+    ]
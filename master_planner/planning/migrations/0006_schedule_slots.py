@@ -0,0 +1,103 @@
+# Generated by Django 4.2.2 on 2026-10-18 15:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# copies of planning.models.SLOT_BLOCKS/SLOTS_PER_PERIOD, migrations must not depend on the current models
+SLOT_BLOCKS = {"-": 0, "1": 1, "2": 2, "3": 3, "4": 4}
+SLOTS_PER_PERIOD = 10
+
+
+def move_to_slots(apps, schema_editor):
+    """Create a slot for every distinct (semester, period, block) and point the schedulers at it."""
+    LegacySchedule = apps.get_model("planning", "LegacySchedule")
+    Schedule = apps.get_model("planning", "Schedule")
+    Scheduler = apps.get_model("planning", "Scheduler")
+
+    slots = {}
+    for semester in range(7, 10):
+        for period in range(1, 3):
+            for block, slot in SLOT_BLOCKS.items():
+                slots[semester, period, block] = semester * 100 + period * SLOTS_PER_PERIOD + slot
+
+    legacy = {}
+    for schedule in LegacySchedule.objects.order_by("semester", "period", "block"):
+        key = (schedule.semester, schedule.period, str(schedule.block))
+        if key not in slots:
+            base = schedule.semester * 100 + schedule.period * SLOTS_PER_PERIOD
+            if key[2] in SLOT_BLOCKS:
+                slots[key] = base + SLOT_BLOCKS[key[2]]
+            else:
+                used = set(slots.values())
+                slots[key] = next(base + slot for slot in range(len(SLOT_BLOCKS), SLOTS_PER_PERIOD)
+                                  if base + slot not in used)
+        legacy[schedule.id] = slots[key]
+
+    Schedule.objects.bulk_create([Schedule(id=slot, semester=semester, period=period, block=block)
+                                  for (semester, period, block), slot in slots.items()])
+    schedulers = list(Scheduler.objects.only("scheduler_id", "schedule_id"))
+    for scheduler in schedulers:
+        scheduler.slot_id = legacy[scheduler.schedule_id]
+    Scheduler.objects.bulk_update(schedulers, ["slot"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0005_planner_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='scheduler',
+            name='scheduler_program_schedule_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='schedule',
+            name='schedule_semester_period_idx',
+        ),
+        migrations.RenameModel(
+            old_name='Schedule',
+            new_name='LegacySchedule',
+        ),
+        migrations.CreateModel(
+            name='Schedule',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('period', models.IntegerField()),
+                ('semester', models.IntegerField()),
+                ('block', models.CharField(max_length=10)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='scheduler',
+            name='slot',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='planning.schedule'),
+        ),
+        migrations.RunPython(move_to_slots, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='scheduler',
+            name='schedule',
+        ),
+        migrations.DeleteModel(
+            name='LegacySchedule',
+        ),
+        migrations.RenameField(
+            model_name='scheduler',
+            old_name='slot',
+            new_name='schedule',
+        ),
+        migrations.AlterField(
+            model_name='scheduler',
+            name='schedule',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='planning.schedule'),
+        ),
+        migrations.AddConstraint(
+            model_name='schedule',
+            constraint=models.UniqueConstraint(fields=('semester', 'period', 'block'), name='unique_schedule_slot'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduler',
+            index=models.Index(fields=['program', 'schedule'], name='scheduler_program_schedule_idx'),
+        ),
+    ]
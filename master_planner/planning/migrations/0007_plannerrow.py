@@ -0,0 +1,59 @@
+# Generated by Django 4.2.2 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+def build_planner_rows(apps, schema_editor):
+    # same columns as planning.models.PLANNER_ROW_SOURCE, so the browse endpoints work before the next import
+    SchedulersProfiles = apps.get_model("planning", "SchedulersProfiles")
+    PlannerRow = apps.get_model("planning", "PlannerRow")
+    source = {"program_code": "scheduler__program_id",
+              "profile_code": "profile_id",
+              "scheduler_id": "scheduler_id",
+              "linked_id": "scheduler__linked_id",
+              "vof": "vof",
+              "course_code": "scheduler__course__course_code",
+              "course_name": "scheduler__course__course_name",
+              "hp": "scheduler__course__hp",
+              "credits": "scheduler__course__credits",
+              "level": "scheduler__course__level",
+              "examinator": "scheduler__course__examinator",
+              "semester": "scheduler__schedule__semester",
+              "period": "scheduler__schedule__period",
+              "block": "scheduler__schedule__block"}
+    rows = SchedulersProfiles.objects.order_by("id").values_list(*source.values())
+    PlannerRow.objects.bulk_create([PlannerRow(**dict(zip(source, values))) for values in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0006_schedule_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlannerRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('program_code', models.CharField(max_length=10)),
+                ('profile_code', models.CharField(max_length=10)),
+                ('scheduler_id', models.UUIDField()),
+                ('linked_id', models.UUIDField(null=True)),
+                ('vof', models.CharField(max_length=10)),
+                ('course_code', models.CharField(max_length=6)),
+                ('course_name', models.CharField(max_length=120)),
+                ('hp', models.CharField(max_length=5)),
+                ('credits', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('level', models.CharField(max_length=20)),
+                ('examinator', models.CharField(max_length=50, null=True)),
+                ('semester', models.IntegerField()),
+                ('period', models.IntegerField()),
+                ('block', models.CharField(max_length=10)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['program_code', 'profile_code', 'semester', 'period'], name='plannerrow_browse_idx')],
+            },
+        ),
+        migrations.RunPython(build_planner_rows, migrations.RunPython.noop),
+    ]
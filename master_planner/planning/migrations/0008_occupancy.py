@@ -0,0 +1,51 @@
+# Generated by Django 4.2.2 on 2026-10-18 15:17
+
+from django.db import migrations, models
+import re
+
+
+def schedule_bits(schedule):
+    # planning.models.occupancy_bits at the time of this migration
+    if schedule.semester not in (7, 8, 9) or schedule.period not in (1, 2):
+        return 0
+    offset = ((schedule.semester - 7) * 2 + schedule.period - 1) * 10
+    blocks = {"1": 1, "2": 2, "3": 3, "4": 4}
+    slots = {blocks[part] for part in re.findall(r"\d+", schedule.block) if part in blocks} or {schedule.id % 10}
+    return sum(1 << (offset + slot) for slot in slots)
+
+
+def set_occupancy(apps, schema_editor):
+    Scheduler = apps.get_model("planning", "Scheduler")
+    PlannerRow = apps.get_model("planning", "PlannerRow")
+    schedulers = list(Scheduler.objects.select_related("schedule"))
+    bits = {scheduler.scheduler_id: schedule_bits(scheduler.schedule) for scheduler in schedulers}
+    for scheduler in schedulers:
+        scheduler.occupancy = bits[scheduler.scheduler_id] | bits.get(scheduler.linked_id, 0)
+    Scheduler.objects.bulk_update(schedulers, ["occupancy"], batch_size=500)
+
+    occupancy = {scheduler.scheduler_id: scheduler.occupancy for scheduler in schedulers}
+    rows = list(PlannerRow.objects.only("id", "scheduler_id"))
+    for row in rows:
+        row.occupancy = occupancy.get(row.scheduler_id, 0)
+    PlannerRow.objects.bulk_update(rows, ["occupancy"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0007_plannerrow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plannerrow',
+            name='occupancy',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='scheduler',
+            name='occupancy',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(set_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0008_occupancy'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='plannerrow',
+            index=models.Index(fields=['program_code', 'profile_code', 'id'], name='plannerrow_keyset_idx'),
+        ),
+    ]
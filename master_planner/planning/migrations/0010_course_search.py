@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# planning.search at the time of this migration
+CREATE = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE planning_course_search USING fts5("
+        "course_code, course_name, examinator, main_fields, examinations, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    ],
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS unaccent",
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE TABLE planning_course_search ("
+        "course_code varchar(6) PRIMARY KEY, course_name text NOT NULL, examinator text NOT NULL, "
+        "main_fields text NOT NULL, examinations text NOT NULL, folded text NOT NULL DEFAULT '', document tsvector)",
+        "CREATE INDEX planning_course_search_document_idx ON planning_course_search USING gin (document)",
+        "CREATE INDEX planning_course_search_folded_idx ON planning_course_search USING gin (folded gin_trgm_ops)",
+    ],
+}
+AGGREGATE = {"sqlite": "group_concat", "postgresql": "string_agg"}
+FILL = ("INSERT INTO planning_course_search (course_code, course_name, examinator, main_fields, examinations) "
+        "SELECT course_code, course_name, coalesce(examinator, ''), "
+        "       coalesce((SELECT {aggregate}(mainfield_id, ' ') FROM planning_course_main_fields "
+        "                 WHERE course_id = course_code), ''), "
+        "       coalesce((SELECT {aggregate}(name, ' ') FROM planning_examination "
+        "                 WHERE course_id = course_code), '') "
+        "FROM planning_course")
+POSTGRES_DOCUMENT = ("UPDATE planning_course_search SET "
+                     "folded = unaccent(lower(concat_ws(' ', course_code, course_name, examinator, "
+                     "                                  main_fields, examinations))), "
+                     "document = setweight(to_tsvector('simple', unaccent(course_code)), 'A') || "
+                     "           setweight(to_tsvector('simple', unaccent(course_name)), 'B') || "
+                     "           setweight(to_tsvector('simple', unaccent(examinator)), 'C') || "
+                     "           setweight(to_tsvector('simple', unaccent(main_fields || ' ' || examinations)), 'D')")
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in CREATE:
+        return
+    for statement in CREATE[vendor]:
+        schema_editor.execute(statement)
+    schema_editor.execute(FILL.format(aggregate=AGGREGATE[vendor]))
+    if vendor == "postgresql":
+        schema_editor.execute(POSTGRES_DOCUMENT)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE:
+        schema_editor.execute("DROP TABLE planning_course_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0009_plannerrow_keyset'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
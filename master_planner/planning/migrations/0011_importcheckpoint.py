@@ -0,0 +1,22 @@
+# Generated by Django 4.2.2 on 2026-10-18 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0010_course_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('program_code', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('schedulers', models.PositiveIntegerField(default=0)),
+                ('courses', models.PositiveIntegerField(default=0)),
+                ('committed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0011_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='plannerrow',
+            name='plannerrow_keyset_idx',
+        ),
+        migrations.AddIndex(
+            model_name='plannerrow',
+            index=models.Index(fields=['program_code', 'profile_code', 'semester', 'period', 'course_code', 'scheduler_id'], name='plannerrow_keyset_idx'),
+        ),
+    ]
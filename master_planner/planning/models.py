@@ -1,6 +1,9 @@
-from django.db import models, IntegrityError
+from django.db import connection, models, IntegrityError, transaction
+from django.db.models import F
 from planning.management.commands.scrappy.program_plan import ProgramPlan
 from typing import Union
+from decimal import Decimal, InvalidOperation
+import re
 import uuid
 
     
@@ -10,15 +13,32 @@ class MainField(models.Model):
     def __str__(self):
         return self.field_name
 
+def parse_hp(hp: str) -> tuple[Decimal, bool]:
+    """Parse a scraped hp string like "6" or "6*" into (credits per period, is_split)."""
+    hp = str(hp).strip()
+    is_split = hp.endswith("*")
+    try:
+        credits = Decimal(hp.rstrip("*").replace(",", "."))
+    except InvalidOperation:
+        return Decimal(0), is_split
+    return (credits / 2 if is_split else credits), is_split
+
 class Course(models.Model):
     course_code = models.CharField(max_length=6, primary_key=True)
     examinator = models.CharField(max_length=50, null=True)
     course_name = models.CharField(max_length=120)
     hp = models.CharField(max_length=5, default=1)
+    # hp counted for each scheduled period, half of hp when the course is split ("*") over two periods
+    credits = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    is_split = models.BooleanField(default=False)
     level = models.CharField(max_length=20)
     campus = models.CharField(max_length=100, null=True)
     main_fields = models.ManyToManyField(MainField)
 
+    def save(self, *args, **kwargs):
+        self.credits, self.is_split = parse_hp(self.hp)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Course: {self.course_code}"
 
@@ -30,18 +50,117 @@ class Examination(models.Model):
     code = models.CharField(max_length=10)
     course = models.ForeignKey(Course,on_delete=models.CASCADE, null=True)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["course", "code"], name="unique_course_examination")]
+
     def __str__(self):
         return f"Exam: {self.name}"
 
+# blocks with a fixed slot, other blocks get the free slots 5-9 of their period when first seen
+SLOT_BLOCKS = {"-": 0, "1": 1, "2": 2, "3": 3, "4": 4}
+SLOTS_PER_PERIOD = 10
+
+def slot_id(semester: int, period: int, block: str) -> int:
+    """Deterministic Schedule id of a (semester, period, block) with a fixed slot, e.g. (8, 2, "3") -> 823."""
+    return int(semester) * 100 + int(period) * SLOTS_PER_PERIOD + SLOT_BLOCKS[str(block)]
+
+def slot_ids(semester: int, period: int=None) -> list[int]:
+    """Every Schedule id a semester (and period) can have, for schedule_id__in filters without a join."""
+    periods = (period,) if period is not None else (1, 2)
+    return [int(semester) * 100 + int(period) * SLOTS_PER_PERIOD + slot
+            for period in periods
+            for slot in range(SLOTS_PER_PERIOD)]
+
+OCCUPANCY_SEMESTERS = range(7, 10)
+
+def occupancy_bits(schedule: "Schedule") -> int:
+    """
+    Bits of a schedule in Scheduler.occupancy, 10 slots per period of semesters 7-9 so they fit
+    the 60 bits of a signed bigint. A block naming fixed blocks takes their bits, "1+3" clashes
+    with "1" and with "3", any other block ("-", "distans") takes the bit of its own slot.
+    Schedules in other semesters have no bits.
+    """
+    semester, period = int(schedule.semester), int(schedule.period)
+    if semester not in OCCUPANCY_SEMESTERS or period not in (1, 2):
+        return 0
+    offset = ((semester - OCCUPANCY_SEMESTERS.start) * 2 + period - 1) * SLOTS_PER_PERIOD
+    slots = {SLOT_BLOCKS[part] for part in re.findall(r"\d+", str(schedule.block)) if part in SLOT_BLOCKS}
+    if not slots:
+        slots = {schedule.id % SLOTS_PER_PERIOD}
+    bits = 0
+    for slot in slots:
+        bits |= 1 << (offset + slot)
+    return bits
+
+def occupancy_slot(position: int) -> tuple[int, int, int]:
+    """(semester, period, slot) of bit position of occupancy_bits(), the inverse of its encoding."""
+    offset, slot = divmod(position, SLOTS_PER_PERIOD)
+    return OCCUPANCY_SEMESTERS.start + offset // 2, offset % 2 + 1, slot
+
+def period_bits(schedule_id: int) -> int:
+    """Every occupancy bit of the period of a schedule id, 0 outside semesters 7-9."""
+    semester, period = divmod(int(schedule_id) // SLOTS_PER_PERIOD, 10)
+    if semester not in OCCUPANCY_SEMESTERS or period not in (1, 2):
+        return 0
+    return ((1 << SLOTS_PER_PERIOD) - 1) << ((semester - OCCUPANCY_SEMESTERS.start) * 2 + period - 1) * SLOTS_PER_PERIOD
+
 class Schedule(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)    
+    """A (semester, period, block) slot, a small fixed dimension keyed by slot_id()."""
+    id = models.PositiveSmallIntegerField(primary_key=True)
     period = models.IntegerField()
     semester = models.IntegerField()
     block = models.CharField(max_length=10)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["semester", "period", "block"], name="unique_schedule_slot")]
+
+    def save(self, *args, **kwargs):
+        if self.id is None:
+            self.id = resolve_schedules([(self.semester, self.period, self.block)], create=False)[
+                int(self.semester), int(self.period), str(self.block)].id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Schedule: {self.semester}-{self.period}-{self.block}"
 
+def resolve_schedules(keys, create: bool=True) -> dict[tuple[int, int, str], Schedule]:
+    """
+    Schedule of every (semester, period, block) in keys.
+    Ids of blocks with a fixed slot are computed in memory, only blocks without one are looked up.
+
+    arguments:
+    create: bool -- insert the rows that are missing, a single INSERT that ignores existing slots
+
+    return format -- {(semester, period, block): Schedule}
+    """
+    schedules = {}
+    unknown = set()
+    for semester, period, block in keys:
+        key = (int(semester), int(period), str(block))
+        if key[2] in SLOT_BLOCKS:
+            schedules[key] = Schedule(id=slot_id(*key), semester=key[0], period=key[1], block=key[2])
+        else:
+            unknown.add(key)
+
+    if unknown:
+        taken = {}
+        for schedule in Schedule.objects.filter(id__in={slot for semester, period, _ in unknown
+                                                        for slot in slot_ids(semester, period)}):
+            taken[schedule.semester, schedule.period, schedule.block] = schedule.id
+        for semester, period, block in sorted(unknown):
+            schedule_id = taken.get((semester, period, block))
+            if schedule_id is None:
+                used = set(taken.values())
+                free = [slot for slot in slot_ids(semester, period)[len(SLOT_BLOCKS):] if slot not in used]
+                if not free:
+                    raise ValueError(f"no free schedule slot for block {block} in semester {semester} period {period}")
+                schedule_id = taken[semester, period, block] = free[0]
+            schedules[semester, period, block] = Schedule(id=schedule_id, semester=semester, period=period, block=block)
+
+    if create:
+        Schedule.objects.bulk_create(schedules.values(), ignore_conflicts=True)
+    return schedules
+
 class Profile(models.Model):
     profile_name = models.CharField(max_length=120)
     profile_code = models.CharField(max_length=10, primary_key=True)
@@ -64,6 +183,13 @@ class Scheduler(models.Model):
     program = models.ForeignKey(Program, on_delete=models.CASCADE)
     profiles = models.ManyToManyField(Profile, through="SchedulersProfiles")
     linked = models.ForeignKey("self", on_delete=models.CASCADE, blank=True, null=True)
+    # occupancy_bits() of the schedule and of the linked half, set by set_occupancy() at import
+    occupancy = models.BigIntegerField(default=0)
+
+    class Meta:
+        # the catalogue filters on program and semester/period, the overview on program and course
+        indexes = [models.Index(fields=["program", "schedule"], name="scheduler_program_schedule_idx"),
+                   models.Index(fields=["program", "course"], name="scheduler_program_course_idx")]
 
     def __str__(self):
         return f"Scheduler instance: {self.scheduler_id}"
@@ -73,9 +199,122 @@ class SchedulersProfiles(models.Model):
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE)
     vof = models.CharField(max_length=10)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["scheduler", "profile"], name="unique_scheduler_profile")]
+        indexes = [models.Index(fields=["profile", "scheduler"], name="schedulerprofile_profile_idx")]
+
     def __str__(self):
         return f"{self.scheduler.scheduler_id}-{self.profile.profile_code}-{self.vof}"
     
+class PlannerRow(models.Model):
+    """
+    Read-only flat copy of the catalogue, one row per (program, profile, scheduler).
+    The browse endpoints read it without joins, populate_db rebuilds it with rebuild_planner_rows().
+    """
+    program_code = models.CharField(max_length=10)
+    profile_code = models.CharField(max_length=10)
+    scheduler_id = models.UUIDField()
+    linked_id = models.UUIDField(null=True)
+    vof = models.CharField(max_length=10)
+    course_code = models.CharField(max_length=6)
+    course_name = models.CharField(max_length=120)
+    hp = models.CharField(max_length=5)
+    credits = models.DecimalField(max_digits=5, decimal_places=2)
+    level = models.CharField(max_length=20)
+    examinator = models.CharField(max_length=50, null=True)
+    semester = models.IntegerField()
+    period = models.IntegerField()
+    block = models.CharField(max_length=10)
+    occupancy = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["program_code", "profile_code", "semester", "period"], name="plannerrow_browse_idx"),
+                   # keyset pagination of the catalogue query endpoint, on a key that survives rebuilds
+                   models.Index(fields=["program_code", "profile_code", "semester", "period", "course_code",
+                                        "scheduler_id"], name="plannerrow_keyset_idx")]
+
+    def __str__(self):
+        return f"Planner row: {self.program_code}-{self.profile_code}-{self.course_code}"
+
+    @property
+    def course(self) -> Course:
+        return Course(course_code=self.course_code, course_name=self.course_name, hp=self.hp,
+                      credits=self.credits, level=self.level, examinator=self.examinator)
+
+    @property
+    def schedule(self) -> Schedule:
+        return Schedule(semester=self.semester, period=self.period, block=self.block)
+
+PLANNER_ROW_SOURCE = {"program_code": "scheduler__program_id",
+                      "profile_code": "profile_id",
+                      "scheduler_id": "scheduler_id",
+                      "linked_id": "scheduler__linked_id",
+                      "vof": "vof",
+                      "course_code": "scheduler__course__course_code",
+                      "course_name": "scheduler__course__course_name",
+                      "hp": "scheduler__course__hp",
+                      "credits": "scheduler__course__credits",
+                      "level": "scheduler__course__level",
+                      "examinator": "scheduler__course__examinator",
+                      "semester": "scheduler__schedule__semester",
+                      "period": "scheduler__schedule__period",
+                      "block": "scheduler__schedule__block",
+                      "occupancy": "scheduler__occupancy"}
+
+def rebuild_planner_rows(program_codes: list[str]=None, batch_size: int=1000) -> int:
+    """
+    Rebuild the planner rows of some programs, or all of them, from the catalogue tables.
+
+    return format -- number of rows written
+    """
+    rows = SchedulersProfiles.objects.order_by("id")
+    stale = PlannerRow.objects.all()
+    if program_codes is not None:
+        rows = rows.filter(scheduler__program_id__in=program_codes)
+        stale = stale.filter(program_code__in=program_codes)
+
+    with transaction.atomic():
+        stale.delete()
+        planner_rows = [PlannerRow(**dict(zip(PLANNER_ROW_SOURCE, values)))
+                        for values in rows.values_list(*PLANNER_ROW_SOURCE.values())]
+        PlannerRow.objects.bulk_create(planner_rows, batch_size=batch_size)
+    return len(planner_rows)
+
+class CatalogueVersion(models.Model):
+    """Single row bumped whenever the catalogue is reimported, cached catalogue responses are keyed on it."""
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Catalogue version: {self.version}"
+
+    @classmethod
+    def current(cls) -> "CatalogueVersion":
+        catalogue, _ = cls.objects.get_or_create(pk=1)
+        return catalogue
+
+    @classmethod
+    def bump(cls) -> "CatalogueVersion":
+        with transaction.atomic():
+            catalogue = cls.current()
+            catalogue.version = F("version") + 1
+            catalogue.save()
+        catalogue.refresh_from_db()
+        return catalogue
+    
+class ImportCheckpoint(models.Model):
+    """
+    A program a streaming import (populate_db --stream) has committed, written in the same
+    transaction as its rows, so --resume continues a crashed import after the last program.
+    """
+    program_code = models.CharField(max_length=10, primary_key=True)
+    schedulers = models.PositiveIntegerField(default=0)
+    courses = models.PositiveIntegerField(default=0)
+    committed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Import checkpoint: {self.program_code}"
+
 def register_programs(program_data: list[tuple[str, str]]):
     programs = []
     for code, name in program_data:
@@ -99,39 +338,45 @@ def register_profiles(profile_data: list[tuple[str, str, str]]) -> None:
     Profile.objects.bulk_create(profiles.values())
     Program.profiles.through.objects.bulk_create(program_profile_list)
 
-def register_courses(data: dict[Union[str, int]]) -> None:
+def register_courses(data: dict[Union[str, int]], known_courses: set[str]=frozenset(),
+                     schedules: dict[tuple[int, int, str], Schedule]=None) -> tuple[set[str], int]:
+    """
+    arguments:
+    known_courses -- codes of courses that are already stored, only their schedulers are written
+    schedules -- {(semester, period, block): Schedule} covering data, resolved and created if left empty
+
+    return format -- (codes of the courses written, number of schedulers written)
+    """
     # initialize containers for model objects
     schedulers = {}
     courses = set()
-    schedules = {}
     scheduler_profiles_list = []
     
+    if schedules is None:
+        schedules = resolve_schedules((course_data["semester"], course_data["period"], course_data["block"])
+                                      for course_data in data)
+
     # loop through course data
     for course_data in data:
-        semester = course_data["semester"]
-        period = course_data["period"]
-        block = course_data["block"]
+        semester = int(course_data["semester"])
+        period = int(course_data["period"])
+        block = str(course_data["block"])
         program_id = course_data["program_code"]
         profile_id = course_data["profile_code"]
         course_id = course_data["course_code"]
         vof = course_data["vof"]
         
+        credits, is_split = parse_hp(course_data["hp"])
         course = Course(course_code=course_data["course_code"],
                         course_name=course_data["course_name"],
                         hp=course_data["hp"],
+                        credits=credits,
+                        is_split=is_split,
                         level=course_data["level"],
                         )
         courses.add(course)
         
-        # create if nonexistent
-        if (semester, period, block) in schedules:
-            schedule = schedules[semester, period, block]
-        else:
-            schedule = Schedule(block=block,
-                                semester=semester,
-                                period=period
-                                )
-            schedules[semester, period, block] = schedule
+        schedule = schedules[semester, period, block]
 
         # create scheduler if nonexistent
         if (program_id, course_id, semester, period, block) in schedulers:
@@ -153,47 +398,99 @@ def register_courses(data: dict[Union[str, int]]) -> None:
                                                   vof=course_data['vof'])
         scheduler_profiles_list.append(scheduler_profile)
     
+    # link courses before inserting, foreign keys are only checked at commit
+    split = {course.course_code for course in courses if course.is_split}
+    _, unmatched = link_split_courses(schedulers, split)
+    report_unmatched(unmatched)
+    set_occupancy(schedulers.values())
+
     # create everything
+    courses = [course for course in courses if course.course_code not in known_courses]
     Course.objects.bulk_create(courses)
-    Schedule.objects.bulk_create(schedules.values())
     Scheduler.objects.bulk_create(schedulers.values())
     Scheduler.profiles.through.objects.bulk_create(scheduler_profiles_list, ignore_conflicts=True)
-    
-    # link courses
-    linked_course_instances = []
-    for course_instance in Scheduler.objects.all():
-        if "*" in course_instance.course.hp and course_instance.schedule.period == 2:
-            # get the matching scheduler objects 
-            first_part = Scheduler.objects.get(course=course_instance.course,
-                                               program=course_instance.program,
-                                               schedule__period=1,
-                                               schedule__semester=course_instance.schedule.semester
-                                               )
-            # linke them and add to list for bulk_update
-            first_part.linked = course_instance
-            course_instance.linked = first_part
-            linked_course_instances.extend([first_part, course_instance])
-
-    Scheduler.objects.bulk_update(linked_course_instances, ["linked"])
+    return {course.course_code for course in courses}, len(schedulers)
+
+def link_split_courses(schedulers: dict[tuple, Scheduler], split: set[str]) -> tuple[list[Scheduler], list[tuple]]:
+    """
+    Pair the period 1 and period 2 halves of split courses in memory.
+    A period 2 half is linked to the period 1 scheduler of the same program, course and semester.
+
+    arguments:
+    schedulers: dict -- {(program_code, course_code, semester, period, block): Scheduler}, period as int
+    split: set -- codes of the courses that are split over two periods
+
+    return format -- (schedulers whose linked changed, [(program_code, course_code, semester, period 1 matches)]
+                      for period 2 halves without exactly one match)
+    """
+    first_parts = {}
+    for (program_code, course_code, semester, period, block), scheduler in schedulers.items():
+        if course_code in split and period == 1:
+            first_parts.setdefault((program_code, course_code, semester), []).append(scheduler)
+
+    linked = {}
+    unmatched = []
+    for (program_code, course_code, semester, period, block), scheduler in schedulers.items():
+        if course_code not in split or period != 2:
+            continue
+        candidates = first_parts.get((program_code, course_code, semester), [])
+        if len(candidates) != 1:
+            unmatched.append((program_code, course_code, semester, len(candidates)))
+            continue
+        linked[scheduler.scheduler_id] = candidates[0].scheduler_id
+        linked[candidates[0].scheduler_id] = scheduler.scheduler_id
+
+    changed = []
+    for scheduler in schedulers.values():
+        linked_id = linked.get(scheduler.scheduler_id)
+        if scheduler.linked_id != linked_id:
+            scheduler.linked_id = linked_id
+            changed.append(scheduler)
+    return changed, unmatched
+
+def set_occupancy(schedulers) -> list[Scheduler]:
+    """
+    Set the occupancy bits of schedulers from their schedule and linked half in memory,
+    schedules have to be loaded and the linked halves have to be among schedulers.
+
+    return format -- schedulers whose occupancy changed
+    """
+    schedulers = list(schedulers)
+    bits = {scheduler.scheduler_id: occupancy_bits(scheduler.schedule) for scheduler in schedulers}
+    changed = []
+    for scheduler in schedulers:
+        occupancy = bits[scheduler.scheduler_id] | bits.get(scheduler.linked_id, 0)
+        if scheduler.occupancy != occupancy:
+            scheduler.occupancy = occupancy
+            changed.append(scheduler)
+    return changed
+
+def report_unmatched(unmatched: list[tuple]) -> None:
+    for program_code, course_code, semester, matches in unmatched:
+        print(f"could not link split course {course_code} in {program_code} semester {semester}: "
+              f"{matches} period 1 matches")
 
 def get_courses_term(program: any, semester: str, profile=None): # TODO fix typing, döpa om funktion
     period_1 = list(Scheduler.objects.filter(program=program, 
                                              profiles=profile,
-                                             schedule__semester=semester, 
-                                             schedule__period=1))
+                                             schedule_id__in=slot_ids(semester, 1)))
     
     period_2 = list(Scheduler.objects.filter(program=program, 
                                              profiles=profile,
-                                             schedule__semester=semester,
-                                             schedule__period=2))
+                                             schedule_id__in=slot_ids(semester, 2)))
 
     return {1: period_1, 2: period_2}
 
-def register_course_details(data):
-    examinations = []
+def register_course_details(data: list[dict[str, any]], batch_size: int=500) -> None:
+    """
+    Store the scraped course pages: examinator, campus, main fields and examinations.
+    Everything is written in one transaction, examinations are upserted on (course, code)
+    so a rerun updates them instead of adding duplicates.
+    """
+    examinations = {}
     course_fields_list = []
-    updated_courses = []
-    create_fields = []
+    create_fields = {}
+    details = {}
     
     for course_data in data:
         course_code = course_data["course_code"]
@@ -205,19 +502,49 @@ def register_course_details(data):
                 name=examination["name"],
                 grading=examination["grading"]
             )
-            examinations.append(exam)
-        
-        updated_course = Course.objects.filter(course_code=course_code)
+            examinations[course_code, exam.code] = exam
 
         for field in course_data["main_field"]:
-            main_field = MainField(field_name=field)
-            course_fields = Course.main_fields.through(course_id=course_code, mainfield_id=main_field.field_name)
+            course_fields = Course.main_fields.through(course_id=course_code, mainfield_id=field)
             course_fields_list.append(course_fields)
-            create_fields.append(main_field)
+            create_fields[field] = MainField(field_name=field)
             
-        updated_course.update(examinator=course_data["examinator"])
-        updated_course.update(campus=course_data["location"])
+        details[course_code] = (course_data["examinator"], course_data["location"])
         
-    MainField.objects.bulk_create(create_fields, ignore_conflicts=True) 
-    Course.main_fields.through.objects.bulk_create(course_fields_list, ignore_conflicts=True)
-    Examination.objects.bulk_create(examinations)
+    with transaction.atomic():
+        update_course_details(details, batch_size)
+        MainField.objects.bulk_create(create_fields.values(), batch_size=batch_size, ignore_conflicts=True) 
+        Course.main_fields.through.objects.bulk_create(course_fields_list, batch_size=batch_size, ignore_conflicts=True)
+        Examination.objects.bulk_create(examinations.values(),
+                                        batch_size=batch_size,
+                                        update_conflicts=True,
+                                        unique_fields=["course", "code"],
+                                        update_fields=["hp", "name", "grading"])
+
+def update_course_details(details: dict[str, tuple[str, str]], batch_size: int=500) -> None:
+    """
+    Set examinator and campus of many courses.
+
+    arguments:
+    details: dict -- {course_code: (examinator, campus)}
+    """
+    rows = list(details.items())
+    table = connection.ops.quote_name(Course._meta.db_table)
+    if connection.vendor != "postgresql":
+        # a prepared statement run for every row is cheapest on an in-process database,
+        # bulk_update's CASE WHEN per column is slower than the per-course updates it replaces
+        with connection.cursor() as cursor:
+            cursor.executemany(f"UPDATE {table} SET examinator = %s, campus = %s WHERE course_code = %s",
+                               [(examinator, campus, code) for code, (examinator, campus) in rows])
+        return
+
+    # one UPDATE ... FROM (VALUES ...) per batch instead of a round-trip per course
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values = ", ".join(["(%s, %s, %s)"] * len(batch))
+            cursor.execute(f"UPDATE {table} AS course "
+                           f"SET examinator = v.examinator, campus = v.campus "
+                           f"FROM (VALUES {values}) AS v(course_code, examinator, campus) "
+                           f"WHERE course.course_code = v.course_code",
+                           [value for code, (examinator, campus) in batch for value in (code, examinator, campus)])
@@ -0,0 +1,273 @@
+"""
+Plan optimiser, suggests course plans for semesters 7-9 without block clashes.
+
+Every course given in the target profile (or without profile) is one decision: skip it or
+take one of its instances. An instance is a scheduler together with its linked half, so
+split courses are always taken whole. Plans are searched depth first, branch and bound:
+    clashes         every instance has a bitset of the slots it occupies (the encoding of
+                    Scheduler.occupancy), it fits when
+                    the bitset does not intersect the occupancy of the plan so far
+    requirements    a branch is cut when the remaining courses cannot reach one of the
+                    minimums, bounded both by the best instance of every remaining course
+                    and by one course per free slot within the hp left per period
+    ranking         a branch is cut when its best possible score cannot beat the
+                    k-th best plan found so far
+Plans are ranked on profile hp, then on the fewest total hp. The search stops when the
+time budget runs out and returns the best plans found until then.
+"""
+from planning.models import MainField, Schedule, Scheduler, SchedulersProfiles, occupancy_bits
+from accounts.overview import course_level, SEMESTERS, PERIODS
+import heapq
+import time
+
+# positions in the hp vectors of instances and plans, counted main fields follow
+HP, PROFILE_HP, A_LEVEL_HP = range(3)
+PERIOD_INDEX = {(semester, period): index
+                for index, (semester, period) in enumerate((semester, period)
+                                                           for semester in SEMESTERS
+                                                           for period in PERIODS)}
+
+
+class PlanError(Exception):
+    pass
+
+
+class PlanConstraints:
+    """
+    arguments:
+    min_field_hp -- {main field name: minimum hp}
+    max_period_hp -- maximum hp in any one period, None for no limit
+    lock -- scheduler ids that every plan must contain
+    exclude -- course codes that no plan may contain
+    """
+    def __init__(self, min_total_hp: float=0, min_profile_hp: float=0, min_a_level_hp: float=0,
+                 min_field_hp: dict[str, float]=None, max_period_hp: float=None, lock=(), exclude=()):
+        self.min_total_hp = min_total_hp
+        self.min_profile_hp = min_profile_hp
+        self.min_a_level_hp = min_a_level_hp
+        self.min_field_hp = dict(min_field_hp or {})
+        self.max_period_hp = max_period_hp
+        self.lock = [str(scheduler_id) for scheduler_id in lock]
+        self.exclude = set(exclude)
+
+
+class Instance:
+    """One way of taking a course: a scheduler and its linked half."""
+    __slots__ = ("course_code", "scheduler_ids", "occupancy", "halves", "values")
+
+    def __init__(self, course_code: str, rows: list[tuple], weights: tuple):
+        """
+        arguments:
+        rows -- [(scheduler_id, occupancy bits, semester, period, credits)] of the scheduler and its linked half
+        weights -- 1 or 0 for every position of the hp vector, whether the course counts there
+        """
+        self.course_code = course_code
+        self.scheduler_ids = [str(scheduler_id) for scheduler_id, *_ in rows]
+        self.halves = [(bits, PERIOD_INDEX[semester, period], credits)
+                       for _, bits, semester, period, credits in rows]
+        self.occupancy = 0
+        for bit, _, _ in self.halves:
+            self.occupancy |= bit
+        hp = sum(credits for _, _, credits in self.halves)
+        self.values = tuple(hp * weight for weight in weights)
+
+    def fits(self, occupancy: int, periods: tuple, max_period_hp: float) -> bool:
+        if self.occupancy & occupancy:
+            return False
+        if max_period_hp is None:
+            return True
+        return all(periods[index] + credits <= max_period_hp + 1e-9 for _, index, credits in self.halves)
+
+    def take(self, occupancy: int, periods: tuple, values: tuple) -> tuple:
+        periods = list(periods)
+        for _, index, credits in self.halves:
+            periods[index] += credits
+        return (occupancy | self.occupancy,
+                tuple(periods),
+                tuple(value + added for value, added in zip(values, self.values)))
+
+
+def load_instances(program_id: str, profile_code: str, counted_fields: list[str]) -> tuple[dict, dict]:
+    """
+    Instances of every course of the program in semesters 7-9, from three queries.
+
+    return format -- ({course_code: [instances given in the profile or without profile]},
+                      {scheduler_id: instance})
+    """
+    rows = {}
+    slot_bits = {}
+    for scheduler_id, linked_id, course_code, credits, level, slot, semester, period, block in (
+            Scheduler.objects.filter(program_id=program_id, schedule__semester__in=SEMESTERS)
+                             .values_list("scheduler_id", "linked_id", "course_id", "course__credits",
+                                          "course__level", "schedule_id", "schedule__semester",
+                                          "schedule__period", "schedule__block")):
+        if slot not in slot_bits:
+            slot_bits[slot] = occupancy_bits(Schedule(id=slot, semester=semester, period=period, block=block))
+        rows[scheduler_id] = (linked_id, course_code, level,
+                              (scheduler_id, slot_bits[slot], semester, period, float(credits)))
+
+    profiles = {}
+    for scheduler_id, profile_id in (SchedulersProfiles.objects
+                                     .filter(scheduler__program_id=program_id, profile_id__in=[profile_code, "free"])
+                                     .values_list("scheduler_id", "profile_id")):
+        profiles.setdefault(scheduler_id, set()).add(profile_id)
+
+    fields = {}
+    for course_code, field_name in (MainField.objects
+                                    .filter(course__scheduler__program_id=program_id, field_name__in=counted_fields)
+                                    .values_list("course__course_code", "field_name")
+                                    .distinct()):
+        fields.setdefault(course_code, set()).add(field_name)
+
+    offered = {}
+    by_scheduler = {}
+    for scheduler_id, (linked_id, course_code, level, row) in rows.items():
+        if scheduler_id in by_scheduler:
+            continue
+        halves = [row, rows[linked_id][3]] if linked_id in rows else [row]
+        weights = (1,
+                   int(any(profile_code in profiles.get(half[0], ()) for half in halves)),
+                   int(course_level(level) == "a_level"),
+                   *(int(field in fields.get(course_code, ())) for field in counted_fields))
+        instance = Instance(course_code, halves, weights)
+        for half in halves:
+            by_scheduler[half[0]] = instance
+        if any(half[0] in profiles for half in halves):
+            offered.setdefault(course_code, []).append(instance)
+    return offered, {str(scheduler_id): instance for scheduler_id, instance in by_scheduler.items()}
+
+
+def remaining_bounds(decisions: list[list[Instance]], width: int) -> tuple[list, list]:
+    """
+    What decisions i and onwards can add at most, for every i.
+
+    return format -- ([hp vector of the best instance of every course summed],
+                      [[(slot bit, period index, hp vector of the best half in the slot)]])
+    """
+    best = [(0,) * width]
+    slots = [[]]
+    by_slot = {}
+    for instances in reversed(decisions):
+        best.append(tuple(value + max(instance.values[position] for instance in instances)
+                          for position, value in enumerate(best[-1])))
+        for instance in instances:
+            for bit, index, credits in instance.halves:
+                current = by_slot.get(bit, (index, (0,) * width))[1]
+                by_slot[bit] = (index, tuple(max(value, credits * (weight > 0))
+                                             for value, weight in zip(current, instance.values)))
+        slots.append([(bit, index, values) for bit, (index, values) in by_slot.items()])
+    best.reverse()
+    slots.reverse()
+    return best, slots
+
+
+def slot_bound(slots: list[tuple], occupancy: int, periods: tuple, max_period_hp: float, width: int) -> list:
+    """At most one course per free slot, and no more hp per period than is left of max_period_hp."""
+    per_period = [[0] * width for _ in periods]
+    for bit, index, values in slots:
+        if not bit & occupancy:
+            row = per_period[index]
+            for position, value in enumerate(values):
+                row[position] += value
+
+    bound = [0] * width
+    for index, row in enumerate(per_period):
+        room = None if max_period_hp is None else max_period_hp - periods[index]
+        for position, value in enumerate(row):
+            bound[position] += value if room is None else min(value, room)
+    return bound
+
+
+def suggest_plans(program_id: str, profile_code: str, constraints: PlanConstraints,
+                  top_k: int=3, time_budget: float=1.0) -> dict:
+    """
+    Best plans for the profile that meet the constraints, see the module docstring.
+
+    return format -- {"complete": whether the whole search space was covered,
+                      "nodes": number of search nodes visited,
+                      "plans": [{"profile_hp", "hp", "a_level_hp", "schedulers", "courses"}], best first}
+    """
+    deadline = time.perf_counter() + time_budget
+    counted_fields = sorted(constraints.min_field_hp)
+    minimums = (constraints.min_total_hp, constraints.min_profile_hp, constraints.min_a_level_hp,
+                *(constraints.min_field_hp[field] for field in counted_fields))
+    width = len(minimums)
+    max_period_hp = constraints.max_period_hp
+    offered, by_scheduler = load_instances(program_id, profile_code, counted_fields)
+
+    locked = []
+    for scheduler_id in constraints.lock:
+        if scheduler_id not in by_scheduler:
+            raise PlanError(f"locked scheduler {scheduler_id} is not in the program")
+        if by_scheduler[scheduler_id] not in locked:
+            locked.append(by_scheduler[scheduler_id])
+
+    occupancy = 0
+    periods = (0,) * len(PERIOD_INDEX)
+    values = (0,) * width
+    for instance in locked:
+        if not instance.fits(occupancy, periods, max_period_hp):
+            raise PlanError(f"locked course {instance.course_code} clashes with another locked course "
+                            f"or exceeds the hp per period")
+        occupancy, periods, values = instance.take(occupancy, periods, values)
+
+    locked_codes = {instance.course_code for instance in locked}
+    decisions = [sorted(instances, key=lambda instance: -instance.values[PROFILE_HP])
+                 for course_code, instances in offered.items()
+                 if course_code not in locked_codes and course_code not in constraints.exclude]
+    decisions.sort(key=lambda instances: (-instances[0].values[PROFILE_HP],
+                                          -max(instance.values[HP] for instance in instances)))
+    rest, rest_slots = remaining_bounds(decisions, width)
+
+    best = []
+    found = 0
+    nodes = 0
+    complete = True
+    stack = [(0, occupancy, periods, values, None)]
+    while stack:
+        nodes += 1
+        if nodes % 1024 == 0 and time.perf_counter() > deadline:
+            complete = False
+            break
+
+        i, occupancy, periods, values, chosen = stack.pop()
+        if any(value + reachable < minimum for value, reachable, minimum in zip(values, rest[i], minimums)):
+            continue
+        if i < len(decisions):
+            reach = [min(by_course, by_slot) for by_course, by_slot
+                     in zip(rest[i], slot_bound(rest_slots[i], occupancy, periods, max_period_hp, width))]
+            if any(value + reachable < minimum for value, reachable, minimum in zip(values, reach, minimums)):
+                continue
+        else:
+            reach = rest[i]
+        # every plan below reaches the minimum total, so none can have less hp than that
+        if (len(best) == top_k
+                and (values[PROFILE_HP] + reach[PROFILE_HP], -max(values[HP], minimums[HP])) <= best[0][0]):
+            continue
+
+        if i == len(decisions):
+            found += 1
+            plan = ((values[PROFILE_HP], -values[HP]), found, (values, chosen))
+            if len(best) < top_k:
+                heapq.heappush(best, plan)
+            else:
+                heapq.heappushpop(best, plan)
+            continue
+
+        stack.append((i + 1, occupancy, periods, values, chosen))
+        for instance in reversed(decisions[i]):
+            if instance.fits(occupancy, periods, max_period_hp):
+                stack.append((i + 1, *instance.take(occupancy, periods, values), (instance, chosen)))
+
+    plans = []
+    for _, _, (values, chosen) in sorted(best, reverse=True):
+        instances = list(locked)
+        while chosen is not None:
+            instance, chosen = chosen
+            instances.append(instance)
+        plans.append({"profile_hp": values[PROFILE_HP],
+                      "hp": values[HP],
+                      "a_level_hp": values[A_LEVEL_HP],
+                      "schedulers": [scheduler_id for instance in instances for scheduler_id in instance.scheduler_ids],
+                      "courses": [instance.course_code for instance in instances]})
+    return {"complete": complete, "nodes": nodes, "plans": plans}
@@ -0,0 +1,109 @@
+"""
+Course search index.
+
+planning_course_search holds one document per course: code, name, examinator, main field
+names and examination names. It is created and filled by migration 0010 and refilled by
+rebuild_search_index() after every import, a streaming import indexes the courses of every
+program as it commits it. The search endpoint only reads it.
+    SQLite      FTS5 table, unicode61 tokenizer with remove_diacritics 2 and prefix
+                indexes, ranked with bm25
+    Postgres    weighted tsvector over unaccent() text with a GIN index, and a trigram
+                index on the folded text for misspelt words, ranked with ts_rank plus
+                similarity
+Queries are folded the same way, so "goteborg" finds "Göteborg", and the last word of a
+query matches as a prefix for type-ahead.
+"""
+from django.db import connection, transaction
+import re
+
+SEARCH_TABLE = "planning_course_search"
+# bm25 weights of code, name, examinator, main fields and examinations
+COLUMN_WEIGHTS = (10.0, 5.0, 2.0, 1.0, 1.0)
+# a single letter prefix matches most of the catalogue, type-ahead starts at two
+PREFIX_LENGTH = 2
+
+# one document per course, the aggregate is group_concat on SQLite and string_agg on Postgres
+DOCUMENTS = ("SELECT course_code, course_name, coalesce(examinator, ''), "
+             "       coalesce((SELECT {aggregate}(mainfield_id, ' ') FROM planning_course_main_fields "
+             "                 WHERE course_id = course_code), ''), "
+             "       coalesce((SELECT {aggregate}(name, ' ') FROM planning_examination "
+             "                 WHERE course_id = course_code), '') "
+             "FROM planning_course")
+POSTGRES_DOCUMENT = ("UPDATE planning_course_search SET "
+                     "folded = unaccent(lower(concat_ws(' ', course_code, course_name, examinator, "
+                     "                                  main_fields, examinations))), "
+                     "document = setweight(to_tsvector('simple', unaccent(course_code)), 'A') || "
+                     "           setweight(to_tsvector('simple', unaccent(course_name)), 'B') || "
+                     "           setweight(to_tsvector('simple', unaccent(examinator)), 'C') || "
+                     "           setweight(to_tsvector('simple', unaccent(main_fields || ' ' || examinations)), 'D')")
+
+
+def rebuild_search_index(course_codes: list[str]=None) -> int:
+    """
+    Refill the search index from the catalogue tables, in two statements (three on Postgres).
+    With course_codes only the documents of those courses are replaced, e.g. the courses a
+    streamed program adds, inside the transaction that writes them.
+
+    return format -- number of courses indexed
+    """
+    where, params = "", []
+    if course_codes is not None:
+        course_codes = list(course_codes)
+        if not course_codes:
+            return 0
+        where, params = f" WHERE course_code IN ({', '.join(['%s'] * len(course_codes))})", course_codes
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}{where}", params)
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} (course_code, course_name, examinator, main_fields, examinations) "
+                       + DOCUMENTS.format(aggregate="string_agg" if connection.vendor == "postgresql"
+                                          else "group_concat") + where, params)
+        indexed = cursor.rowcount
+        if connection.vendor == "postgresql":
+            cursor.execute(POSTGRES_DOCUMENT + where, params)
+    return indexed
+
+
+def query_terms(query: str) -> list[str]:
+    return [term for term in re.split(r"\W+", query.lower()) if term]
+
+
+def search_courses(query: str, program_code: str=None, limit: int=20) -> list[str]:
+    """
+    Course codes matching every word of query, best first, the last word as a prefix once it
+    has PREFIX_LENGTH characters. With program_code only courses scheduled in that program.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    prefix = len(terms[-1]) >= PREFIX_LENGTH
+
+    program_filter = ""
+    if program_code is not None:
+        program_filter = "AND course_code IN (SELECT course_id FROM planning_scheduler WHERE program_id = %s)"
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            tsquery = " & ".join(f"{term}:*" if prefix and i == len(terms) - 1 else term
+                                 for i, term in enumerate(terms))
+            params = [tsquery, " ".join(terms)]
+            if program_code is not None:
+                params.append(program_code)
+            cursor.execute(f"SELECT course_code FROM {SEARCH_TABLE}, "
+                           f"     to_tsquery('simple', unaccent(%s)) AS query, unaccent(%s) AS folded_query "
+                           f"WHERE (document @@ query OR folded_query <%% folded) {program_filter} "
+                           f"ORDER BY ts_rank(document, query) + word_similarity(folded_query, folded) DESC, "
+                           f"         course_code "
+                           f"LIMIT %s", params + [limit])
+        else:
+            match = " AND ".join(f'"{term}"*' if prefix and i == len(terms) - 1 else f'"{term}"'
+                                 for i, term in enumerate(terms))
+            params = [match]
+            if program_code is not None:
+                params.append(program_code)
+            weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+            cursor.execute(f"SELECT course_code FROM {SEARCH_TABLE} "
+                           f"WHERE {SEARCH_TABLE} MATCH %s {program_filter} "
+                           f"ORDER BY bm25({SEARCH_TABLE}, {weights}), course_code "
+                           f"LIMIT %s", params + [limit])
+        return [course_code for course_code, in cursor.fetchall()]
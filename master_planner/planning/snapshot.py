@@ -0,0 +1,131 @@
+"""
+Catalogue snapshots, written by ``manage.py dump_catalogue`` and read by ``load_catalogue``.
+
+A snapshot holds the scraped catalogue tables, the scheduler UUIDs included, so a fresh
+environment is populated in seconds and without network access. The file is xz compressed
+JSON, one document with every table stored column by column, which compresses far better
+than rows: {"version": 1, "tables": [{"table", "columns", "rows", "data": [[column values]]}]}.
+Values are the database values, UUIDs and decimals as strings.
+
+Loading inserts with executemany on SQLite and COPY on Postgres, then rebuilds the planner
+rows and the search index the same way an import does.
+"""
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from planning.models import (CatalogueVersion, Course, Examination, MainField, Profile, Program, Schedule, Scheduler,
+                             SchedulersProfiles, rebuild_planner_rows)
+from planning.search import rebuild_search_index
+import io
+import json
+import lzma
+
+SNAPSHOT_VERSION = 1
+# written as strings, every other column is a JSON string, number, boolean or null already
+CONVERTED_TYPES = ("UUIDField", "DecimalField")
+# parents before children, the many to many tables right after their owner
+SNAPSHOT_MODELS = (MainField, Profile, Program, Program.profiles.through, Course, Course.main_fields.through,
+                   Examination, Schedule, Scheduler, SchedulersProfiles)
+
+
+def snapshot_columns(model) -> list[str]:
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def dump_catalogue(path: str) -> dict[str, int]:
+    """
+    Write the catalogue to path.
+
+    return format -- {table: rows written}
+    """
+    tables = []
+    with transaction.atomic():
+        for model in SNAPSHOT_MODELS:
+            columns = snapshot_columns(model)
+            rows = list(model.objects.order_by("pk").values_list(*columns))
+            tables.append({"table": model._meta.db_table,
+                           "columns": columns,
+                           "rows": len(rows),
+                           "data": [list(values) for values in zip(*rows)] if rows else [[] for _ in columns]})
+
+    document = json.dumps({"version": SNAPSHOT_VERSION, "tables": tables}, default=str, separators=(",", ":"))
+    # preset 6 makes the file about 15% smaller and takes five times as long
+    with lzma.open(path, "wb", preset=1) as snapshot:
+        snapshot.write(document.encode())
+    return {table["table"]: table["rows"] for table in tables}
+
+
+def read_snapshot(path: str) -> dict:
+    with lzma.open(path, "rb") as snapshot:
+        document = json.loads(snapshot.read())
+    if document.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} is a version {document.get('version')} snapshot, expected {SNAPSHOT_VERSION}")
+    return document
+
+
+def copy_value(value) -> str:
+    """value in the text format of Postgres COPY"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def column_converter(field, db):
+    """Database value of a snapshot value of field, None where the JSON value can be stored as it is."""
+    target = field.target_field if field.is_relation else field
+    if target.get_internal_type() not in CONVERTED_TYPES:
+        return None
+    return lambda value: field.get_db_prep_save(field.to_python(value), db)
+
+
+def insert_rows(cursor, model, columns: list[str], rows: list[tuple]) -> None:
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ", ".join(connection.ops.quote_name(model._meta.get_field(column).column) for column in columns)
+    if connection.vendor == "postgresql":
+        buffer = io.StringIO("".join("\t".join(copy_value(value) for value in row) + "\n" for row in rows))
+        cursor.copy_expert(f"COPY {table} ({names}) FROM STDIN", buffer)
+    else:
+        placeholders = ", ".join(["%s"] * len(columns))
+        cursor.executemany(f"INSERT INTO {table} ({names}) VALUES ({placeholders})", rows)
+
+
+def load_catalogue(path: str) -> dict[str, int]:
+    """
+    Load the snapshot at path into an empty catalogue, in one transaction.
+
+    return format -- {table: rows loaded}
+    """
+    document = read_snapshot(path)
+    tables = {table["table"]: table for table in document["tables"]}
+    if Program.objects.exists() or Course.objects.exists():
+        raise ValueError("the catalogue is not empty, load snapshots into a fresh database")
+
+    loaded = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in SNAPSHOT_MODELS:
+            table = tables.get(model._meta.db_table)
+            if table is None:
+                raise ValueError(f"{path} has no table {model._meta.db_table}")
+            if set(table["columns"]) != set(snapshot_columns(model)):
+                raise ValueError(f"columns of {model._meta.db_table} in {path} do not match the database, "
+                                 f"dump the catalogue again after migrating")
+
+            columns = [column if converter is None else [converter(value) for value in column]
+                       for column, converter in zip(table["data"],
+                                                    (column_converter(model._meta.get_field(name), cursor.db)
+                                                     for name in table["columns"]))]
+            rows = list(zip(*columns))
+            if rows:
+                insert_rows(cursor, model, table["columns"], rows)
+            loaded[model._meta.db_table] = len(rows)
+
+        # rows were inserted with their ids, move the id sequences past them (Postgres)
+        for sql in connection.ops.sequence_reset_sql(no_style(), SNAPSHOT_MODELS):
+            cursor.execute(sql)
+
+        rebuild_planner_rows()
+        rebuild_search_index()
+    CatalogueVersion.bump()
+    return loaded
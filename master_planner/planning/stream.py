@@ -0,0 +1,87 @@
+"""
+Streaming catalogue import.
+
+populate_db --stream writes every program as soon as it is parsed instead of gathering the
+whole catalogue first. A program's profiles, courses, schedulers, scheduler profiles, course
+details, planner rows and the search documents of its new courses are committed in one
+transaction together with its ImportCheckpoint, so memory stays at about one program, the
+API serves and searches programs as they land and --resume skips the programs a crashed
+import already committed.
+
+Courses, profiles and schedules are shared between programs, a CatalogueRegistry keeps the
+ones already stored so every program only writes what is new.
+
+Like the full import it fills programs without schedulers, populated programs are updated
+with --incremental.
+"""
+from django.db import transaction
+from planning.models import (CatalogueVersion, Course, ImportCheckpoint, Profile, Program, Schedule,
+                             rebuild_planner_rows, register_course_details, register_courses, resolve_schedules)
+from planning.search import rebuild_search_index
+from typing import Any, Iterable
+
+
+class CatalogueRegistry:
+    """
+    Course codes, profile codes and schedules that are stored, shared by all programs of an import.
+    Only add() what was committed, a rolled back program must not hide rows from the next one.
+    """
+    def __init__(self):
+        self.courses = set(Course.objects.values_list("course_code", flat=True))
+        self.profiles = set(Profile.objects.values_list("profile_code", flat=True))
+        self.schedules = {}
+
+    def new_courses(self, course_data: list[dict[str, Any]]) -> list[str]:
+        return list(dict.fromkeys(course["course_code"] for course in course_data
+                                  if course["course_code"] not in self.courses))
+
+    def resolve_schedules(self, course_data: list[dict[str, Any]]) -> dict[tuple[int, int, str], Schedule]:
+        """Schedules of course_data, only the slots this import has not seen yet are resolved and created."""
+        keys = {(int(course["semester"]), int(course["period"]), str(course["block"])) for course in course_data}
+        schedules = {key: self.schedules[key] for key in keys if key in self.schedules}
+        if len(schedules) < len(keys):
+            schedules.update(resolve_schedules(keys - schedules.keys()))
+        return schedules
+
+    def add(self, courses: Iterable[str]=(), profiles: Iterable[str]=(),
+            schedules: dict[tuple[int, int, str], Schedule]=None) -> None:
+        self.courses.update(courses)
+        self.profiles.update(profiles)
+        self.schedules.update(schedules or {})
+
+
+def import_program(program_code: str, program_name: str,
+                   course_data: list[dict[str, Any]],
+                   profile_data: list[tuple[str, str, str]],
+                   course_details: list[dict[str, Any]],
+                   registry: CatalogueRegistry) -> ImportCheckpoint:
+    """
+    Write one scraped program and its checkpoint in one transaction.
+
+    arguments:
+    course_data, profile_data -- ProgramPlan.courses() and ProgramPlan.profiles() of the program
+    course_details -- scraped course pages of the courses the registry does not know yet
+
+    return format -- the checkpoint that was committed
+    """
+    with transaction.atomic():
+        Program.objects.bulk_create([Program(program_code=program_code, program_name=program_name)],
+                                    ignore_conflicts=True)
+        profiles = {code: Profile(profile_code=code, profile_name=name)
+                    for name, code, _ in profile_data if code not in registry.profiles}
+        Profile.objects.bulk_create(profiles.values(), ignore_conflicts=True)
+        through = Program.profiles.through
+        through.objects.bulk_create([through(program_id=program_code, profile_id=code) for _, code, _ in profile_data],
+                                    ignore_conflicts=True)
+
+        schedules = registry.resolve_schedules(course_data)
+        courses, schedulers = register_courses(course_data, registry.courses, schedules)
+        register_course_details(course_details)
+        rebuild_planner_rows([program_code])
+        rebuild_search_index(courses)
+        checkpoint = ImportCheckpoint.objects.create(program_code=program_code, schedulers=schedulers,
+                                                     courses=len(courses))
+    registry.add(courses, profiles, schedules)
+    # cached catalogue responses of the program were empty until now
+    CatalogueVersion.bump()
+    return checkpoint
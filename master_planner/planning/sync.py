@@ -0,0 +1,295 @@
+"""
+Incremental catalogue import.
+
+Instead of bulk inserting everything into an empty database, the scraped catalogue is
+diffed against the current tables on natural keys:
+    Program             program_code
+    Profile             profile_code
+    Course              course_code
+    Schedule            (semester, period, block)
+    Scheduler           (program, course, semester, period, block)
+    SchedulersProfiles  (scheduler, profile)
+    Examination         (course, code)
+and only the inserts, updates and deletes are written. Existing scheduler_ids are kept,
+so the choices of every account survive a reimport.
+
+Programs and profiles are never deleted since accounts reference them, schedulers are
+only deleted for the programs that were scraped.
+"""
+from django.db import transaction
+from planning.models import (Course, Examination, MainField, Profile, Program, Scheduler,
+                             SchedulersProfiles, link_split_courses, occupancy_bits, parse_hp,
+                             report_unmatched, resolve_schedules, set_occupancy)
+from typing import Any, Iterable
+
+
+class ChangeSummary:
+    """Number of created, updated and deleted rows per table."""
+    def __init__(self):
+        self.changes = {}
+
+    def count(self, table: str, created: int=0, updated: int=0, deleted: int=0) -> None:
+        counts = self.changes.setdefault(table, {"created": 0, "updated": 0, "deleted": 0})
+        counts["created"] += created
+        counts["updated"] += updated
+        counts["deleted"] += deleted
+
+    def get(self, table: str) -> dict[str, int]:
+        return self.changes.get(table, {"created": 0, "updated": 0, "deleted": 0})
+
+    @property
+    def writes(self) -> int:
+        return sum(sum(counts.values()) for counts in self.changes.values())
+
+    def changed(self, *tables: str) -> bool:
+        return any(sum(self.get(table).values()) for table in tables)
+
+    def summary(self) -> str:
+        lines = [f"{table}: {counts['created']} created, {counts['updated']} updated, {counts['deleted']} deleted"
+                 for table, counts in self.changes.items() if sum(counts.values())]
+        return "\n".join(lines) if lines else "catalogue unchanged"
+
+
+def _changed_fields(instance, values: dict[str, Any]) -> bool:
+    changed = False
+    for field, value in values.items():
+        if getattr(instance, field) != value:
+            setattr(instance, field, value)
+            changed = True
+    return changed
+
+def _scheduler_key(course_data: dict[str, Any]) -> tuple:
+    # the scraper yields period as a string, the database as an int
+    return (course_data["program_code"], course_data["course_code"],
+            int(course_data["semester"]), int(course_data["period"]), str(course_data["block"]))
+
+def sync_programs(program_data: list[tuple[str, str]], summary: ChangeSummary) -> None:
+    existing = Program.objects.in_bulk()
+    created, updated = [], []
+    for code, name in program_data:
+        program = existing.get(code)
+        if program is None:
+            created.append(Program(program_code=code, program_name=name))
+        elif _changed_fields(program, {"program_name": name}):
+            updated.append(program)
+
+    Program.objects.bulk_create(created)
+    Program.objects.bulk_update(updated, ["program_name"])
+    summary.count("program", created=len(created), updated=len(updated))
+
+def sync_profiles(profile_data: list[tuple[str, str, str]], program_codes: set[str], summary: ChangeSummary) -> None:
+    existing = Profile.objects.in_bulk()
+    profiles = {}
+    links = set()
+    for name, code, program_code in profile_data:
+        profiles.setdefault(code, name)
+        links.add((program_code, code))
+
+    created, updated = [], []
+    for code, name in profiles.items():
+        profile = existing.get(code)
+        if profile is None:
+            created.append(Profile(profile_code=code, profile_name=name))
+        elif _changed_fields(profile, {"profile_name": name}):
+            updated.append(profile)
+    Profile.objects.bulk_create(created)
+    Profile.objects.bulk_update(updated, ["profile_name"])
+    summary.count("profile", created=len(created), updated=len(updated))
+
+    through = Program.profiles.through
+    current = {}
+    for pk, program_code, profile_code in (through.objects
+                                           .filter(program_id__in=program_codes)
+                                           .values_list("id", "program_id", "profile_id")):
+        current.setdefault((program_code, profile_code), []).append(pk)
+
+    stale = [pk for key, pks in current.items() for pk in (pks if key not in links else pks[1:])]
+    through.objects.filter(id__in=stale).delete()
+    through.objects.bulk_create([through(program_id=program_code, profile_id=profile_code)
+                                 for program_code, profile_code in links - current.keys()])
+    summary.count("program profile", created=len(links - current.keys()), deleted=len(stale))
+
+def sync_courses(data: list[dict[str, Any]], program_codes: set[str], summary: ChangeSummary) -> None:
+    # first scraped row of a course wins, same as register_courses
+    scraped = {}
+    for course_data in data:
+        if course_data["course_code"] not in scraped:
+            credits, is_split = parse_hp(course_data["hp"])
+            scraped[course_data["course_code"]] = {"course_name": course_data["course_name"],
+                                                   "hp": course_data["hp"],
+                                                   "credits": credits,
+                                                   "is_split": is_split,
+                                                   "level": course_data["level"]}
+
+    existing = Course.objects.in_bulk(list(scraped))
+    created, updated = [], []
+    for code, values in scraped.items():
+        course = existing.get(code)
+        if course is None:
+            created.append(Course(course_code=code, **values))
+        elif _changed_fields(course, values):
+            updated.append(course)
+    Course.objects.bulk_create(created)
+    Course.objects.bulk_update(updated, ["course_name", "hp", "credits", "is_split", "level"])
+    summary.count("course", created=len(created), updated=len(updated))
+
+    # schedules are a fixed dimension shared by every program, missing slots are added
+    schedules = resolve_schedules(_scheduler_key(course_data)[2:] for course_data in data)
+
+    # schedulers keep their id as long as (program, course, semester, period, block) is scraped again
+    current = {}
+    duplicates = []
+    for scheduler in (Scheduler.objects
+                      .filter(program_id__in=program_codes)
+                      .select_related("schedule")
+                      .order_by("scheduler_id")):
+        key = (scheduler.program_id, scheduler.course_id,
+               scheduler.schedule.semester, scheduler.schedule.period, scheduler.schedule.block)
+        if key in current:
+            duplicates.append(scheduler.scheduler_id)
+        else:
+            current[key] = scheduler
+
+    schedulers = {}
+    new_schedulers = []
+    rows = {}
+    for course_data in data:
+        key = _scheduler_key(course_data)
+        if key not in schedulers:
+            scheduler = current.get(key)
+            if scheduler is None:
+                scheduler = Scheduler(program_id=key[0], course_id=key[1], schedule=schedules[key[2:]],
+                                      occupancy=occupancy_bits(schedules[key[2:]]))
+                new_schedulers.append(scheduler)
+            schedulers[key] = scheduler
+        rows.setdefault((schedulers[key].scheduler_id, course_data["profile_code"]), course_data["vof"])
+
+    stale = duplicates + [scheduler.scheduler_id for key, scheduler in current.items() if key not in schedulers]
+    # linked cascades, so a kept half must be unlinked before its stale partner is deleted
+    Scheduler.objects.filter(linked_id__in=stale).update(linked=None)
+    for scheduler in current.values():
+        if scheduler.linked_id in stale:
+            scheduler.linked_id = None
+    Scheduler.objects.filter(scheduler_id__in=stale).delete()
+    Scheduler.objects.bulk_create(new_schedulers)
+    summary.count("scheduler", created=len(new_schedulers), deleted=len(stale))
+
+    sync_scheduler_profiles(rows, [scheduler.scheduler_id for scheduler in current.values()], summary)
+    link_schedulers(schedulers, summary)
+
+    # courses that were not scraped and are no longer scheduled anywhere
+    orphans = Course.objects.exclude(course_code__in=scraped).filter(scheduler=None)
+    summary.count("course", deleted=orphans.delete()[1].get(Course._meta.label, 0))
+
+def sync_scheduler_profiles(rows: dict[tuple, str], scheduler_ids: Iterable, summary: ChangeSummary) -> None:
+    """
+    arguments:
+    rows: dict -- {(scheduler_id, profile_code): vof} of the scraped catalogue
+    scheduler_ids: list -- schedulers that existed before the import, their rows are diffed
+    """
+    current = {}
+    stale = []
+    for scheduler_profile in (SchedulersProfiles.objects
+                              .filter(scheduler_id__in=list(scheduler_ids))
+                              .order_by("id")):
+        key = (scheduler_profile.scheduler_id, scheduler_profile.profile_id)
+        if key in current or key not in rows:
+            stale.append(scheduler_profile.id)
+        else:
+            current[key] = scheduler_profile
+
+    created, updated = [], []
+    for (scheduler_id, profile_code), vof in rows.items():
+        scheduler_profile = current.get((scheduler_id, profile_code))
+        if scheduler_profile is None:
+            created.append(SchedulersProfiles(scheduler_id=scheduler_id, profile_id=profile_code, vof=vof))
+        elif _changed_fields(scheduler_profile, {"vof": vof}):
+            updated.append(scheduler_profile)
+
+    SchedulersProfiles.objects.filter(id__in=stale).delete()
+    SchedulersProfiles.objects.bulk_create(created)
+    SchedulersProfiles.objects.bulk_update(updated, ["vof"])
+    summary.count("scheduler profile", created=len(created), updated=len(updated), deleted=len(stale))
+
+def link_schedulers(schedulers: dict[tuple, Scheduler], summary: ChangeSummary) -> None:
+    """Link the halves of split courses and set their occupancy, only writing the schedulers that changed."""
+    split = set(Course.objects.filter(is_split=True).values_list("course_code", flat=True))
+    linked, unmatched = link_split_courses(schedulers, split)
+    report_unmatched(unmatched)
+    updated = {scheduler.scheduler_id: scheduler for scheduler in linked + set_occupancy(schedulers.values())}
+    Scheduler.objects.bulk_update(updated.values(), ["linked", "occupancy"])
+    summary.count("scheduler", updated=len(updated))
+
+def sync_course_details(data: list[dict[str, Any]], summary: ChangeSummary) -> None:
+    """Diff examinator, campus, main fields and examinations of the scraped course pages."""
+    courses = Course.objects.in_bulk([course_data["course_code"] for course_data in data])
+    data = [course_data for course_data in data if course_data["course_code"] in courses]
+
+    updated = [courses[course_data["course_code"]] for course_data in data
+               if _changed_fields(courses[course_data["course_code"]], {"examinator": course_data["examinator"],
+                                                                         "campus": course_data["location"]})]
+    Course.objects.bulk_update(updated, ["examinator", "campus"])
+    summary.count("course", updated=len(updated))
+
+    through = Course.main_fields.through
+    fields = {(course_data["course_code"], field) for course_data in data for field in course_data["main_field"]}
+    current = {}
+    for pk, course_code, field in (through.objects
+                                   .filter(course_id__in=courses)
+                                   .values_list("id", "course_id", "mainfield_id")):
+        current[course_code, field] = pk
+    MainField.objects.bulk_create([MainField(field_name=field) for _, field in fields - current.keys()],
+                                  ignore_conflicts=True)
+    through.objects.bulk_create([through(course_id=course_code, mainfield_id=field)
+                                 for course_code, field in fields - current.keys()])
+    through.objects.filter(id__in=[pk for key, pk in current.items() if key not in fields]).delete()
+    summary.count("course main field", created=len(fields - current.keys()), deleted=len(current.keys() - fields))
+
+    scraped = {}
+    for course_data in data:
+        for examination in course_data["examination"]:
+            scraped.setdefault((course_data["course_code"], examination["examination_code"]),
+                               {"hp": examination["hp"], "name": examination["name"], "grading": examination["grading"]})
+    current = {}
+    stale = []
+    for examination in Examination.objects.filter(course_id__in=courses).order_by("id"):
+        key = (examination.course_id, examination.code)
+        if key in current or key not in scraped:
+            stale.append(examination.id)
+        else:
+            current[key] = examination
+
+    created, updated = [], []
+    for (course_code, code), values in scraped.items():
+        examination = current.get((course_code, code))
+        if examination is None:
+            created.append(Examination(course_id=course_code, code=code, **values))
+        elif _changed_fields(examination, values):
+            updated.append(examination)
+    Examination.objects.filter(id__in=stale).delete()
+    Examination.objects.bulk_create(created)
+    Examination.objects.bulk_update(updated, ["hp", "name", "grading"])
+    summary.count("examination", created=len(created), updated=len(updated), deleted=len(stale))
+
+def sync_catalogue(program_data: list[tuple[str, str]],
+                   profile_data: list[tuple[str, str, str]],
+                   course_data: list[dict[str, Any]],
+                   course_details: list[dict[str, Any]]=None) -> ChangeSummary:
+    """
+    Bring the catalogue tables in line with a scrape, writing only what changed.
+
+    arguments:
+    program_data, profile_data, course_data -- same formats as register_programs/register_profiles/register_courses
+    course_details: list -- scraped course pages, same format as register_course_details
+
+    return format -- ChangeSummary of the rows written per table
+    """
+    summary = ChangeSummary()
+    program_codes = {code for code, _ in program_data}
+    with transaction.atomic():
+        sync_programs(program_data, summary)
+        sync_profiles(profile_data, program_codes, summary)
+        sync_courses(course_data, program_codes, summary)
+        if course_details is not None:
+            sync_course_details(course_details, summary)
+    return summary
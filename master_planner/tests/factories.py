@@ -0,0 +1,27 @@
+from pathlib import Path
+
+# saved studieinfo pages, served by StandIn
+FIXTURES = Path(__file__).parent / "fixtures" / "studieinfo"
+
+
+def course_row(code, semester, period, block, profile_code="AAAA", hp="6", level="A1X"):
+    return {"course_code": code,
+            "course_name": f"course {code}",
+            "hp": hp,
+            "program_code": "6CMJU",
+            "level": level,
+            "block": block,
+            "vof": "v",
+            "profile_code": profile_code,
+            "period": period,
+            "semester": semester
+            }
+
+
+def course_page(code, examinator="Anna Ek", exams=("LAB1", "TEN1")):
+    return {"course_code": code,
+            "examinator": examinator,
+            "location": "Valla",
+            "main_field": ["Datateknik"],
+            "examination": [{"examination_code": exam, "hp": "3", "name": exam.lower(), "grading": "U, G"}
+                            for exam in exams]}
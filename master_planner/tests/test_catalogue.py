@@ -0,0 +1,140 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from planning.models import (Program, Profile, CatalogueVersion, Course, MainField, PlannerRow, Scheduler,
+                             register_courses, rebuild_planner_rows)
+from master_planner.catalogue import ROW_FIELDS
+from accounts.models import Account
+from tests.factories import course_row
+
+
+class TestCatalogueCache(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        program = Program.objects.create(program_name="mjukvaruteknik", program_code="6CMJU")
+        program.profiles.add(Profile.objects.create(profile_name="profile_1", profile_code="AAAA"))
+        register_courses([course_row("AAAA", 7, 1, "1"),
+                          course_row("BBBB", 8, 2, "2")])
+        rebuild_planner_rows()
+        Account.objects.create_user(username="test_user", password="123", program=program)
+
+    def setUp(self):
+        caches["catalogue"].clear()
+        self.client.login(username="test_user", password="123")
+
+    def test_payload(self):
+        response = self.client.get("/api/courses/AAAA")
+        self.assertEqual(response.status_code, 200)
+        semesters = response.json()["semesters"]
+        self.assertEqual(semesters["7"]["period_1"][0]["course"]["course_code"], "AAAA")
+        self.assertEqual(semesters["8"]["period_2"][0]["schedule"], {"block": "2", "semester": 8, "period": 2})
+
+        response = self.client.get("/api/courses/AAAA/7")
+        self.assertEqual(len(response.json()["period_1"]), 1)
+
+    def test_reads_planner_rows(self):
+        self.assertEqual(PlannerRow.objects.count(), 2)
+        CatalogueVersion.current()
+        with self.assertNumQueries(4):
+            # session, user, catalogue version and one planner row scan
+            response = self.client.get("/api/courses/AAAA")
+        self.assertEqual(response.json()["semesters"]["8"]["period_2"][0]["course"]["course_name"], "course BBBB")
+
+        register_courses([course_row("CCCC", 9, 1, "3", hp="6*"), course_row("CCCC", 9, 2, "3", hp="6*")])
+        self.assertEqual(rebuild_planner_rows(["6CMJU"]), 4)
+        row = PlannerRow.objects.get(course_code="CCCC", period=2)
+        self.assertEqual((row.linked_id, row.credits), (PlannerRow.objects.get(course_code="CCCC", period=1).scheduler_id, 3))
+
+    def test_fast_serialisation_keeps_the_wire_format(self):
+        account = Account.objects.get(username="test_user")
+        account.add_choices(list(Scheduler.objects.select_related("course", "schedule")))
+        urls = ["/api/courses/AAAA", "/api/courses/AAAA/8", "/api/account/choices/AAAA"]
+
+        validated = [self.client.get(url).content for url in urls]
+        caches["catalogue"].clear()
+        with override_settings(FAST_SERIALISATION=True):
+            fast = [self.client.get(url).content for url in urls]
+
+        self.assertEqual(fast, validated)
+        self.assertIn(b'"period": 2', fast[1])
+
+    def test_fits_filter(self):
+        register_courses([course_row("CLSH", 7, 1, "1"), course_row("FREE", 7, 2, "1")])
+        rebuild_planner_rows()
+        account = Account.objects.get(username="test_user")
+        account.add_choices(list(Scheduler.objects.filter(course="AAAA").select_related("course", "schedule")))
+
+        self.client.get("/api/courses/AAAA?fits=true")
+        with self.assertNumQueries(4):
+            # session, user, catalogue version and the occupancy of the choices
+            response = self.client.get("/api/courses/AAAA?fits=true")
+        semester = response.json()["semesters"]["7"]
+        self.assertEqual([row["course"]["course_code"] for row in semester["period_1"]], ["AAAA"])
+        self.assertEqual([row["course"]["course_code"] for row in semester["period_2"]], ["FREE"])
+
+        account.remove_choices(list(Scheduler.objects.filter(course="AAAA").select_related("course", "schedule")))
+        response = self.client.get("/api/courses/AAAA/7?fits=true")
+        self.assertEqual(len(response.json()["period_1"]), 2)
+
+    def test_query_catalogue(self):
+        register_courses([course_row("CLSH", 7, 1, "1"), course_row("FREE", 7, 2, "1", level="G1X")])
+        Course.objects.get(course_code="FREE").main_fields.add(MainField.objects.create(field_name="Datateknik"))
+        rebuild_planner_rows()
+        account = Account.objects.get(username="test_user")
+        account.add_choices(list(Scheduler.objects.filter(course="AAAA").select_related("course", "schedule")))
+
+        def query(**params):
+            response = self.client.get(reverse("api-1.0.0:query_catalogue", kwargs={"profile": "AAAA"}), params)
+            return response.json()
+
+        page = query(limit=2, fields="course_code")
+        self.assertEqual(page["courses"], [{"scheduler_id": str(Scheduler.objects.get(course="AAAA").scheduler_id),
+                                            "course_code": "AAAA"},
+                                           {"scheduler_id": str(Scheduler.objects.get(course="CLSH").scheduler_id),
+                                            "course_code": "CLSH"}])
+        # the cursor is a key of the row, not its id, it stays valid when an import rebuilds the rows
+        rebuild_planner_rows()
+        page = query(limit=2, fields="course_code", after=page["next"])
+        self.assertEqual([row["course_code"] for row in page["courses"]], ["FREE", "BBBB"])
+        self.assertIsNone(page["next"])
+        self.assertEqual(query(after="7.1.AAAA")["message"], "invalid cursor 7.1.AAAA")
+
+        def codes(**params):
+            return [row["course_code"] for row in query(fields="course_code", **params)["courses"]]
+        self.assertEqual(codes(semester=7, period=1), ["AAAA", "CLSH"])
+        self.assertEqual(codes(level="G"), ["FREE"])
+        self.assertEqual(codes(main_field="Datateknik"), ["FREE"])
+        # the choices fit, only not_chosen leaves them out
+        self.assertEqual(codes(fits=True), ["AAAA", "FREE", "BBBB"])
+        self.assertEqual(codes(fits=True, not_chosen=True), ["FREE", "BBBB"])
+        self.assertEqual(codes(not_chosen=True, block="1"), ["CLSH", "FREE"])
+
+        with self.assertNumQueries(4):
+            # session, user, the occupancy of the choices and the page
+            query(fits=True, not_chosen=True, semester=7)
+        self.assertEqual(query(fields="course_code,price")["message"],
+                         "unknown fields price, choose from " + ", ".join(ROW_FIELDS))
+
+    def test_served_from_cache(self):
+        self.client.get("/api/courses/AAAA")
+        with self.assertNumQueries(3):
+            # session, user and catalogue version
+            response = self.client.get("/api/courses/AAAA")
+        self.assertEqual(response.status_code, 200)
+
+    def test_revalidation(self):
+        response = self.client.get("/api/courses/AAAA")
+        etag = response["ETag"]
+
+        response = self.client.get("/api/courses/AAAA", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        CatalogueVersion.bump()
+        response = self.client.get("/api/courses/AAAA", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_not_logged_in(self):
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/courses/AAAA").status_code, 401)
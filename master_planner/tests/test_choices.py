@@ -0,0 +1,59 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from planning.models import Scheduler, Program, Profile, register_courses
+from accounts.models import Account
+from tests.factories import course_row
+
+
+class TestChoices(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        program = Program.objects.create(program_name="mjukvaruteknik", program_code="6CMJU")
+        program.profiles.add(Profile.objects.create(profile_name="profile_1", profile_code="AAAA"),
+                             Profile.objects.create(profile_name="Ingen inriktning", profile_code="free"))
+
+        data = [course_row(f"C{i:03}", 7 + i % 3, 1 + i % 2, str(1 + i % 4)) for i in range(12)]
+        data += [course_row(f"C{i:03}", 7 + i % 3, 1 + i % 2, str(1 + i % 4), profile_code="free") for i in range(6, 18)]
+        register_courses(data)
+        cls.account = Account.objects.create_user(username="test_user", password="123", program=program)
+
+    def setUp(self):
+        self.client.login(username="test_user", password="123")
+
+    def get(self, profile_code):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f"/api/account/choices/{profile_code}")
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()
+
+    def courses(self, choices):
+        return [course["course"]["course_code"]
+                for semester in range(7, 10)
+                for period in (1, 2)
+                for course in choices[f"semester_{semester}"]["periods"][f"period_{period}"]["courses"]]
+
+    def test_query_count_is_constant(self):
+        schedulers = list(Scheduler.objects.order_by("course_id"))
+        self.account.choices.add(schedulers[0])
+        self.get("AAAA")
+        few, _ = self.get("AAAA")
+
+        self.account.add_choices(schedulers[1:])
+        many, choices = self.get("AAAA")
+
+        self.assertEqual(few, many)
+        self.assertEqual(len(self.courses(choices)), 18)
+
+    def test_profile_row_preferred(self):
+        self.account.add_choices(list(Scheduler.objects.filter(course__in=["C003", "C006", "C015"])))
+
+        _, choices = self.get("AAAA")
+        period = choices["semester_7"]["periods"]["period_1"]
+        self.assertEqual(sorted(course["course"]["course_code"] for course in period["courses"]), ["C006"])
+        self.assertEqual(period["hp"]["total"], 6)
+        self.assertEqual(choices["hp"]["total"], 18)
+        self.assertEqual(sorted(self.courses(choices)), ["C003", "C006", "C015"])
+
+        _, choices = self.get("free")
+        self.assertEqual(sorted(self.courses(choices)), ["C006", "C015"])
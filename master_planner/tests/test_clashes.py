@@ -0,0 +1,117 @@
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from planning.models import Scheduler, Program, Profile, register_courses
+from accounts.models import Account, ChoiceSlot
+from tests.factories import course_row
+from io import StringIO
+
+
+class TestConflictIndex(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        program = Program.objects.create(program_name="mjukvaruteknik", program_code="6CMJU")
+        program.profiles.add(Profile.objects.create(profile_name="profile_1", profile_code="AAAA"))
+        register_courses([course_row("AAAA", 7, 1, "1"),
+                          course_row("BBBB", 7, 1, "1"),
+                          course_row("CCCC", 7, 1, "2"),
+                          course_row("SPLIT", 7, 1, "2", hp="6*"),
+                          course_row("SPLIT", 7, 2, "3", hp="6*"),
+                          course_row("DDDD", 7, 2, "3"),
+                          course_row("WIDE", 7, 1, "1+3")])
+        cls.account = Account.objects.create_user(username="test_user", password="123", program=program)
+        cls.schedulers = {(scheduler.course_id, scheduler.schedule.period): scheduler
+                          for scheduler in Scheduler.objects.select_related("course", "schedule", "linked")}
+
+    def setUp(self):
+        self.client.login(username="test_user", password="123")
+
+    def choose(self, *keys):
+        self.account.add_choices([self.schedulers[key] for key in keys])
+
+    def test_clashes(self):
+        self.choose(("AAAA", 1), ("BBBB", 1), ("CCCC", 1))
+        self.assertEqual(self.client.get(reverse("api-1.0.0:clashes")).json(),
+                         {"clashes": [{"semester": 7, "period": 1, "block": "1",
+                                       "schedulers": [str(self.schedulers["AAAA", 1].scheduler_id),
+                                                      str(self.schedulers["BBBB", 1].scheduler_id)]}]})
+
+        self.account.remove_choices([self.schedulers["BBBB", 1]])
+        self.assertEqual(self.client.get(reverse("api-1.0.0:clashes")).json(), {"clashes": []})
+        self.assertEqual(ChoiceSlot.objects.filter(account=self.account).count(), 2)
+
+    def would_clash(self, key):
+        scheduler_id = self.schedulers[key].scheduler_id
+        return self.client.get(reverse("api-1.0.0:would_clash", kwargs={"scheduler_id": scheduler_id})).json()
+
+    def test_would_clash(self):
+        self.choose(("CCCC", 1))
+        self.assertFalse(self.would_clash(("AAAA", 1))["clash"])
+        self.assertFalse(self.would_clash(("CCCC", 1))["clash"])
+
+        # the linked half in period 2 is free, the one in period 1 is taken by CCCC
+        response = self.would_clash(("SPLIT", 2))
+        self.assertTrue(response["clash"])
+        self.assertEqual(response["clashes"][0]["schedulers"], [str(self.schedulers["CCCC", 1].scheduler_id)])
+
+        self.choose(("DDDD", 2))
+        with self.assertNumQueries(4):
+            # session, user, scheduler and the conflict index
+            response = self.would_clash(("SPLIT", 1))
+        self.assertEqual([clash["block"] for clash in response["clashes"]], ["2", "3"])
+
+    def test_clashes_on_occupancy_bits(self):
+        # "1+3" takes the bits of block 1 and block 3
+        self.choose(("AAAA", 1), ("WIDE", 1))
+        self.assertEqual(self.account.clashes(),
+                         {(7, 1, "1"): [self.schedulers["AAAA", 1].scheduler_id, self.schedulers["WIDE", 1].scheduler_id]})
+        self.assertEqual(self.account.clashes_with(self.schedulers["BBBB", 1]),
+                         {(7, 1, "1"): [self.schedulers["AAAA", 1].scheduler_id, self.schedulers["WIDE", 1].scheduler_id]})
+
+        self.account.remove_choices([self.schedulers["AAAA", 1]])
+        response = self.would_clash(("AAAA", 1))
+        self.assertTrue(response["clash"])
+        self.assertEqual(response["clashes"], [{"semester": 7, "period": 1, "block": "1",
+                                                "schedulers": [str(self.schedulers["WIDE", 1].scheduler_id)]}])
+        self.assertFalse(self.would_clash(("CCCC", 1))["clash"])
+
+    def test_clashes_reads_plain_rows(self):
+        register_courses([course_row(f"M{index:03}", 8 + index % 2, 1 + index // 2 % 2, str(1 + index // 4 % 4))
+                          for index in range(32)])
+        self.choose(("AAAA", 1), ("WIDE", 1))
+        expected = {(7, 1, "1"): [self.schedulers["AAAA", 1].scheduler_id, self.schedulers["WIDE", 1].scheduler_id]}
+        with self.assertNumQueries(1):
+            self.assertEqual(self.account.clashes(), expected)
+
+        # one query of the conflict index rows, however many choices there are
+        self.account.add_choices(list(Scheduler.objects.filter(course__course_code__startswith="M", schedule__block="1")))
+        with self.assertNumQueries(1):
+            clashes = self.account.clashes()
+        self.assertEqual(clashes[7, 1, "1"], expected[7, 1, "1"])
+        self.assertEqual({slot for slot in clashes if slot[0] != 7}, {(8, 1, "1"), (8, 2, "1"), (9, 1, "1"), (9, 2, "1")})
+
+    def test_clash_lookup_reads_clashing_rows(self):
+        register_courses([course_row(f"M{index:03}", 8 + index % 2, 1 + index // 2 % 2, str(1 + index // 4 % 4))
+                          for index in range(32)])
+        others = list(Scheduler.objects.filter(course__course_code__startswith="M").select_related("course", "schedule"))
+        self.choose(("WIDE", 1), ("CCCC", 1))
+        candidate = self.schedulers["AAAA", 1]
+        self.assertEqual([row[0] for row in self.account.clash_rows(candidate)],
+                         [self.schedulers["WIDE", 1].scheduler_id])
+
+        # many more choices in other slots, the lookup still reads the one clashing row
+        self.account.add_choices(others)
+        self.assertEqual([row[0] for row in self.account.clash_rows(candidate)],
+                         [self.schedulers["WIDE", 1].scheduler_id])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.account.clashes_with(candidate),
+                             {(7, 1, "1"): [self.schedulers["WIDE", 1].scheduler_id]})
+
+    def test_rebuild(self):
+        self.choose(("AAAA", 1))
+        self.account.choices.add(self.schedulers["BBBB", 1])
+        ChoiceSlot.objects.filter(scheduler=self.schedulers["AAAA", 1]).update(schedule=self.schedulers["CCCC", 1].schedule)
+
+        call_command("rebuild_ledgers", stdout=StringIO())
+        call_command("rebuild_ledgers", "--verify", stdout=StringIO())
+        self.assertEqual(len(self.account.clashes()), 1)
@@ -0,0 +1,45 @@
+from django.test import SimpleTestCase
+from planning.management.commands.scrappy.fetch import Fetcher, RateLimiter
+from planning.management.commands.scrappy.standin import StandIn
+from planning.management.commands.scrappy.program_plan import ProgramPlan
+from planning.management.commands.scrappy.courses import fetch_course_info, fetch_programs
+from tests.factories import FIXTURES
+import time
+
+
+class TestFetcher(SimpleTestCase):
+    def test_retries(self):
+        with StandIn(FIXTURES, fail_first=2) as standin:
+            fetcher = Fetcher(base_url=standin.url, backoff=0.01)
+            response = fetcher.get("/kurs/TDDE01")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(standin.requests, 3)
+        self.assertEqual(fetcher.stats.pages, 1)
+
+    def test_map_keeps_order(self):
+        with StandIn(FIXTURES) as standin:
+            fetcher = Fetcher(base_url=standin.url, workers=3, rate=0)
+            codes = ["TDDE01", "TDDD41", "MISSING", "TDDE15", "TSEA83"]
+            courses = fetcher.map(lambda code: fetch_course_info(code, fetcher=fetcher), codes)
+        self.assertEqual([course["course_code"] for course in courses], ["TDDE01", "TDDD41", "TDDE15", "TSEA83"])
+
+    def test_rate_limit(self):
+        limiter = RateLimiter(rate=50)
+        st = time.monotonic()
+        for _ in range(6):
+            limiter.wait("studieinfo.liu.se")
+        self.assertGreaterEqual(time.monotonic() - st, 0.09)
+
+    def test_scrapers(self):
+        with StandIn(FIXTURES) as standin:
+            fetcher = Fetcher(base_url=standin.url)
+            programs = fetch_programs(fetcher)
+            plan = ProgramPlan("6CMJU", fetcher=fetcher)
+            course = fetch_course_info("TDDD41", fetcher=fetcher)
+
+        self.assertEqual(programs[0], ("6CMJU", "Civilingenjörsprogram i mjukvaruteknik"))
+        self.assertEqual(plan.program_name, "Civilingenjörsprogram i mjukvaruteknik")
+        self.assertIn(("AI och maskininlärning", "AIML", "6CMJU"), plan.profiles())
+        self.assertEqual(len(plan.courses()), 10)
+        self.assertEqual(course["examinator"], "Bo Berg")
+        self.assertEqual(course["main_field"], ["Datateknik", "Datavetenskap"])
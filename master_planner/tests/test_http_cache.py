@@ -0,0 +1,45 @@
+from django.test import SimpleTestCase
+from planning.management.commands.scrappy.fetch import Fetcher
+from planning.management.commands.scrappy.http_cache import HttpCache, OfflineCacheMiss
+from planning.management.commands.scrappy.standin import StandIn
+from planning.management.commands.scrappy.courses import fetch_course_info
+from tests.factories import FIXTURES
+import tempfile
+
+
+class TestHttpCache(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_dir = directory.name
+
+    def test_revalidates_with_conditional_requests(self):
+        with StandIn(FIXTURES) as standin:
+            first = Fetcher(base_url=standin.url, cache=HttpCache(self.cache_dir))
+            body = first.get("/kurs/TDDE01").content
+            second = Fetcher(base_url=standin.url, cache=HttpCache(self.cache_dir))
+            response = second.get("/kurs/TDDE01")
+
+        self.assertEqual(standin.not_modified, 1)
+        self.assertEqual(response.content, body)
+        self.assertEqual((first.cache.misses, second.cache.hits), (1, 1))
+        self.assertEqual(second.cache.bytes_saved, len(body))
+
+    def test_cache_is_keyed_on_language(self):
+        cache = HttpCache(self.cache_dir)
+        with StandIn(FIXTURES) as standin:
+            fetcher = Fetcher(base_url=standin.url, cache=cache)
+            fetcher.get("/kurs/TDDE01", lang="sv")
+            fetcher.get("/kurs/TDDE01", lang="en")
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_offline_replay(self):
+        with StandIn(FIXTURES) as standin:
+            Fetcher(base_url=standin.url, cache=HttpCache(self.cache_dir)).get("/kurs/TDDD41")
+            url = standin.url
+
+        offline = Fetcher(base_url=url, cache=HttpCache(self.cache_dir), offline=True)
+        course = fetch_course_info("TDDD41", fetcher=offline)
+        self.assertEqual(course["examinator"], "Bo Berg")
+        with self.assertRaises(OfflineCacheMiss):
+            offline.get("/kurs/TDDE01")
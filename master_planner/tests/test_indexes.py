@@ -0,0 +1,34 @@
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+from planning.models import Scheduler, SchedulersProfiles, Program, Profile, register_courses
+from accounts.models import Account
+from tests.factories import course_row
+from io import StringIO
+
+
+class TestPlannerIndexes(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        program = Program.objects.create(program_name="mjukvaruteknik", program_code="6CMJU")
+        profile = Profile.objects.create(profile_name="profile_1", profile_code="AAAA")
+        program.profiles.add(profile)
+        register_courses([course_row("AAAA", 7, 1, "1"), course_row("BBBB", 7, 2, "2")])
+        cls.account = Account.objects.create_user(username="test_user", password="123", program=program)
+        cls.account.choices.add(*Scheduler.objects.all())
+
+    def test_scheduler_profile_is_unique(self):
+        scheduler_profile = SchedulersProfiles.objects.first()
+        with self.assertRaises(IntegrityError):
+            SchedulersProfiles.objects.create(scheduler=scheduler_profile.scheduler,
+                                              profile=scheduler_profile.profile,
+                                              vof="o")
+
+    def test_explain_hot_queries(self):
+        stdout = StringIO()
+        call_command("explain_hot_queries", "--profile", "AAAA", stdout=stdout)
+
+        for name in ("courses/AAAA/7", "get_extra_course_info", "account/choices/AAAA",
+                     "account/overview, choices", "account/overview, profiles"):
+            self.assertIn(f"-- {name}", stdout.getvalue())
+        self.assertNotIn("SCAN planning_scheduler\n", stdout.getvalue())
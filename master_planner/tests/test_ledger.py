@@ -0,0 +1,120 @@
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+from django.urls import reverse
+from planning.models import Scheduler, Program, Profile, register_courses
+from accounts.models import Account, HpLedger
+from tests.factories import course_row
+from io import StringIO
+import uuid
+
+
+class TestHpLedger(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        program = Program.objects.create(program_name="mjukvaruteknik", program_code="6CMJU")
+        profile = Profile.objects.create(profile_name="profile_1", profile_code="AAAA")
+        program.profiles.add(profile)
+        register_courses([course_row("AAAA", 7, 1, "1"),
+                          course_row("BBBB", 7, 1, "2", level="G1X"),
+                          course_row("CCCC", 8, 1, "3", hp="6*"),
+                          course_row("CCCC", 8, 2, "3", hp="6*")])
+        cls.account = Account.objects.create_user(username="test_user", password="123", program=program)
+
+    def setUp(self):
+        self.client.login(username="test_user", password="123")
+
+    def post(self, course_code, period=1, method="post"):
+        scheduler = Scheduler.objects.get(course=course_code, schedule__period=period)
+        return getattr(self.client, method)(reverse("api-1.0.0:post_choice"),
+                                            data={"scheduler_id": str(scheduler.scheduler_id)},
+                                            content_type="application/json")
+
+    def test_add_and_remove(self):
+        self.post("AAAA")
+        self.post("AAAA")
+        self.post("BBBB")
+        level_hp = Account.objects.get(pk=self.account.pk).level_hp()
+        self.assertEqual(level_hp[7, 1, "a_level"], 6)
+        self.assertEqual(level_hp[7, 1, "g_level"], 6)
+
+        self.post("AAAA", method="delete")
+        self.post("AAAA", method="delete")
+        ledger = HpLedger.objects.get(account=self.account)
+        self.assertEqual(ledger.a_7_1, 0)
+        self.assertEqual(ledger.g_7_1, 6)
+
+    def test_linked(self):
+        self.post("CCCC", period=2)
+        self.assertEqual(self.account.choices.count(), 2)
+        level_hp = self.account.level_hp()
+        self.assertEqual(level_hp[8, 1, "a_level"], 3)
+        self.assertEqual(level_hp[8, 2, "a_level"], 3)
+
+        self.post("CCCC", period=1, method="delete")
+        self.assertEqual(self.account.choices.count(), 0)
+        self.assertEqual(self.account.level_hp()["a_level"], 0)
+
+    def test_rebuild(self):
+        self.post("AAAA")
+        self.account.choices.add(Scheduler.objects.get(course="BBBB"))
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_ledgers", "--verify", stdout=StringIO())
+
+        call_command("rebuild_ledgers", stdout=StringIO())
+        call_command("rebuild_ledgers", "--verify", stdout=StringIO())
+        self.assertEqual(HpLedger.objects.get(account=self.account).g_7_1, 6)
+
+    def batch(self, *operations, schedulers=None):
+        schedulers = schedulers or dict(Scheduler.objects.values_list("course_id", "scheduler_id")
+                                                         .order_by("schedule__period"))
+        return self.client.post(reverse("api-1.0.0:batch_choices"),
+                                data={"operations": [{"action": action, "scheduler_id": str(schedulers[course_code])}
+                                                     for action, course_code in operations]},
+                                content_type="application/json")
+
+    def test_batch(self):
+        self.post("AAAA")
+        schedulers = dict(Scheduler.objects.values_list("course_id", "scheduler_id").order_by("schedule__period"))
+        with self.assertNumQueries(13):
+            # session, user, schedulers, then savepoint, ledger lock, chosen, insert and delete
+            # of the choices and of the conflict index, two ledger updates and release
+            response = self.batch(("add", "BBBB"), ("add", "CCCC"), ("remove", "AAAA"), schedulers=schedulers)
+        self.assertEqual(response.status_code, 200)
+        linked = str(Scheduler.objects.get(course="CCCC", schedule__period=1).scheduler_id)
+        self.assertEqual(response.json()["linked"], [linked])
+        self.assertEqual(len(response.json()["added"]), 3)
+        self.assertEqual(len(response.json()["removed"]), 1)
+
+        level_hp = self.account.level_hp()
+        self.assertEqual(self.account.choices.count(), 3)
+        self.assertEqual((level_hp[7, 1, "a_level"], level_hp[7, 1, "g_level"], level_hp[8, 1, "a_level"]), (0, 6, 3))
+
+        response = self.batch(("add", "AAAA"), ("remove", "AAAA"), ("remove", "CCCC"))
+        self.assertEqual(response.json()["removed"], [str(Scheduler.objects.get(course="CCCC", schedule__period=2).scheduler_id), linked])
+        self.assertEqual(self.account.choices.count(), 1)
+        call_command("rebuild_ledgers", "--verify", stdout=StringIO())
+
+    def test_batch_linked_half(self):
+        schedulers = {(course_code, period): scheduler_id for course_code, period, scheduler_id
+                      in Scheduler.objects.values_list("course_id", "schedule__period", "scheduler_id")}
+        first, second = schedulers["CCCC", 1], schedulers["CCCC", 2]
+
+        # removing the linked half after adding its partner is the last operation on the pair
+        response = self.batch(("add", 1), ("remove", 2), schedulers={1: first, 2: second})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["added"], response.json()["removed"]), ([], []))
+        self.assertEqual(self.account.choices.count(), 0)
+
+        response = self.batch(("remove", 2), ("add", 1), schedulers={1: first, 2: second})
+        self.assertEqual(set(response.json()["added"]), {str(first), str(second)})
+        self.assertEqual(response.json()["linked"], [str(second)])
+        self.assertEqual(self.account.choices.count(), 2)
+        call_command("rebuild_ledgers", "--verify", stdout=StringIO())
+
+    def test_batch_unknown_scheduler(self):
+        response = self.client.post(reverse("api-1.0.0:batch_choices"),
+                                    data={"operations": [{"action": "add", "scheduler_id": str(uuid.uuid4())}]},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 406)
+        self.assertEqual(self.account.choices.count(), 0)
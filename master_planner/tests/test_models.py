@@ -1,5 +1,7 @@
 from django.test import TestCase
-from planning.models import Scheduler, Schedule, Course, Program, Profile, MainField, Examination, register_courses, register_programs, register_profiles
+from planning.models import Scheduler, Schedule, Course, Program, Profile, MainField, Examination, register_courses, register_programs, register_profiles, register_course_details, parse_hp, link_split_courses, resolve_schedules, slot_id, slot_ids, occupancy_bits
+from tests.factories import course_row
+from decimal import Decimal
 from accounts.models import User, Account
 import pprint
 
@@ -176,6 +178,89 @@ class TestModelsPlanning(TestCase):
         # self.assertEqual(Scheduler.objects.get(program=program, course="AAAA").profiles.count(), 2)
 
 
+    def test_register_courses_credits(self):
+        self.test_register_profiles()
+        register_courses(self.course_data)
+
+        course = Course.objects.get(course_code="CCCC")
+        self.assertTrue(course.is_split)
+        self.assertEqual(course.credits, Decimal("3"))
+        self.assertFalse(Course.objects.get(course_code="AAAA").is_split)
+        self.assertEqual(parse_hp("7.5*"), (Decimal("3.75"), True))
+
+    def test_register_courses_links_split_courses(self):
+        self.test_register_profiles()
+        data = [course_row(f"S{i:03}", 7 + i % 3, period, str(1 + i % 4), hp="6*")
+                for i in range(30) for period in ("1", "2")]
+
+        with self.assertNumQueries(4):
+            register_courses(data)
+
+        linked = Scheduler.objects.exclude(linked=None).select_related("linked")
+        self.assertEqual(linked.count(), 60)
+        for scheduler in linked:
+            self.assertEqual(scheduler.linked.linked_id, scheduler.scheduler_id)
+            self.assertEqual(scheduler.linked.course_id, scheduler.course_id)
+
+    def test_link_split_courses_reports_ambiguous_matches(self):
+        schedulers = {("6CMJU", "SPLIT", 7, 1, "1"): Scheduler(),
+                      ("6CMJU", "SPLIT", 7, 1, "2"): Scheduler(),
+                      ("6CMJU", "SPLIT", 7, 2, "3"): Scheduler(),
+                      ("6CMJU", "ALONE", 8, 2, "1"): Scheduler()}
+
+        changed, unmatched = link_split_courses(schedulers, {"SPLIT", "ALONE"})
+
+        self.assertEqual(changed, [])
+        self.assertEqual(unmatched, [("6CMJU", "SPLIT", 7, 2), ("6CMJU", "ALONE", 8, 0)])
+
+    def test_register_course_details_upserts(self):
+        self.test_register_profiles()
+        register_courses(self.course_data)
+        pages = [{"course_code": code,
+                  "examinator": "Anna Ek",
+                  "location": "Valla",
+                  "main_field": ["Datateknik"],
+                  "examination": [{"examination_code": "TEN1", "hp": "6", "name": "tenta", "grading": "U, 3, 4, 5"}]}
+                 for code in Course.objects.values_list("course_code", flat=True)]
+
+        register_course_details(pages)
+        pages[0]["examinator"] = "Bo Berg"
+        pages[0]["examination"][0]["hp"] = "4"
+        with self.assertNumQueries(8):
+            register_course_details(pages, batch_size=2)
+
+        self.assertEqual(Examination.objects.count(), len(pages))
+        self.assertEqual(Examination.objects.get(course=pages[0]["course_code"]).hp, "4")
+        self.assertEqual(Course.objects.get(course_code=pages[0]["course_code"]).examinator, "Bo Berg")
+        self.assertEqual(Course.objects.filter(campus="Valla", main_fields="Datateknik").count(), len(pages))
+
+    def test_schedule_slots(self):
+        self.test_register_profiles()
+        data = [course_row("AAAA", 8, "2", "3"), course_row("BBBB", 8, "2", "1+3"), course_row("CCCC", 8, "2", "2+4")]
+        register_courses(data)
+
+        self.assertEqual(Scheduler.objects.get(course="AAAA").schedule_id, slot_id(8, 2, "3"))
+        self.assertEqual(Scheduler.objects.get(course="BBBB").schedule_id, 825)
+        self.assertEqual(Scheduler.objects.get(course="CCCC").schedule_id, 826)
+        self.assertEqual(resolve_schedules([(8, "2", "1+3")], create=False)[8, 2, "1+3"].id, 825)
+
+    def test_occupancy(self):
+        self.test_register_profiles()
+        register_courses([course_row("AAAA", 8, "2", "3"), course_row("BBBB", 8, "2", "1+3"),
+                          course_row("CCCC", 8, "2", "-"), course_row("DDDD", 6, "1", "1"),
+                          course_row("SPLIT", 9, "1", "2", hp="6*"), course_row("SPLIT", 9, "2", "4", hp="6*")])
+        occupancy = dict(Scheduler.objects.values_list("course_id", "occupancy").order_by("schedule_id"))
+
+        self.assertEqual(occupancy["AAAA"], 1 << 33)
+        self.assertEqual(occupancy["BBBB"], 1 << 31 | 1 << 33)
+        self.assertEqual(occupancy["CCCC"], 1 << 30)
+        self.assertEqual(occupancy["DDDD"], 0)
+        self.assertEqual(occupancy["SPLIT"], 1 << 42 | 1 << 54)
+        self.assertEqual(occupancy_bits(Schedule.objects.get(id=slot_id(9, 1, "2"))), 1 << 42)
+        self.assertEqual(Scheduler.objects.filter(schedule_id__in=slot_ids(8, 2)).count(), 3)
+        self.assertEqual(Scheduler.objects.filter(schedule_id__in=slot_ids(8, 1)).count(), 0)
+
+
 class TestModelsAccounts(TestCase):
     
     @classmethod
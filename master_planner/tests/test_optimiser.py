@@ -0,0 +1,73 @@
+from django.test import TestCase
+from django.urls import reverse
+from planning.models import Course, MainField, Program, Profile, Scheduler, register_courses
+from planning.optimiser import PlanConstraints, PlanError, suggest_plans
+from accounts.models import Account
+from tests.factories import course_row
+
+
+class TestOptimiser(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        program = Program.objects.create(program_name="mjukvaruteknik", program_code="6CMJU")
+        program.profiles.add(Profile.objects.create(profile_name="profile_1", profile_code="AAAA"),
+                             Profile.objects.create(profile_name="profile_2", profile_code="BBBB"),
+                             Profile.objects.create(profile_name="Ingen inriktning", profile_code="free"))
+        register_courses([course_row("P1", 7, 1, "1"),
+                          course_row("P2", 7, 1, "1"),
+                          course_row("P3", 8, 1, "2", level="G1X"),
+                          course_row("SPLIT", 9, 1, "3", hp="6*"),
+                          course_row("SPLIT", 9, 2, "3", hp="6*"),
+                          course_row("F1", 7, 2, "4", profile_code="free"),
+                          course_row("O1", 7, 2, "1", profile_code="BBBB")])
+        Course.objects.get(course_code="P2").main_fields.add(MainField.objects.create(field_name="Datateknik"))
+        cls.account = Account.objects.create_user(username="test_user", password="123", program=program)
+        cls.ids = {(scheduler.course_id, scheduler.schedule.period): str(scheduler.scheduler_id)
+                   for scheduler in Scheduler.objects.select_related("schedule")}
+
+    def plans(self, **constraints):
+        result = suggest_plans("6CMJU", "AAAA", PlanConstraints(**constraints), top_k=3)
+        self.assertTrue(result["complete"])
+        return result["plans"]
+
+    def test_best_plan(self):
+        best = self.plans()[0]
+        self.assertEqual((best["profile_hp"], best["hp"], best["a_level_hp"]), (18, 18, 12))
+        self.assertEqual(len({"P1", "P2"} & set(best["courses"])), 1)
+        self.assertIn(self.ids["SPLIT", 1], best["schedulers"])
+        self.assertIn(self.ids["SPLIT", 2], best["schedulers"])
+        self.assertNotIn("O1", best["courses"])
+
+    def test_requirements(self):
+        self.assertIn("F1", self.plans(min_total_hp=24)[0]["courses"])
+        self.assertIn("P2", self.plans(min_field_hp={"Datateknik": 6})[0]["courses"])
+        self.assertEqual(self.plans(min_a_level_hp=100), [])
+
+        # only the halves of the split course fit in 3 hp per period
+        best = self.plans(max_period_hp=3)[0]
+        self.assertEqual((best["courses"], best["hp"]), (["SPLIT"], 6))
+
+    def test_lock_and_exclude(self):
+        best = self.plans(lock=[self.ids["P1", 1]], exclude=["P3"])[0]
+        self.assertEqual(sorted(best["courses"]), ["P1", "SPLIT"])
+
+        with self.assertRaises(PlanError):
+            self.plans(lock=[self.ids["P1", 1], self.ids["P2", 1]])
+
+    def test_endpoint(self):
+        self.client.login(username="test_user", password="123")
+        self.account.choices.add(self.ids["SPLIT", 2])
+        response = self.client.post(reverse("api-1.0.0:suggest_plan"),
+                                    data={"profile_code": "AAAA", "keep_choices": True, "exclude": ["P3"],
+                                          "max_period_hp": 6, "top_k": 2},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        plans = response.json()["plans"]
+        self.assertEqual(len(plans), 2)
+        self.assertEqual(plans[0]["courses"][0], "SPLIT")
+        self.assertEqual(plans[0]["hp"], 12)
+
+        response = self.client.post(reverse("api-1.0.0:suggest_plan"),
+                                    data={"profile_code": "AAAA", "lock": [self.ids["P1", 1], self.ids["P2", 1]]},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 406)
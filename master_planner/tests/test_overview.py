@@ -0,0 +1,75 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from planning.models import Scheduler, Course, Program, Profile, MainField, register_courses
+from accounts.models import Account
+from tests.factories import course_row
+
+
+class TestOverview(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        program = Program.objects.create(program_name="mjukvaruteknik", program_code="6CMJU")
+        profile_1 = Profile.objects.create(profile_name="profile_1", profile_code="AAAA")
+        profile_free = Profile.objects.create(profile_name="Ingen inriktning", profile_code="free")
+        program.profiles.add(profile_1, profile_free)
+
+        data = [course_row(f"C{i:03}", 7 + i % 3, 1 + i % 2, str(1 + i % 4)) for i in range(12)]
+        data += [course_row("SPLIT", 8, 1, "2", hp="6*", level="G1X"),
+                 course_row("SPLIT", 8, 2, "3", hp="6*", level="G1X"),
+                 course_row("CLASH", 7, 1, "1"),
+                 course_row("C000", 7, 1, "1", profile_code="free")]
+        register_courses(data)
+
+        field = MainField.objects.create(field_name="Datateknik")
+        for course in Course.objects.all():
+            course.main_fields.add(field)
+
+        cls.account = Account.objects.create_user(username="test_user", password="123", program=program)
+
+    def setUp(self):
+        self.client.login(username="test_user", password="123")
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/api/account/overview")
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()
+
+    def test_query_count_is_constant(self):
+        schedulers = list(Scheduler.objects.order_by("course_id", "schedule__period"))
+        self.account.choices.add(schedulers[0])
+        few, _ = self.count_queries()
+
+        self.account.choices.add(*schedulers)
+        many, _ = self.count_queries()
+
+        self.assertEqual(few, many)
+
+    def test_rollups(self):
+        self.account.choices.add(*Scheduler.objects.filter(course__in=["C000", "C001", "CLASH", "SPLIT"]))
+        _, overview = self.count_queries()
+
+        self.assertEqual(overview["total_hp"], 24)
+        self.assertEqual(overview["a_level"], 18)
+        self.assertEqual(overview["g_level"], 6)
+        self.assertEqual(overview["field"], {"Datateknik": 24})
+        self.assertEqual(overview["profile"], {"profile_1": 24})
+        self.assertEqual(overview["semester_8"]["periods"]["period_1"], {"total": 3, "a_level": 0, "g_level": 3})
+        self.assertEqual(overview["semester_8"]["periods"]["period_2"], {"total": 9, "a_level": 6, "g_level": 3})
+
+        # C000 and CLASH share semester 7, period 1, block 1
+        overlap = overview["semester_7"]["overlap"]
+        self.assertEqual(len(overlap), 1)
+        self.assertEqual({scheduler["course"]["course_code"] for scheduler in overlap[0]}, {"C000", "CLASH"})
+        self.assertEqual(overview["semester_8"]["overlap"], [])
+
+    def test_combined_block_overlaps(self):
+        register_courses([course_row("COMB", 7, 1, "1+3")])
+        self.account.choices.add(*Scheduler.objects.filter(course__in=["C000", "C003", "COMB"]))
+        _, overview = self.count_queries()
+
+        # COMB takes blocks 1 and 3 of semester 7 period 1, C000 is in block 1 and C003 in period 2
+        overlap = overview["semester_7"]["overlap"]
+        self.assertEqual([{scheduler["course"]["course_code"] for scheduler in group} for group in overlap],
+                         [{"C000", "COMB"}])
@@ -0,0 +1,29 @@
+from django.test import SimpleTestCase
+from planning.management.commands.scrappy.fetch import Fetcher
+from planning.management.commands.scrappy.standin import StandIn
+from planning.management.commands.scrappy.program_plan import ProgramPlan
+from planning.management.commands.scrappy.courses import fetch_course_info
+from planning.management.commands.scrappy.parsing import available_parsers, default_parser
+from unittest import mock
+from tests.factories import FIXTURES
+
+
+class TestParsers(SimpleTestCase):
+    def test_parsers_agree(self):
+        with StandIn(FIXTURES) as standin:
+            fetcher = Fetcher(base_url=standin.url)
+            scraped = {}
+            for parser in available_parsers():
+                with mock.patch.dict("os.environ", {"SCRAPPY_PARSER": parser}):
+                    plans = [ProgramPlan(code, fetcher=fetcher) for code in ("6CMJU", "6CDDD")]
+                    scraped[parser] = ([(plan.program_name, plan.url, plan.profiles(), plan.courses()) for plan in plans],
+                                       fetch_course_info("TDDD41", fetcher=fetcher))
+
+        self.assertIn("html.parser", scraped)
+        for parser, result in scraped.items():
+            self.assertEqual(result, scraped["html.parser"], parser)
+        self.assertEqual(scraped["html.parser"][1]["examinator"], "Bo Berg")
+
+        with mock.patch.dict("os.environ", {"SCRAPPY_PARSER": "html5lib-missing"}):
+            with self.assertRaises(ValueError):
+                default_parser()
@@ -0,0 +1,47 @@
+from django.test import SimpleTestCase
+from planning.management.commands.scrappy.fetch import Fetcher
+from planning.management.commands.scrappy.standin import StandIn
+from planning.management.commands.scrappy.program_plan import ProgramPlan
+from planning.management.commands.scrappy.courses import fetch_course_info
+from planning.management.commands.scrappy.pipeline import ParsePipeline
+from tests.factories import FIXTURES
+import threading
+import time
+
+
+class TestParsePipeline(SimpleTestCase):
+    def test_parses_in_worker_processes(self):
+        with StandIn(FIXTURES) as standin:
+            fetcher = Fetcher(base_url=standin.url, rate=0)
+            with ParsePipeline(fetcher, parse_workers=2) as pipeline:
+                programs = pipeline.programs(["6CMJU", "MISSING", "6CDDD"])
+                courses = pipeline.courses(["TDDE01", "MISSING", "TDDD41"])
+            plan = ProgramPlan("6CMJU", fetcher=fetcher)
+            expected = [fetch_course_info(code, fetcher=fetcher) for code in ("TDDE01", "TDDD41")]
+
+        self.assertEqual(len(programs), 2)
+        self.assertEqual(programs[0], (plan.courses(), plan.profiles()))
+        self.assertEqual(courses, expected)
+        self.assertEqual(courses[1]["examinator"], "Bo Berg")
+
+    def test_queue_bounds_fetched_pages(self):
+        fetched = []
+        parsed = []
+        lock = threading.Lock()
+
+        def fetch(item):
+            with lock:
+                fetched.append(item)
+                ahead.append(len(fetched) - len(parsed))
+            return (item,)
+
+        def parse(item):
+            time.sleep(0.002)
+            parsed.append(item)
+            return item * 2
+
+        ahead = []
+        pipeline = ParsePipeline(Fetcher(workers=4), parse_workers=0, queue_size=3)
+        self.assertEqual(pipeline.map(fetch, parse, range(100)), [item * 2 for item in range(100)])
+        # queued pages, one page held by every fetch thread and the one being parsed
+        self.assertLessEqual(max(ahead), 3 + 4 + 1)
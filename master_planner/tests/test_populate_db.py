@@ -0,0 +1,111 @@
+from django.core.management import call_command
+from django.test import TestCase
+from planning.models import Course, Examination, ImportCheckpoint, PlannerRow, Scheduler, Program
+from planning.stream import import_program
+from planning.search import search_courses
+from planning.management.commands.scrappy.standin import StandIn
+from planning.management.commands.scrappy.corpus import write_corpus
+from unittest import mock
+from accounts.models import Account
+from tests.factories import FIXTURES
+from contextlib import redirect_stdout
+from io import StringIO
+import tempfile
+
+
+class TestPopulateDb(TestCase):
+    def test_import_from_standin(self):
+        with StandIn(FIXTURES) as standin:
+            call_command("populate_db", "--base-url", standin.url, "--rate", "0", "--no-cache", stdout=StringIO())
+
+        self.assertEqual(Program.objects.count(), 2)
+        self.assertEqual(Course.objects.count(), 7)
+        self.assertEqual(Course.objects.get(course_code="TDDE15").examinator, "Cecilia Ek")
+        self.assertEqual(Examination.objects.filter(course="TDDE15").count(), 2)
+        self.assertEqual(Scheduler.objects.filter(course="TDDE15").exclude(linked=None).count(), 4)
+
+    def test_import_synthetic_corpus(self):
+        with tempfile.TemporaryDirectory() as root, StandIn(root) as standin:
+            programs = write_corpus(root, programs=3, courses=30)
+            output = StringIO()
+            with redirect_stdout(output):
+                call_command("populate_db", "--base-url", standin.url, "--rate", "0", "--no-cache", "--profile",
+                             stdout=StringIO())
+
+        self.assertEqual(sorted(Program.objects.values_list("program_code", "program_name")), sorted(programs))
+        self.assertEqual(Course.objects.count(), 30)
+        self.assertEqual(Examination.objects.count(), 60)
+        # every course is taught by two programs
+        self.assertEqual(Scheduler.objects.filter(course="K00001").values("program").distinct().count(), 2)
+        self.assertRegex(output.getvalue(), r"course details +\d+\.\d+s +\d+ +\d+ +\d+ MiB")
+
+    def test_offline_import_from_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with StandIn(FIXTURES) as standin:
+                call_command("populate_db", "--base-url", standin.url, "--rate", "0", "--cache-dir", cache_dir, stdout=StringIO())
+            call_command("flush", interactive=False, stdout=StringIO())
+            call_command("populate_db", "--base-url", standin.url, "--offline", "--cache-dir", cache_dir, stdout=StringIO())
+
+        self.assertEqual(Course.objects.count(), 7)
+
+    def test_incremental_reimport_keeps_choices(self):
+        with StandIn(FIXTURES) as standin:
+            call_command("populate_db", "--base-url", standin.url, "--rate", "0", "--no-cache", "--incremental", stdout=StringIO())
+            account = Account.objects.create_user(username="test_user", password="123")
+            chosen = Scheduler.objects.filter(course="TDDE15").first()
+            account.choices.add(chosen)
+
+            output = StringIO()
+            with redirect_stdout(output):
+                call_command("populate_db", "--base-url", standin.url, "--rate", "0", "--no-cache", "--incremental", stdout=StringIO())
+
+        self.assertIn("catalogue unchanged", output.getvalue())
+        self.assertEqual(list(account.choices.all()), [chosen])
+        self.assertEqual(Course.objects.count(), 7)
+        self.assertEqual(Examination.objects.filter(course="TDDE15").count(), 2)
+        self.assertEqual(Scheduler.objects.filter(course="TDDE15").exclude(linked=None).count(), 4)
+
+    def test_streaming_import(self):
+        with StandIn(FIXTURES) as standin:
+            call_command("populate_db", "--base-url", standin.url, "--rate", "0", "--no-cache", "--stream", stdout=StringIO())
+        self.assertEqual(set(ImportCheckpoint.objects.values_list("program_code", flat=True)), {"6CMJU", "6CDDD"})
+        streamed = PlannerRow.objects.count()
+
+        call_command("flush", interactive=False, stdout=StringIO())
+        with StandIn(FIXTURES) as standin:
+            call_command("populate_db", "--base-url", standin.url, "--rate", "0", "--no-cache", stdout=StringIO())
+        self.assertEqual(PlannerRow.objects.count(), streamed)
+
+    def test_resume_after_crash(self):
+        calls = []
+        def crash_on_second_program(*args, **kwargs):
+            calls.append(args[0])
+            if len(calls) == 2:
+                raise RuntimeError("killed")
+            return import_program(*args, **kwargs)
+
+        with StandIn(FIXTURES) as standin:
+            with mock.patch("planning.management.commands.populate_db.import_program", crash_on_second_program):
+                with self.assertRaises(RuntimeError):
+                    call_command("populate_db", "--base-url", standin.url, "--rate", "0", "--no-cache", "--stream",
+                                 stdout=StringIO())
+            first = calls[0]
+            self.assertEqual(list(ImportCheckpoint.objects.values_list("program_code", flat=True)), [first])
+            # the committed program can be searched before the import finishes
+            course_code = Scheduler.objects.filter(program=first).values_list("course", flat=True).first()
+            self.assertEqual(search_courses(course_code), [course_code])
+            committed = set(Scheduler.objects.values_list("scheduler_id", flat=True))
+
+            output = StringIO()
+            with redirect_stdout(output):
+                call_command("populate_db", "--base-url", standin.url, "--rate", "0", "--no-cache", "--resume",
+                             stdout=StringIO())
+
+        self.assertIn("resuming, 1 programs already committed", output.getvalue())
+        self.assertNotIn(f"extracting course and profile data for {first}", output.getvalue())
+        self.assertEqual(ImportCheckpoint.objects.count(), 2)
+        self.assertTrue(committed < set(Scheduler.objects.values_list("scheduler_id", flat=True)))
+        self.assertEqual(Course.objects.count(), 7)
+        self.assertEqual(Course.objects.get(course_code="TDDE15").examinator, "Cecilia Ek")
+        self.assertEqual(Examination.objects.filter(course="TDDE15").count(), 2)
+        self.assertEqual(Scheduler.objects.filter(course="TDDE15").exclude(linked=None).count(), 4)
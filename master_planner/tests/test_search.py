@@ -0,0 +1,50 @@
+from django.test import TestCase
+from django.urls import reverse
+from planning.models import Program, Profile, register_courses, register_course_details
+from planning.search import rebuild_search_index, search_courses
+from accounts.models import Account
+from tests.factories import course_page, course_row
+
+
+class TestSearch(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        program = Program.objects.create(program_name="mjukvaruteknik", program_code="6CMJU")
+        Program.objects.create(program_name="datateknik", program_code="6CDDD")
+        program.profiles.add(Profile.objects.create(profile_name="profile_1", profile_code="AAAA"))
+        rows = [course_row("TDDD27", 7, 1, "1"), course_row("TSKS01", 7, 1, "2"), course_row("TAOP07", 8, 1, "3"),
+                dict(course_row("TDDE01", 8, 2, "1"), program_code="6CDDD")]
+        rows[1]["course_name"] = "Göteborgs trafiksystem"
+        rows[2]["course_name"] = "Optimering, TDDD-fördjupning"
+        register_courses(rows)
+        register_course_details([course_page("TDDD27", examinator="Åsa Öberg"),
+                                 course_page("TSKS01", exams=("TEN1", "KTR1")),
+                                 course_page("TAOP07", examinator="Per Ek"),
+                                 course_page("TDDE01")])
+        cls.indexed = rebuild_search_index()
+        Account.objects.create_user(username="test_user", password="123", program=program)
+
+    def test_index(self):
+        self.assertEqual(self.indexed, 4)
+
+    def test_prefix_and_ranking(self):
+        # the course code outweighs the same word in a course name
+        self.assertEqual(search_courses("tddd"), ["TDDD27", "TAOP07"])
+        self.assertEqual(search_courses("TDD", program_code="6CMJU"), ["TDDD27", "TAOP07"])
+        self.assertEqual(search_courses("tdde"), ["TDDE01"])
+        self.assertEqual(search_courses("tdde", program_code="6CMJU"), [])
+
+    def test_diacritics_and_fields(self):
+        self.assertEqual(search_courses("goteborg"), ["TSKS01"])
+        self.assertEqual(search_courses("GÖTEBORGS TRAFIK"), ["TSKS01"])
+        self.assertEqual(search_courses("asa oberg"), ["TDDD27"])
+        self.assertEqual(search_courses("ktr1"), ["TSKS01"])
+        self.assertEqual(len(search_courses("datatek")), 4)
+        self.assertEqual(search_courses("' OR 1=1 --\""), [])
+
+    def test_endpoint(self):
+        self.client.login(username="test_user", password="123")
+        response = self.client.get(reverse("api-1.0.0:search_courses"), {"q": "fördjup"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["courses"][0]["course_code"], "TAOP07")
+        self.assertEqual(response.json()["courses"][0]["examinator"], "Per Ek")
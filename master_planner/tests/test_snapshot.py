@@ -0,0 +1,76 @@
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+from planning.models import Course, Examination, PlannerRow, Program, Scheduler, SchedulersProfiles
+from planning.snapshot import load_catalogue, read_snapshot
+from planning.management.commands.scrappy.standin import StandIn
+from tests.factories import FIXTURES
+from io import StringIO
+from pathlib import Path
+import json
+import lzma
+import tempfile
+
+
+class TestSnapshot(TestCase):
+    def setUp(self):
+        with StandIn(FIXTURES) as standin:
+            call_command("populate_db", "--base-url", standin.url, "--rate", "0", "--no-cache", stdout=StringIO())
+        self.root = tempfile.TemporaryDirectory()
+        self.path = Path(self.root.name) / "catalogue.json.xz"
+        call_command("dump_catalogue", self.path, stdout=StringIO())
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def rewrite(self, change) -> None:
+        """Apply change to the snapshot document."""
+        with lzma.open(self.path, "rb") as snapshot:
+            document = json.loads(snapshot.read())
+        change(document)
+        with lzma.open(self.path, "wb") as snapshot:
+            snapshot.write(json.dumps(document).encode())
+
+    def test_round_trip(self):
+        schedulers = set(Scheduler.objects.values_list("scheduler_id", "linked_id", "schedule_id", "occupancy"))
+        planner_rows = set(PlannerRow.objects.values_list("program_code", "profile_code", "scheduler_id", "credits"))
+        links = set(SchedulersProfiles.objects.values_list("scheduler_id", "profile_id", "vof"))
+        profiles = set(Program.profiles.through.objects.values_list("program_id", "profile_id"))
+        course = Course.objects.get(course_code="TDDE15")
+
+        with self.assertRaises(CommandError):
+            call_command("load_catalogue", self.path, stdout=StringIO())
+        call_command("flush", interactive=False, stdout=StringIO())
+        call_command("load_catalogue", self.path, stdout=StringIO())
+
+        self.assertEqual(set(Scheduler.objects.values_list("scheduler_id", "linked_id", "schedule_id", "occupancy")),
+                         schedulers)
+        self.assertEqual(set(PlannerRow.objects.values_list("program_code", "profile_code", "scheduler_id", "credits")),
+                         planner_rows)
+        loaded = Course.objects.get(course_code="TDDE15")
+        self.assertEqual((loaded.credits, loaded.is_split, loaded.examinator), (course.credits, course.is_split, course.examinator))
+        self.assertEqual(list(loaded.main_fields.values_list("field_name", flat=True)), ["Datateknik"])
+        self.assertEqual(Examination.objects.filter(course="TDDE15").count(), 2)
+        self.assertEqual(set(SchedulersProfiles.objects.values_list("scheduler_id", "profile_id", "vof")), links)
+        self.assertEqual(set(Program.profiles.through.objects.values_list("program_id", "profile_id")), profiles)
+
+    def test_version_mismatch(self):
+        self.rewrite(lambda document: document.update(version=2))
+        with self.assertRaisesMessage(ValueError, "is a version 2 snapshot, expected 1"):
+            read_snapshot(self.path)
+
+        call_command("flush", interactive=False, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "is a version 2 snapshot"):
+            call_command("load_catalogue", self.path, stdout=StringIO())
+
+    def test_column_mismatch(self):
+        def drop_campus(document):
+            table = next(table for table in document["tables"] if table["table"] == "planning_course")
+            index = table["columns"].index("campus")
+            del table["columns"][index], table["data"][index]
+        self.rewrite(drop_campus)
+        call_command("flush", interactive=False, stdout=StringIO())
+
+        with self.assertRaisesMessage(ValueError, "columns of planning_course"):
+            load_catalogue(self.path)
+        # the tables loaded before planning_course are rolled back
+        self.assertFalse(Program.objects.exists())
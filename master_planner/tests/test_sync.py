@@ -0,0 +1,55 @@
+from django.test import TestCase
+from planning.models import Course, Examination, Scheduler, SchedulersProfiles, Program
+from planning.sync import sync_catalogue
+from accounts.models import Account
+from tests.factories import course_page, course_row
+
+PROGRAMS = [("6CMJU", "Civilingenjörsprogram i mjukvaruteknik")]
+PROFILES = [("profile_1", "AAAA", "6CMJU"), ("Ingen inriktning", "free", "6CMJU")]
+
+
+class TestSyncCatalogue(TestCase):
+    def setUp(self):
+        self.courses = [course_row("AAAA", 7, "1", "1"),
+                        course_row("BBBB", 7, "1", "2", profile_code="free"),
+                        course_row("CCCC", 8, "1", "3", hp="6*"),
+                        course_row("CCCC", 8, "2", "3", hp="6*")]
+        self.pages = [course_page("AAAA"), course_page("BBBB"), course_page("CCCC")]
+        summary = sync_catalogue(PROGRAMS, PROFILES, self.courses, self.pages)
+        self.assertEqual(summary.get("scheduler")["created"], 4)
+        self.ids = dict(Scheduler.objects.values_list("course_id", "scheduler_id").order_by("schedule__period"))
+
+    def test_unchanged_import_writes_nothing(self):
+        with self.assertNumQueries(14):
+            summary = sync_catalogue(PROGRAMS, PROFILES, self.courses, self.pages)
+        self.assertEqual(summary.writes, 0)
+        self.assertEqual(summary.summary(), "catalogue unchanged")
+
+    def test_scheduler_ids_stay_stable(self):
+        account = Account.objects.create_user(username="test_user", password="123")
+        account.choices.add(self.ids["AAAA"])
+
+        self.courses[0]["course_name"] = "renamed"
+        self.courses.append(course_row("DDDD", 9, "1", "4"))
+        summary = sync_catalogue(PROGRAMS, PROFILES, self.courses, self.pages)
+
+        self.assertEqual(summary.get("course")["updated"], 1)
+        self.assertEqual(summary.get("scheduler")["created"], 1)
+        self.assertEqual(list(account.choices.values_list("scheduler_id", flat=True)), [self.ids["AAAA"]])
+        self.assertEqual(Course.objects.get(course_code="AAAA").course_name, "renamed")
+
+    def test_removed_rows_are_deleted(self):
+        split = Scheduler.objects.filter(course="CCCC", schedule__period=1).get()
+        self.assertIsNotNone(split.linked_id)
+        self.assertEqual(split.occupancy, Scheduler.objects.get(course="CCCC", schedule__period=2).occupancy)
+        self.assertEqual(bin(split.occupancy).count("1"), 2)
+
+        self.courses[1]["profile_code"] = "AAAA"
+        summary = sync_catalogue(PROGRAMS, PROFILES, self.courses[:2], [course_page("AAAA", exams=("TEN1",))])
+
+        self.assertEqual(summary.get("scheduler")["deleted"], 2)
+        self.assertEqual(summary.get("examination")["deleted"], 1)
+        self.assertFalse(Course.objects.filter(course_code="CCCC").exists())
+        self.assertEqual(SchedulersProfiles.objects.get(scheduler=self.ids["BBBB"]).profile_id, "AAAA")
+        self.assertEqual(Examination.objects.filter(course="AAAA").count(), 1)
+        self.assertEqual(Program.objects.count(), 1)
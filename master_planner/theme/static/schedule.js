@@ -366,39 +366,63 @@ function course_examination(response, scheduler_id, container_type) {
     return container
 }
 
-function add_course_db(scheduler_id) {
-    var payload = JSON.stringify({"scheduler_id": scheduler_id});
-    semester = sessionStorage.getItem("term");
-    const url = "/api/account/choice";
+var pending_choices = [];
+var flush_timer = null;
 
-    $.ajax({
-        type: "POST",
-        url: url,
-        data: payload,
-        success: function (response) {
-            load_chosen_courses(semester);
-            $("#check-" + response["scheduler_id"]).prop("checked", true);
-        }
-    });
+function add_course_db(scheduler_id) {
+    queue_choice("add", scheduler_id);
 }
 
 function delete_course_db(scheduler_id) {
-    var payload = JSON.stringify({"scheduler_id": scheduler_id});
-    const url = "/api/account/choice";
-    semester = sessionStorage.getItem('term');
+    $("#check-" + scheduler_id).prop("checked", false);
+    queue_choice("remove", scheduler_id);
+}
+
+function queue_choice(action, scheduler_id) {
+    // clicks close together are sent as one batch
+    pending_choices.push({"action": action, "scheduler_id": scheduler_id});
+    clearTimeout(flush_timer);
+    flush_timer = setTimeout(flush_choices, 250);
+}
+
+function flush_choices() {
+    clearTimeout(flush_timer);
+    if (pending_choices.length == 0) {
+        return;
+    }
+    var payload = JSON.stringify({"operations": pending_choices});
+    pending_choices = [];
+    semester = sessionStorage.getItem("term");
+    const url = "/api/account/choices/batch";
 
     $.ajax({
-        type: "DELETE",
+        type: "POST",
         url: url,
         data: payload,
         success: function (response) {
             load_chosen_courses(semester);
-            $("#check-" + response["scheduler_id"]).prop("checked", false);
-            $("#check-" + scheduler_id).prop("checked", false);
+            response["added"].forEach(scheduler_id => $("#check-" + scheduler_id).prop("checked", true));
+            response["removed"].forEach(scheduler_id => $("#check-" + scheduler_id).prop("checked", false));
+        },
+        error: function () {
+            // the batch was not saved, show the choices the server has
+            load_chosen_courses();
         }
     });
 }
 
+// a batch still waiting for its timer when the page is left is sent with a beacon,
+// which the browser delivers after the page is gone
+window.addEventListener("pagehide", function () {
+    if (pending_choices.length == 0) {
+        return;
+    }
+    clearTimeout(flush_timer);
+    var payload = new Blob([JSON.stringify({"operations": pending_choices})], {type: "application/json"});
+    pending_choices = [];
+    navigator.sendBeacon("/api/account/choices/batch", payload);
+});
+
 function sort_courses(tag, id) {
     var semester = sessionStorage.getItem('term'); 
     th = $("#" + id);